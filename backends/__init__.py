@@ -41,6 +41,10 @@ The backend is chosen/selected as follows:
   backends in the order that is defined in the variable "backendOrder"
   in this file.
 
+The headless backend is special in that it does not use a GUI toolkit,
+but draws in an offscreen context (using EGL or OSMesa). It is tried
+last, so that visvis can be used on a server without display.
+
 """
 
 # An overview:
@@ -55,13 +59,14 @@ import visvis
 from visvis.core.misc import isFrozen, getExceptionInstance
 
 # The order in which to try loading a backend (foo is a dummy backend)
-backendOrder = ['pyqt5', 'pyside', 'pyqt4', 'wx', 'gtk', 'fltk']
+backendOrder = ['pyqt5', 'pyside', 'pyqt4', 'wx', 'gtk', 'fltk', 'headless']
 backendMap = {'pyqt5':'PyQt5',
               'pyside':'PySide',
               'pyqt4':'PyQt4',
               'wx':'wx',
               'gtk':'gtk',
               'fltk':'fltk',
+              'headless':'OpenGL',
               }
 
 # Define aliases for backend names (for backward compatibility)
@@ -84,8 +89,8 @@ if visvis.settings.preferAlreadyLoadedBackend:
     for be in [be for be in reversed(backendOrder)]:
         # Determine backend module name
         modName = backendMap[be]
-        # If loaded, move up front
-        if modName in sys.modules:
+        # If loaded, move up front (OpenGL is always loaded)
+        if modName in sys.modules and modName != 'OpenGL':
             backendOrder.remove(be)
             backendOrder.insert(0,be)
 
@@ -225,7 +230,8 @@ def use(backendName=None):
             if _loadBackend(name):
                 break
         else:
-            tmp = "Install PySide, PyQt4, wxPython, GTK, or fltk."
+            tmp = "Install PySide, PyQt4, wxPython, GTK, or fltk, "
+            tmp += "or set PYOPENGL_PLATFORM to use the headless backend."
             raise RuntimeError("None of the backends could be loaded. "+tmp)
     
     # Return instance
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012, Almar Klein
+#
+# Visvis is distributed under the terms of the (new) BSD License.
+# The full license can be found in 'license.txt'.
+
+""" The headless backend.
+
+This backend draws in an offscreen OpenGl context, without a window or
+GUI toolkit. It can be used to render figures on a server (e.g. in batch
+jobs or for regression tests), also without an X server. With Mesa,
+software rendering (llvmpipe) is used if there is no GPU.
+
+The context is created with EGL or OSMesa, depending on the platform
+that PyOpenGL uses. PyOpenGL selects its platform when it is first
+imported, so set the PYOPENGL_PLATFORM environment variable to 'egl' or
+'osmesa' before importing visvis. When using EGL without display server,
+the surfaceless platform of Mesa is used.
+
+Drawing is synchronous: Figure.DrawNow() draws the figure right away,
+and vv.processEvents() draws all figures for which Draw() was called.
+Use vv.getframe() or vv.screenshot() to obtain the result. There is no
+main loop; App.Run() only processes the pending events and returns.
+
+"""
+
+import ctypes
+
+import OpenGL.platform
+import OpenGL.GL as gl
+
+import visvis
+from visvis import BaseFigure, events
+
+
+# Get the kind of platform that PyOpenGL uses
+PLATFORM = type(OpenGL.platform.PLATFORM).__name__
+if PLATFORM == 'EGLPlatform':
+    from OpenGL import EGL
+elif PLATFORM == 'OSMesaPlatform':
+    from OpenGL import osmesa, arrays
+else:
+    raise ImportError('The headless backend needs PyOpenGL to use EGL or ' +
+            'OSMesa, set PYOPENGL_PLATFORM before importing visvis.')
+
+# The EGL display and config that all canvases use
+_eglDisplay = None
+_eglConfig = None
+
+# From EGL_MESA_platform_surfaceless
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+
+def _initializeEgl():
+    """ Initialize EGL and choose the config for the canvases (once).
+    Uses the default display, or the surfaceless platform of Mesa if
+    there is no display server.
+    """
+    global _eglDisplay, _eglConfig
+    if _eglDisplay is not None:
+        return _eglDisplay, _eglConfig
+    
+    # Initialize display
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    try:
+        ok = EGL.eglInitialize(display, ctypes.pointer(major),
+                                        ctypes.pointer(minor))
+    except Exception:
+        ok = False
+    if not ok:
+        from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+        display = eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA,
+                                            EGL.EGL_DEFAULT_DISPLAY, None)
+        if not EGL.eglInitialize(display, ctypes.pointer(major),
+                                        ctypes.pointer(minor)):
+            raise RuntimeError('Could not initialize EGL.')
+    
+    # Choose config for rendering in a pbuffer with (desktop) OpenGl
+    attribs = [ EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8,
+                EGL.EGL_BLUE_SIZE, 8, EGL.EGL_ALPHA_SIZE, 8,
+                EGL.EGL_DEPTH_SIZE, 24,
+                EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                EGL.EGL_NONE ]
+    attribs = (EGL.EGLint * len(attribs))(*attribs)
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    EGL.eglChooseConfig(display, attribs, ctypes.pointer(config), 1,
+                        ctypes.pointer(count))
+    if count.value < 1:
+        raise RuntimeError('Could not find a suitable EGL config.')
+    
+    _eglDisplay, _eglConfig = display, config
+    return display, config
+
+
+class BaseCanvas(object):
+    """ BaseCanvas(figure, w, h)
+    
+    An offscreen OpenGl context, in which a figure draws. It is the
+    "widget" of the figure. Subclasses implement the context creation
+    for a specific platform.
+    
+    """
+    
+    def __init__(self, figure, w, h):
+        self.figure = figure
+        self._size = int(w), int(h)
+    
+    
+    @property
+    def size(self):
+        """ Get the size (w, h) of the canvas.
+        """
+        return self._size
+    
+    
+    def Resize(self, w, h):
+        """ Resize(w, h)
+        
+        Set the size of the canvas. Any drawn content is lost.
+        
+        """
+        size = int(w), int(h)
+        if size != self._size:
+            self._size = size
+            self._Resize()
+    
+    
+    def MakeCurrent(self):
+        raise NotImplementedError()
+    
+    def _Resize(self):
+        raise NotImplementedError()
+    
+    def Destroy(self):
+        raise NotImplementedError()
+
+
+class EglCanvas(BaseCanvas):
+    """ EglCanvas(figure, w, h)
+    
+    Offscreen canvas that draws in an EGL pbuffer surface.
+    
+    """
+    
+    def __init__(self, figure, w, h):
+        BaseCanvas.__init__(self, figure, w, h)
+        self._display, self._config = _initializeEgl()
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self._context = EGL.eglCreateContext(self._display, self._config,
+                                            EGL.EGL_NO_CONTEXT, None)
+        self._surface = None
+        self._CreateSurface()
+    
+    
+    def _CreateSurface(self):
+        w, h = self._size
+        attribs = (EGL.EGLint * 5)(EGL.EGL_WIDTH, w, EGL.EGL_HEIGHT, h,
+                                    EGL.EGL_NONE)
+        self._surface = EGL.eglCreatePbufferSurface(self._display,
+                                                    self._config, attribs)
+    
+    
+    def _Resize(self):
+        EGL.eglMakeCurrent(self._display, EGL.EGL_NO_SURFACE,
+                            EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroySurface(self._display, self._surface)
+        self._CreateSurface()
+        self.MakeCurrent()
+    
+    
+    def MakeCurrent(self):
+        EGL.eglMakeCurrent(self._display, self._surface, self._surface,
+                            self._context)
+    
+    
+    def Destroy(self):
+        if self._context is None:
+            return
+        EGL.eglMakeCurrent(self._display, EGL.EGL_NO_SURFACE,
+                            EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroySurface(self._display, self._surface)
+        EGL.eglDestroyContext(self._display, self._context)
+        self._context = self._surface = None
+
+
+class OSMesaCanvas(BaseCanvas):
+    """ OSMesaCanvas(figure, w, h)
+    
+    Offscreen canvas that draws in a buffer in main memory using OSMesa.
+    
+    """
+    
+    def __init__(self, figure, w, h):
+        BaseCanvas.__init__(self, figure, w, h)
+        self._context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA,
+                                                        24, 0, 0, None)
+        if not self._context:
+            raise RuntimeError('Could not create OSMesa context.')
+        self._Resize()
+    
+    
+    def _Resize(self):
+        w, h = self._size
+        self._buffer = arrays.GLubyteArray.zeros((h, w, 4))
+        self.MakeCurrent()
+    
+    
+    def MakeCurrent(self):
+        w, h = self._size
+        osmesa.OSMesaMakeCurrent(self._context, self._buffer,
+                                    gl.GL_UNSIGNED_BYTE, w, h)
+    
+    
+    def Destroy(self):
+        if self._context is None:
+            return
+        osmesa.OSMesaDestroyContext(self._context)
+        self._context = self._buffer = None
+
+
+class Figure(BaseFigure):
+    """ This is the headless implementation of the figure class.
+    
+    A Figure represents the OpenGl context and is the root
+    of the visualization tree; a Figure Wibject does not have a parent.
+    
+    A Figure can be created with the function vv.figure() or vv.gcf().
+    The size of a headless figure is given by visvis.settings.figureSize,
+    and can be changed via its position property.
+    """
+    
+    def __init__(self, size=None):
+        
+        # Create canvas
+        if size is None:
+            size = visvis.settings.figureSize
+        if PLATFORM == 'EGLPlatform':
+            self._widget = EglCanvas(self, *size)
+        else:
+            self._widget = OSMesaCanvas(self, *size)
+        self._drawPending = False
+        
+        # call original init AFTER we created the widget
+        BaseFigure.__init__(self)
+    
+    def _SetCurrent(self):
+        """ make this scene the current context """
+        if self._widget:
+            self._widget.MakeCurrent()
+    
+    def _SwapBuffers(self):
+        """ There is no screen; make sure the drawing is finished """
+        if self._widget:
+            gl.glFinish()
+    
+    def _SetTitle(self, title):
+        """ Set the title of the figure (it is not shown)... """
+        pass
+    
+    def _SetPosition(self, x, y, w, h):
+        """ Set the size of the canvas (the offscreen figure has
+        no location). """
+        if self._widget and (w, h) != self._widget.size:
+            self._widget.Resize(w, h)
+            self._OnResize()
+    
+    def _GetPosition(self):
+        """ Get the position of the canvas. """
+        if self._widget:
+            w, h = self._widget.size
+            return 0, 0, w, h
+        return 0, 0, 0, 0
+    
+    def _RedrawGui(self):
+        # Draw when the events are processed
+        self._drawPending = True
+    
+    def _ProcessGuiEvents(self):
+        app.ProcessEvents()
+    
+    def _Close(self, widget=None):
+        if widget is None:
+            widget = self._widget
+        if widget:
+            widget.Destroy()
+    
+    def _DrawIfPending(self):
+        """ Draw the figure if Draw() or DrawNow() was called. """
+        if self._drawTimer.isRunning:
+            self._drawTimer.Stop()
+            self._drawPending = True
+        if self._drawPending and self._widget:
+            self._drawPending = False
+            self.OnDraw()
+
+
+def newFigure():
+    """ Create a figure and draw it.
+    """
+    figure = Figure()
+    figure.DrawNow()
+    return figure
+
+
+class App(events.App):
+    """ App()
+    
+    Application class to wrap the GUI applications in a class
+    with a simple interface that is the same for all backends.
+    
+    This is the headless implementation. Processing the events draws
+    all figures for which a draw is pending.
+    
+    """
+    
+    def _GetNativeApp(self):
+        return None
+    
+    def _ProcessEvents(self):
+        events.processVisvisEvents()
+        for figure in list(BaseFigure._figures.values()):
+            if isinstance(figure, Figure):
+                figure._DrawIfPending()
+    
+    def _Run(self):
+        # There is no event loop to enter
+        self._ProcessEvents()
+
+
+# Create application instance now
+app = App()
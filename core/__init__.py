@@ -33,6 +33,8 @@ from visvis.core.misc import (Range, settings,
 from visvis.core.events import Timer
 from visvis.core.base import BaseObject, Wibject, Wobject, Position
 from visvis.core.baseTexture import TextureObject, Colormap, Colormapable
+from visvis.core.baseBuffer import BufferObject, PixelReader
+from visvis.core.baseFramebuffer import FramebufferObject
 from visvis.core.shaders import GlslProgram
 
 ## The secondary core (contains important wibjects and wobjects)
@@ -45,6 +47,6 @@ from visvis.core.light import Light
 # Also imported by wobjects and wibjects subpackages
 from visvis.core.axes import AxesContainer, Axes, Legend
 from visvis.core.baseFigure import BaseFigure
-from visvis.core.line import Line, PolarLine
+from visvis.core.line import Line, PolarLine, StreamLine
 from visvis.core.baseWibjects import Box, DraggableBox
 from visvis.text import Text, Label
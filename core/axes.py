@@ -19,7 +19,7 @@ import visvis as vv
 from visvis.core import base
 from visvis.core.base import DRAW_NORMAL, DRAW_FAST, DRAW_SHAPE, DRAW_SCREEN
 from visvis.core.misc import Property, PropWithDraw, DrawAfter
-from visvis.core.misc import Range, getColor, basestring
+from visvis.core.misc import Range, getColor, basestring, getReadBuffer
 #
 from visvis.core.baseWibjects import Box, DraggableBox
 from visvis.core import cameras
@@ -38,7 +38,7 @@ def _Screenshot():
     under the mouse, and by the axes to buffer its content.
     
     """
-    gl.glReadBuffer(gl.GL_BACK)
+    gl.glReadBuffer(getReadBuffer())
     xywh = gl.glGetIntegerv(gl.GL_VIEWPORT)
     x,y,w,h = xywh[0], xywh[1], xywh[2], xywh[3]
     # use floats to prevent strides etc. uint8 caused crash on qt backend.
@@ -391,7 +391,8 @@ class Axes(base.Wibject):
         """ Draw(fast=False)
         
         Calls Draw(fast) on its figure, as the total opengl canvas
-        has to be redrawn. This might change in the future though.
+        has to be redrawn. The axes is marked dirty, so that its contents
+        are drawn anew; other axes can use their buffered contents.
         
         """
         
@@ -735,10 +736,11 @@ class Axes(base.Wibject):
     
     @PropWithDraw
     def useBuffer():
-        """ Get/Set whether to use a buffer; after drawing, a screenshot
-        of the result is obtained and stored. When the axes needs to
-        be redrawn, but has not changed, the buffer can be used to
-        draw the contents at great speed (default True).
+        """ Get/Set whether to use a buffer; the contents are drawn in an
+        offscreen framebuffer of the figure (or, if that is not supported,
+        a screenshot of the result is obtained and stored). When the axes
+        needs to be redrawn, but has not changed, the buffer can be used
+        to draw the contents at great speed (default True).
         """
         def fget(self):
             return self._useBuffer
@@ -827,10 +829,9 @@ class Axes(base.Wibject):
             fig = self.GetFigure()
             w,h = fig.position.size
             
-            # Correction of size for labels is normally done in OnDrawShape,
-            # but this is not called if user interaction is disabled ...
-            if not fig.enableUserInteraction:
-                self._CorrectPositionForLabels()
+            # Correction of size for labels. Also done in OnDrawShape, but
+            # the shapes are only drawn when needed for picking.
+            self._CorrectPositionForLabels()
             
             # Find actual position in pixels, do not allow negative values
             pos = self.position.InPixels()
@@ -846,9 +847,26 @@ class Axes(base.Wibject):
             sshot = self._screenshot
         
         
+        # Use the framebuffer of the figure if we can. Motion blur is
+        # done by combining screenshots though.
+        useBuffer = self._useBuffer and fig.enableUserInteraction
+        usedFramebuffer = False
+        if useBuffer and not self._motionBlur:
+            usedFramebuffer = self._OnDrawWithFramebuffer(mode, bgcolor, pos,
+                                                            pickerHelper)
+        
+        
         # Perform tests
         # Only if enabled on axes and if user interaction is enabled for the figure
-        if self._useBuffer and fig.enableUserInteraction:
+        if usedFramebuffer:
+            
+            # Content is already drawn, we need no screenshot
+            self._screenshot = None
+            shouldUseScreenshot = False
+            blurWithScreenshot = False
+            drawContent = False
+        
+        elif useBuffer:
             
             # Test if we can use the screenshot
             canUseScreenshot = (    (sshot is not None) and
@@ -863,21 +881,23 @@ class Axes(base.Wibject):
             # Test whether we should use the screenshot
             shouldUseScreenshot = ( canUseScreenshot and
                                     (not self._isdirty or blurWithScreenshot) )
+            drawContent = (not shouldUseScreenshot) or blurWithScreenshot
         
         else:
             # Old school mode
             shouldUseScreenshot = False
             blurWithScreenshot = False
+            drawContent = True
         
         
         # Draw content of axes (if we need to)
-        if (not shouldUseScreenshot) or blurWithScreenshot:
+        if drawContent:
             
             # Draw fresh
             self._OnDrawContent(mode, bgcolor, pos, pickerHelper)
             
             # Make screenshot and store/combine
-            if self._useBuffer and fig.enableUserInteraction:
+            if useBuffer:
                 tmp = _Screenshot()
                 shapesMatch = (sshot is not None) and tmp.shape == sshot.shape
                 if blurWithScreenshot and shapesMatch:
@@ -950,6 +970,38 @@ class Axes(base.Wibject):
             self._isdirty = False
     
     
+    def _OnDrawWithFramebuffer(self, mode, bgcolor, pos, pickerHelper=None):
+        # Draw the content of the axes in the framebuffer of the figure,
+        # but only if the axes is dirty or its region in the framebuffer
+        # is no longer valid. Then copy the region to the screen. Returns
+        # False if the framebuffer cannot be used.
+        
+        fig = self.GetFigure()
+        w,h = fig.position.size
+        framebuffer = fig._framebuffer
+        rect = pos.absLeft, h-pos.absBottom, pos.w, pos.h
+        
+        # Bind framebuffer (the viewport is already set)
+        if not framebuffer.Enable(w, h):
+            return False
+        
+        # Draw content if we must. Transparent axes show the figure
+        # background, so the region is cleared like the screen is.
+        key, tag = id(self), fig.bgcolor
+        if self._isdirty or not framebuffer.HasRegion(key, rect, tag):
+            gl.glEnable(gl.GL_SCISSOR_TEST)
+            gl.glScissor(*rect)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+            gl.glDisable(gl.GL_SCISSOR_TEST)
+            self._OnDrawContent(mode, bgcolor, pos, pickerHelper)
+            framebuffer.SetRegion(key, rect, tag)
+        framebuffer.Disable()
+        
+        # Copy to screen
+        framebuffer.DrawRegion(*rect)
+        return True
+    
+    
     def _OnDrawContent(self, mode, bgcolor, pos, pickerHelper=None):
         
         # Draw background
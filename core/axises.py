@@ -26,6 +26,7 @@ import math
 from visvis.utils.pypoints import Pointset, Point
 #
 from visvis.core import base
+from visvis.core.baseBuffer import BufferObject
 from visvis.core.misc import Range, getColor, basestring
 from visvis.core.misc import Property, PropWithDraw, DrawAfter
 #
@@ -467,6 +468,15 @@ class BaseAxis(base.Wobject):
         # text objects or changing the text takes a relatively large amount
         # of time (if done every draw).
         self._textDicts = [{},{},{}]
+        
+        # Buffers to keep the lines and grid lines in OpenGl memory
+        self._lineBuffer = BufferObject(dtype=np.float32)
+        self._gridBuffer = BufferObject(dtype=np.float32)
+        
+        # The lines and labels are only recalculated if the view or the
+        # settings have changed; see _GetLayoutKey()
+        self._layoutKey = None
+        self._layout = None
     
     
     ## Properties
@@ -768,15 +778,21 @@ class BaseAxis(base.Wobject):
         if not axes:
             return
         
-        # Calculate lines and labels (or get from argument)
+        # Calculate lines and labels (or get from argument or from
+        # the previous draw if nothing has changed)
         if ppc_pps_ppg:
             ppc, pps, ppg = ppc_pps_ppg
         else:
-            try:
-                ppc, pps, ppg = self._CreateLinesAndLabels(axes)
-            except Exception:
-                self.Destroy() # So the error message does not repeat itself
-                raise
+            key = self._GetLayoutKey(axes)
+            if key != self._layoutKey:
+                self._layoutKey = None
+                try:
+                    self._layout = self._CreateLinesAndLabels(axes)
+                except Exception:
+                    self.Destroy() # So the error message does not repeat itself
+                    raise
+                self._layoutKey = key
+            ppc, pps, ppg = self._layout
         
         # Store lines to be drawn in screen coordinates
         self._pps = pps
@@ -789,7 +805,9 @@ class BaseAxis(base.Wobject):
         
         # Draw lines
         if len(ppc):
-            gl.glVertexPointerf(ppc.data)
+            self._lineBuffer.SetData(ppc._data)
+            gl.glVertexPointer(3, gl.GL_FLOAT, 0, self._lineBuffer.Enable())
+            self._lineBuffer.Disable()
             gl.glDrawArrays(gl.GL_LINES, 0, len(ppc))
         
         # Draw gridlines
@@ -803,7 +821,9 @@ class BaseAxis(base.Wobject):
                 gl.glEnable(gl.GL_LINE_STIPPLE)
                 gl.glLineStipple(1, stipple)
             # Draw using array
-            gl.glVertexPointerf(ppg.data)
+            self._gridBuffer.SetData(ppg._data)
+            gl.glVertexPointer(3, gl.GL_FLOAT, 0, self._gridBuffer.Enable())
+            self._gridBuffer.Disable()
             gl.glDrawArrays(gl.GL_LINES, 0, len(ppg))
         
         # Clean up
@@ -842,8 +862,53 @@ class BaseAxis(base.Wobject):
         gl.glEnable(gl.GL_LINE_SMOOTH)
 
 
+    def OnDestroyGl(self):
+        # Clean up OpenGl resources.
+        self._lineBuffer.DestroyGl()
+        self._gridBuffer.DestroyGl()
+    
+    
+    def OnDestroy(self):
+        # Clean up any resources.
+        self._lineBuffer.Destroy()
+        self._gridBuffer.Destroy()
+        base.Wobject.OnDestroy(self)
+    
+    
     ## Help methods
     
+    def _GetLayoutKey(self, axes):
+        """ Get a tuple with everything that the lines and labels depend
+        on: the camera and its limits, the transformation to screen
+        coordinates, and the settings of the axis. If the key has not
+        changed since the last draw, the lines and labels are reused.
+        The text objects are also reused when the ticks change, see
+        _CreateLinesAndLabels().
+        """
+        
+        # Camera and limits
+        lims = tuple([(lim.min, lim.max) for lim in axes.GetLimits()])
+        camera = id(axes.camera), lims, tuple(axes.daspect)
+        
+        # Transformation to screen coordinates (as used by gluProject)
+        modelView = gl.glGetDoublev(gl.GL_MODELVIEW_MATRIX)
+        projection = gl.glGetDoublev(gl.GL_PROJECTION_MATRIX)
+        viewport = gl.glGetIntegerv(gl.GL_VIEWPORT)
+        screen = tuple(np.concatenate([ np.ravel(modelView),
+                                        np.ravel(projection),
+                                        np.ravel(viewport) ]))
+        
+        # Settings (ticks can be lists or dicts, so we use the repr)
+        settings = repr(( self._showBox, self._axisColor, self._tickFontSize,
+                    self._xgrid, self._ygrid, self._zgrid,
+                    self._xminorgrid, self._yminorgrid, self._zminorgrid,
+                    self._xticks, self._yticks, self._zticks,
+                    self._xlabel, self._ylabel, self._zlabel,
+                    self._xTicksAngle, self._minTickDist ))
+        
+        return camera, screen, settings
+    
+    
     def _DestroyChildren(self):
         """ Method to clean up the children (text objects).
         """
@@ -1136,15 +1201,11 @@ class CartesianAxis2D(BaseAxis):
                 # Get more gridlines if required
                 if drawMinorGrid[d]:
                     ticks = self._GetTicks(tickUnit/5, lim)
-                # Get positions
-                for tick in ticks:
-                    # Get tick location
-                    p1 = firstCorner.copy()
-                    p1[d] = tick
-                    # Add gridlines
-                    p3 = p1+gv1
-                    #p4 = p3+gv2
-                    ppg.append(p1);  ppg.append(p3)
+                # Get positions of the gridlines (all at once)
+                p1 = np.tile(firstCorner._data, (len(ticks), 1))
+                p1[:,d] = ticks
+                p3 = p1 + gv1._data
+                ppg.append_many(np.hstack([p1, p3]).reshape(-1, 3))
             
             # Apply label
             textDict = self._textDicts[d]
@@ -1359,6 +1420,7 @@ class CartesianAxis3D(BaseAxis):
                 tickUnit = ticks[1] - ticks[0]
             
             # Apply Ticks
+            tickLines = []
             for tick, pos, text in zip(ticks, ticksPos, ticksText):
             
                 # Get little tail to indicate tick
@@ -1366,8 +1428,8 @@ class CartesianAxis3D(BaseAxis):
                 p2 = pos - tv
                 
                 # Add tick lines
-                ppc.append(p1)
-                ppc.append(p2)
+                tickLines.append(p1)
+                tickLines.append(p2)
                 
                 # z-axis has valign=0, thus needs extra space
                 if d==2:
@@ -1397,6 +1459,7 @@ class CartesianAxis3D(BaseAxis):
                     else:
                         t.halign = 1
                         t.valign = -1
+            ppc.append_many(tickLines)
             
             # Get gridlines
             draw4 = self._showBox and isinstance(axes.camera, FlyCamera)
@@ -1404,23 +1467,19 @@ class CartesianAxis3D(BaseAxis):
                 # get more gridlines if required
                 if drawMinorGrid[d]:
                     ticks = self._GetTicks(tickUnit/5, lim)
-                # get positions
-                for tick in ticks:
-                    # get tick location
-                    p1 = firstCorner.copy()
-                    p1[d] = tick
-                    if tick not in [lim.min, lim.max]: # not ON the box
-                        # add gridlines (back and front)
-                        if True:
-                            p3 = p1+gv1
-                            p4 = p3+gv2
-                            ppg.append(p1);  ppg.append(p3)
-                            ppg.append(p3);  ppg.append(p4)
-                        if draw4:
-                            p5 = p1+gv2
-                            p6 = p5+gv1
-                            ppg.append(p1);  ppg.append(p5)
-                            ppg.append(p5);  ppg.append(p6)
+                # get positions (all at once), not ON the box
+                ticks = [tick for tick in ticks if tick not in [lim.min, lim.max]]
+                p1 = np.tile(firstCorner._data, (len(ticks), 1))
+                p1[:,d] = ticks
+                # add gridlines (back and front)
+                p3 = p1 + gv1._data
+                p4 = p3 + gv2._data
+                lines = [p1, p3, p3, p4]
+                if draw4:
+                    p5 = p1 + gv2._data
+                    p6 = p5 + gv1._data
+                    lines += [p1, p5, p5, p6]
+                ppg.append_many(np.hstack(lines).reshape(-1, 3))
             
             # Apply label
             textDict = self._textDicts[d]
@@ -1959,17 +2018,14 @@ class PolarAxis2D(BaseAxis):
                     self._sense * np.linspace(0, 2 * np.pi, 61)
             if drawMinorGrid[1]:
                 ticks = self._GetTicks(tickUnit / 5, self._angularRange)
-            # Get positions
+            # Get positions: a line piece between each two points of
+            # each circle (starting with a zero length piece)
             for tick in ticks:
-                xc = tick * np.cos(theta)
-                yc = tick * np.sin(theta)
-                xlast = xc[:-1][0]
-                ylast = yc[:-1][0]
-                for x, y in np.column_stack((xc, yc)):
-                    ppg.append(Point(xlast, ylast, 0.0))
-                    ppg.append(Point(x, y, 0.0))
-                    xlast = x
-                    ylast = y
+                circle = np.zeros((len(theta), 3), np.float32)
+                circle[:,0] = tick * np.cos(theta)
+                circle[:,1] = tick * np.sin(theta)
+                starts = np.vstack([circle[:1], circle[:-1]])
+                ppg.append_many(np.hstack([starts, circle]).reshape(-1, 3))
 
         # Clean up the text objects that are left
         for tmp in self._textDicts:
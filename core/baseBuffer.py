@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012, Almar Klein
+#
+# Visvis is distributed under the terms of the (new) BSD License.
+# The full license can be found in 'license.txt'.
+
+""" Module baseBuffer
+
+Defines the BufferObject class (which is not a wobject or wibject), which
+wraps an OpenGl vertex buffer object (VBO). Wobjects that draw large
+arrays (lines, meshes, axis) use these so that the data only needs to
+be send to the GPU when it changes, rather than on every draw.
+
+On systems that do not support VBO's (OpenGl < 1.5), the buffer falls
+back to using plain client side arrays.
+
+Also defines the PixelReader class, which uses pixel buffer objects (PBO)
+to read frames from the screen asynchronously, e.g. for recording.
+
+"""
+
+import ctypes
+
+import OpenGL.GL as gl
+import numpy as np
+
+from visvis.core.misc import getOpenGlCapable
+
+
+class BufferObject(object):
+    """ BufferObject(target=GL_ARRAY_BUFFER, dtype=None)
+    
+    Data (a numpy array) that is kept in OpenGl memory in a vertex
+    buffer object. The target should be GL_ARRAY_BUFFER for vertex
+    data (vertices, normals, colors, texture coordinates) or
+    GL_ELEMENT_ARRAY_BUFFER for indices. If dtype is given, the data is
+    converted to that type when uploaded.
+    
+    The buffer keeps track of which part of the data has changed, and
+    only uploads that part when it is enabled. If the data changes size,
+    the buffer is reallocated.
+    
+    Methods:
+      * Enable() upload if necessary and bind the buffer.
+      * Disable() unbind the buffer.
+      * SetData() set the data to keep in the buffer.
+      * SetDirty() indicate that (a part of) the data has changed in place.
+      * DestroyGl() remove only the buffer from OpenGl memory.
+      * Destroy() remove buffer and reference to data.
+    
+    Usage: pass the value returned by Enable() as the pointer argument
+    of glVertexPointer, glDrawElements, etc. It is None (an offset of
+    zero in the bound buffer) if the VBO is used, and the data itself
+    if client side arrays are used.
+    
+    Note: this is not a Wobject nor a Wibject.
+    
+    """
+    
+    def __init__(self, target=None, dtype=None):
+    
+        # The target to bind to
+        if target is None:
+            target = gl.GL_ARRAY_BUFFER
+        self._target = target
+        
+        # The data type to convert the data to (None means as-is)
+        self._dtype = dtype
+        
+        # Buffer ID. This is an integer by which OpenGl identifies the buffer.
+        self._bufferId = 0
+        
+        # A reference to the data as given with SetData. We need this in
+        # order to re-upload the data if it is moved to another context.
+        self._dataRef = None
+        
+        # The number of bytes allocated in OpenGl memory
+        self._nbytes = 0
+        
+        # The ranges of rows (i1, i2) that need to be updated
+        self._dirty = []
+        
+        # A flag to indicate the state
+        # 1 signifies that the buffer must be (re)allocated and uploaded.
+        # -1 signifies the buffer is uploaded ok (but can be dirty).
+        # 0 signifies failure of uploading; client arrays are used.
+        self._uploadFlag = 1
+        
+        # The maximum number of separate regions to upload
+        self._maxRegions = 8
+    
+    
+    @property
+    def data(self):
+        """ Get the data in this buffer (as given to SetData).
+        """
+        return self._dataRef
+    
+    
+    def SetData(self, data):
+        """ SetData(data)
+        
+        Set the data for this buffer. If data is the same array as the
+        current data, this does nothing; use SetDirty() to signal that
+        the contents of the array were changed in place.
+        
+        """
+        
+        # Same data? The caller should use SetDirty().
+        if data is self._dataRef:
+            return
+        
+        # check data
+        if not isinstance(data, np.ndarray):
+            raise ValueError("Data should be a numpy array.")
+        
+        # ok, store data and mark all of it as dirty
+        self._dataRef = data
+        self._dirty = [(0, len(data))]
+    
+    
+    def SetDirty(self, i1=0, i2=None):
+        """ SetDirty(i1=0, i2=None)
+        
+        Indicate that the rows i1 up to i2 (along the first dimension)
+        of the data have been modified in place. If not given, the whole
+        data is marked. The region is uploaded the next time the buffer
+        is enabled. Overlapping regions are combined, and if there are
+        many regions, they are combined into one.
+        
+        """
+        if self._dataRef is None:
+            return
+        
+        # Normalize range
+        n = len(self._dataRef)
+        if i2 is None:
+            i2 = n
+        i1, i2 = max(0, min(i1, n)), max(0, min(i2, n))
+        if i2 <= i1:
+            return
+        
+        # Combine with existing regions that overlap or touch
+        dirty = []
+        for j1, j2 in self._dirty:
+            if j2 < i1 or j1 > i2:
+                dirty.append((j1, j2))
+            else:
+                i1, i2 = min(i1, j1), max(i2, j2)
+        dirty.append((i1, i2))
+        
+        # Many small uploads are slower than one large one
+        if len(dirty) > self._maxRegions:
+            dirty = [(min(r[0] for r in dirty), max(r[1] for r in dirty))]
+        self._dirty = dirty
+    
+    
+    def Enable(self):
+        """ Enable()
+        
+        Bind the buffer, uploading (the dirty part of) the data if
+        necessary. Returns the value to use as pointer argument in the
+        OpenGl call that uses the data. Returns None if there is no data.
+        
+        """
+        
+        data = self._dataRef
+        if data is None:
+            return None
+        
+        # Should we try using a VBO?
+        if self._uploadFlag != 0:
+        
+            # If buffer invalid, tell to upload (e.g. new context)
+            if self._bufferId == 0 or not gl.glIsBuffer(self._bufferId):
+                self._uploadFlag = 1
+            
+            # Upload/update now
+            if self._uploadFlag > 0 or self._dirty:
+                self._SetDataNow()
+        
+        if self._uploadFlag == 0:
+            # Use client side array
+            self._dirty = []
+            return self._GetData(data)
+        else:
+            # Use VBO
+            gl.glBindBuffer(self._target, self._bufferId)
+            return None
+    
+    
+    def Disable(self):
+        """ Disable()
+        
+        Unbind the buffer. It's safe to call this, even if the buffer
+        was not enabled.
+        
+        """
+        if self._uploadFlag != 0:
+            gl.glBindBuffer(self._target, 0)
+    
+    
+    def _GetData(self, data):
+        """ Get the data as a contiguous array of the right type.
+        """
+        if self._dtype is not None:
+            return np.ascontiguousarray(data, dtype=self._dtype)
+        else:
+            return np.ascontiguousarray(data)
+    
+    
+    def _SetDataNow(self):
+        """ Upload the data (or the dirty part of it) to OpenGl memory.
+        """
+        
+        # Can we use VBO's?
+        if not getOpenGlCapable('1.5', 'vertex buffer objects'):
+            self._uploadFlag = 0
+            return
+        
+        data = self._dataRef
+        
+        try:
+            # Create buffer if we must
+            if self._bufferId == 0 or not gl.glIsBuffer(self._bufferId):
+                self._bufferId = gl.glGenBuffers(1)
+                self._uploadFlag = 1
+            gl.glBindBuffer(self._target, self._bufferId)
+            
+            # Determine size of a row, and of the whole data
+            if self._dtype is not None:
+                itemsize = np.dtype(self._dtype).itemsize
+            else:
+                itemsize = data.dtype.itemsize
+            nbytes = data.size * itemsize
+            rowbytes = nbytes // max(1, len(data))
+            
+            if self._uploadFlag > 0 or nbytes != self._nbytes:
+                # (Re)allocate and upload everything
+                gl.glBufferData(self._target, nbytes, self._GetData(data),
+                                gl.GL_DYNAMIC_DRAW)
+                self._nbytes = nbytes
+            else:
+                # Only upload the parts that changed
+                for i1, i2 in self._dirty:
+                    gl.glBufferSubData(self._target, i1*rowbytes,
+                            (i2-i1)*rowbytes, self._GetData(data[i1:i2]))
+            
+            gl.glBindBuffer(self._target, 0)
+            self._uploadFlag = -1
+        
+        except Exception as why:
+            print("Warning: could not create vertex buffer object, " +
+                    "using client side arrays instead: %s" % str(why))
+            self._uploadFlag = 0
+        
+        self._dirty = []
+    
+    
+    def DestroyGl(self):
+        """ DestroyGl()
+        
+        Removes the buffer from OpenGl memory. The internal reference
+        to the original data is kept though.
+        
+        """
+        try:
+            if self._bufferId > 0:
+                gl.glDeleteBuffers(1, [self._bufferId])
+        except Exception:
+            pass
+        self._bufferId = 0
+        self._nbytes = 0
+        if self._uploadFlag != 0:
+            self._uploadFlag = 1
+    
+    
+    def Destroy(self):
+        """ Destroy()
+        
+        Really destroy data.
+        
+        """
+        # remove OpenGl bits
+        self.DestroyGl()
+        # remove internal reference
+        self._dataRef = None
+        self._dirty = []
+    
+    
+    def __del__(self):
+        self.Destroy()
+
+
+def readPixels(x, y, w, h):
+    """ readPixels(x, y, w, h)
+    
+    Read the given region (with the origin in the lower-left) of the
+    current read buffer. Returns a uint8 RGB image with the origin in
+    the upper-left.
+    
+    """
+    # Read RGBA, so that rows are aligned at four bytes
+    im = gl.glReadPixels(x, y, w, h, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+    im = np.frombuffer(im, np.uint8).reshape(h, w, 4)
+    return np.flipud(im)[:,:,:3].copy()
+
+
+class PixelReader(object):
+    """ PixelReader(count=2)
+    
+    Reads frames (regions of the screen) via a ring of count pixel buffer
+    objects. Read() starts the transfer of a frame to a PBO, and returns
+    the frame that was started count-1 reads before, which is done by
+    then. In this way, drawing the next frame is not stalled by reading
+    the previous one. The frames are uint8 RGB images with the origin in
+    the upper-left.
+    
+    Methods:
+      * Read() start reading a frame, and get the oldest one if ready.
+      * Flush() get all frames that are still being read.
+      * DestroyGl() remove the buffers from OpenGl memory.
+      * Destroy() remove the buffers and forget the frames being read.
+    
+    The frames are read from the current read buffer (see glReadBuffer).
+    The buffers belong to the OpenGl context that is current when Read()
+    is first called, so this context should be current in all calls.
+    
+    On systems that do not support PBO's (OpenGl < 2.1), the pixels are
+    read right away, and Read() returns the frame that it was asked for.
+    
+    Note: this is not a Wobject nor a Wibject.
+    
+    """
+    
+    def __init__(self, count=2):
+        
+        # The number of buffers
+        self._count = max(1, int(count))
+        
+        # Buffer IDs, and the index of the buffer to read to next
+        self._bufferIds = []
+        self._index = 0
+        
+        # The reads that are in progress: (bufferId, shape), oldest first
+        self._pending = []
+        
+        # A flag to indicate the state
+        # 1 signifies that the buffers must be created.
+        # -1 signifies the buffers are ok.
+        # 0 signifies failure; the pixels are read right away.
+        self._uploadFlag = 1
+    
+    
+    @property
+    def pendingCount(self):
+        """ Get the number of frames that are still being read.
+        """
+        return len(self._pending)
+    
+    
+    def Read(self, x, y, w, h):
+        """ Read(x, y, w, h)
+        
+        Start reading the given region (with the origin in the lower-left)
+        of the current read buffer. Returns the oldest frame that is being
+        read if all buffers are in use, and None otherwise.
+        
+        """
+        
+        # Can we use PBO's?
+        if self._uploadFlag != 0:
+            if not getOpenGlCapable('2.1', 'pixel buffer objects'):
+                self._uploadFlag = 0
+            elif not self._bufferIds or not gl.glIsBuffer(self._bufferIds[0]):
+                self._CreateNow()
+        if self._uploadFlag == 0:
+            return readPixels(x, y, w, h)
+        
+        # Start reading into the next buffer. Setting the data orphans
+        # the previous storage, so that we need not wait for it.
+        bufferId = self._bufferIds[self._index]
+        self._index = (self._index + 1) % self._count
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, bufferId)
+        gl.glBufferData(gl.GL_PIXEL_PACK_BUFFER, w*h*4, None,
+                        gl.GL_STREAM_READ)
+        gl.glReadPixels(x, y, w, h, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, 0)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._pending.append((bufferId, (h, w)))
+        
+        # Get the oldest frame if all buffers are in use
+        if len(self._pending) >= self._count:
+            return self._GetFrame(*self._pending.pop(0))
+        else:
+            return None
+    
+    
+    def Flush(self):
+        """ Flush()
+        
+        Get a list of the frames that are still being read, oldest first.
+        
+        """
+        pending, self._pending = self._pending, []
+        return [self._GetFrame(bufferId, shape) for bufferId, shape in pending]
+    
+    
+    def _CreateNow(self):
+        """ Create the buffers.
+        """
+        try:
+            self._bufferIds = [int(gl.glGenBuffers(1))
+                                for i in range(self._count)]
+            self._uploadFlag = -1
+        except Exception as why:
+            print("Warning: could not create pixel buffer objects, " +
+                    "reading pixels directly instead: %s" % str(why))
+            self._bufferIds = []
+            self._uploadFlag = 0
+        self._index = 0
+        self._pending = []
+    
+    
+    def _GetFrame(self, bufferId, shape):
+        """ Map the buffer and copy the frame in it. Waits until the
+        frame has been read, if necessary.
+        """
+        h, w = shape
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, bufferId)
+        try:
+            address = gl.glMapBuffer(gl.GL_PIXEL_PACK_BUFFER, gl.GL_READ_ONLY)
+            if not address:
+                raise RuntimeError('Could not map pixel buffer object.')
+            try:
+                data = (ctypes.c_ubyte * (w*h*4)).from_address(address)
+                im = np.frombuffer(data, np.uint8).reshape(h, w, 4)
+                im = np.flipud(im)[:,:,:3].copy()
+            finally:
+                gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+        finally:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        return im
+    
+    
+    def DestroyGl(self):
+        """ DestroyGl()
+        
+        Removes the buffers from OpenGl memory. The frames that are
+        still being read are lost.
+        
+        """
+        try:
+            if self._bufferIds:
+                gl.glDeleteBuffers(len(self._bufferIds), self._bufferIds)
+        except Exception:
+            pass
+        self._bufferIds = []
+        self._pending = []
+        if self._uploadFlag != 0:
+            self._uploadFlag = 1
+    
+    
+    def Destroy(self):
+        """ Destroy()
+        
+        Really destroy the buffers.
+        
+        """
+        self.DestroyGl()
+    
+    
+    def __del__(self):
+        self.Destroy()
@@ -23,7 +23,7 @@ import visvis
 from visvis.core import base
 from visvis.core.base import DRAW_NORMAL, DRAW_FAST, DRAW_SHAPE, DRAW_SCREEN  # noqa
 from visvis.core.misc import Property, PropWithDraw, DrawAfter
-from visvis.core.misc import getOpenGlInfo
+from visvis.core.misc import getOpenGlInfo, getReadBuffer
 from visvis.core import events
 #
 from visvis.core.cameras import ortho
@@ -31,6 +31,7 @@ from visvis.text import BaseText
 from visvis.core.line import MarkerManager
 from visvis.core.axes import _BaseFigure, AxesContainer, Axes, Legend
 from visvis.core.axes import _Screenshot
+from visvis.core.baseFramebuffer import FramebufferObject
 
 
 # a variable to indicate whether to show FPS, for testing
@@ -51,12 +52,21 @@ class ObjectPickerHelper(object):
     approach might be a bit slower, it is easier than the pickmatrix approach
     and allows more control over what objects you want to be able to pick.
     
+    To keep picking fast, the shapes are only drawn (and read back) in
+    a small region around the mouse, and only when the mouse leaves
+    that region or the figure has been redrawn since.
+    
     """
     
+    # The size of the region (in pixels) that is drawn and read back
+    roiSize = 32
+    
     def __init__(self):
         self.bits_r, self.bits_g, self.bits_b = 8, 8, 8
         self.curid = 0
-        self.screen = None  # the screenshot
+        self.screen = None  # the ids in the region of interest
+        self.roi = None # x, y, w, h of that region (origin upper-left)
+        self._objects = {} # id -> weakref to object
     
     def GetId(self):
         """ Get an id.  """
@@ -80,94 +90,103 @@ class ObjectPickerHelper(object):
         return float(idr)/(fr-1), float(idg)/(fg-1), float(idb)/(fb-1)
     
     def GetIdFromColor(self,r,g,b):
-        # get factors
+        # get factors (r, g, b can also be arrays)
         fr, fg, fb = 2**self.bits_r, 2**self.bits_g, 2**self.bits_b
-        idr, idg, idb = int(r*fr), int(g*fg), int(b*fb)
-        #idr, idg, idb = int(r), int(g), int(b)
+        idr = np.round(np.asarray(r) * (fr-1)).astype(np.int64)
+        idg = np.round(np.asarray(g) * (fg-1)).astype(np.int64)
+        idb = np.round(np.asarray(b) * (fb-1)).astype(np.int64)
         id =  (idr*fg + idg)*fb + idb
-        return int(id)
-    
-    def CaptureScreen(self):
-        self.screen = np.flipud( _Screenshot() )
+        if id.ndim == 0:
+            id = int(id)
+        return id
+    
+    def CaptureScreen(self, roi=None, figureHeight=None):
+        """ Read the ids from the given region of the backbuffer (x, y, w, h,
+        with the origin in the upper-left). If not given, the whole viewport
+        is read.
+        """
+        if roi is None:
+            im = _Screenshot()
+            roi = 0, 0, im.shape[1], im.shape[0]
+        else:
+            x, y, w, h = roi
+            gl.glReadBuffer(getReadBuffer())
+            im = gl.glReadPixels(x, figureHeight-y-h, w, h,
+                                    gl.GL_RGB, gl.GL_FLOAT)
+            im = np.asarray(im).reshape(h, w, 3)
+        im = np.flipud(im)
+        self.screen = self.GetIdFromColor(im[:,:,0], im[:,:,1], im[:,:,2])
+        self.roi = roi
     
     def ClearScreen(self):
         self.screen = None
+        self.roi = None
     
     def GetItemsUnderMouse(self, figure):
         """ Detect over which objects the mouse is now.
         """
-        # make sure screen exists
-        if self.screen is None:
-            self.screen = np.zeros((1,1),dtype=np.float32)
         
-        # get shape and position of mouse
-        shape = self.screen.shape
+        # get position of mouse
         x,y = figure.mousepos
+        items = [figure]  # figure is always at the bottom
         
-        # get id of the object under the mouse
-        if x < 0 or x >= shape[1] or y < 0 or y >= shape[0]:
-            id = 0
-        else:
-            clr = self.screen[y, x]
-            id = self.GetIdFromColor(clr[0],clr[1],clr[2])
+        # Draw the shapes around the mouse if we need to
+        if not self._objects:
+            return items
+        if not self._IsInRoi(x, y):
+            figure._DrawShapes(self._GetRoi(figure, x, y))
         
-        # search the object
-        items = [figure]  # figure is always at the bottom
-        if id:
-            self._walkTree(id, figure._children, items)
-            #print(id)
+        # get id of the object under the mouse
+        if not self._IsInRoi(x, y):
+            return items
+        id = self.screen[y-self.roi[1], x-self.roi[0]]
+        
+        # search the object and its parents
+        ob = self._objects.get(id, None)
+        if ob is not None:
+            ob = ob()
+        path = []
+        while ob is not None and ob is not figure:
+            path.insert(0, ob)
+            ob = ob.parent
+        if ob is figure:
+            items.extend(path)
         
         # return result
         return items
     
+    def _IsInRoi(self, x, y):
+        if self.screen is None:
+            return False
+        rx, ry, rw, rh = self.roi
+        return rx <= x < rx + rw and ry <= y < ry + rh
+    
+    def _GetRoi(self, figure, x, y):
+        """ Get the region of interest around the given position, clipped
+        to the figure.
+        """
+        w, h = figure.position.size
+        x1, y1 = max(0, x - self.roiSize//2), max(0, y - self.roiSize//2)
+        x2, y2 = min(w, x1 + self.roiSize), min(h, y1 + self.roiSize)
+        return x1, y1, max(0, x2-x1), max(0, y2-y1)
+    
     
     def AssignIds(self, figure):
         self.curid = 0
+        self._objects = {}
         self._walkTreeAssign(figure._children)
     
     def _walkTreeAssign(self, children):
-        """ The walker to assign ids to all objects.
-        This walker walks in the same order as the walker that
-        searches for the objec given an id. This way we do not
-        have to test each object, but only go down the branches
-        where it is in. """
+        """ The walker to assign ids to all objects, and to store
+        them in a dict so we can quickly find an object by id. """
         for child in children:
             id = self.GetId()
             child._id = id
+            self._objects[id] = child.GetWeakref()
             # proceed to children
             if hasattr(child,'_wobjects'):
                 self._walkTreeAssign(child._wobjects)
             self._walkTreeAssign(child._children)
-    
-    def _walkTree(self, id, children, items):
-        """ The walker. """
-        for i in range(len(children)):
-            # define child and next child
-            child = children[i]
-            child2 = None
-            if i+1 < len(children):
-                child2 = children[i+1]
-            # compare id's
-            if id == child._id:
-                # found it!
-                items.append(child)
-                break
-            elif id > child._id:
-                if not child2:
-                    # last child
-                    items.append(child)
-                    if hasattr(child,'_wobjects'):
-                        self._walkTree(id, child._wobjects, items)
-                    self._walkTree(id, child._children, items)
-                elif id < child2._id:
-                    # the child is a subchild!
-                    items.append(child)
-                    if hasattr(child,'_wobjects'):
-                        self._walkTree(id, child._wobjects, items)
-                    self._walkTree(id, child._children, items)
-                else:
-                    continue
-
 
 
 class BaseFigure(_BaseFigure):
@@ -239,6 +258,9 @@ class BaseFigure(_BaseFigure):
         # To store the markers used in this figure
         self._markerManager = MarkerManager()
         
+        # An offscreen framebuffer in which the axes buffer their contents
+        self._framebuffer = FramebufferObject()
+        
         # keep track of the currently active axes of this figure.
         self._currentAxes = None
         
@@ -653,6 +675,11 @@ class BaseFigure(_BaseFigure):
         self._Close(w)
     
     
+    def OnDestroyGl(self):
+        # Clean up the framebuffer
+        self._framebuffer.DestroyGl()
+    
+    
     def OnDestroy(self):
         # remove from list
         for nr in list(BaseFigure._figures.keys()):
@@ -752,21 +779,10 @@ class BaseFigure(_BaseFigure):
             if 0 in [rb, gb, bb]:
                 raise RuntimeError('OpenGL context not set.')
             
-            # set ids
+            # set ids. The shapes for picking are drawn when the mouse
+            # moves, see _DrawShapes(), so the current ones are invalid now.
             self._pickerHelper.AssignIds(self)
-            
-            # draw shape (to backbuffer)
-            if self._enableUserInteraction:
-                self._Draw(DRAW_SHAPE)
-                gl.glFinish() # call finish, normally swapbuffers does this...
-            
-            # read screen (of backbuffer)
-            # We can improve performance if we do not capture the screen here
-            if self._enableUserInteraction:
-                self._pickerHelper.CaptureScreen()
-            else:
-                self._pickerHelper.ClearScreen()
-            #self._SwapBuffers() # uncomment to see the color coded objects
+            self._pickerHelper.ClearScreen()
             
             # draw picture
             mode = [DRAW_NORMAL, DRAW_FAST][bool(fast)]
@@ -782,6 +798,40 @@ class BaseFigure(_BaseFigure):
             self._isbeingdrawn = False
     
     
+    def _DrawShapes(self, roi):
+        """ _DrawShapes(roi)
+        
+        Draw the shapes of the objects (in the backbuffer) in the given
+        region (x, y, w, h) only, and let the picker helper read the ids.
+        Called by the picker helper when the mouse moves.
+        
+        """
+        
+        # Can we draw?
+        x, y, w, h = roi
+        if self._destroyed or self._isbeingdrawn or not (w>0 and h>0):
+            return
+        
+        self._isbeingdrawn = True
+        try:
+            self._SetCurrent()
+            
+            # Only draw in the region
+            fh = self.position.size[1]
+            gl.glEnable(gl.GL_SCISSOR_TEST)
+            gl.glScissor(x, fh-y-h, w, h)
+            
+            # Draw shapes and read them
+            self._Draw(DRAW_SHAPE)
+            gl.glFinish() # call finish, normally swapbuffers does this...
+            self._pickerHelper.CaptureScreen(roi, fh)
+            #self._SwapBuffers() # uncomment to see the color coded objects
+        
+        finally:
+            gl.glDisable(gl.GL_SCISSOR_TEST)
+            self._isbeingdrawn = False
+    
+    
     def _Draw(self, mode):
         """ _Draw(mode)
         
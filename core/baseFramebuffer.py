@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012, Almar Klein
+#
+# Visvis is distributed under the terms of the (new) BSD License.
+# The full license can be found in 'license.txt'.
+
+""" Module baseFramebuffer
+
+Defines the FramebufferObject class (which is not a wobject or wibject),
+which wraps an OpenGl framebuffer object (FBO) with a color texture and
+a depth buffer. Each figure has one, in which the axes render their
+content. An axes that has not changed since the last draw does not need
+to render its content again, but only copies its region of the
+framebuffer to the screen.
+
+On systems that do not support FBO's (OpenGl < 3.0), the axes fall back
+to using a screenshot of their content.
+
+"""
+
+import OpenGL.GL as gl
+
+from visvis.core.misc import getOpenGlCapable
+
+
+def _regionsOverlap(rect1, rect2):
+    """ Get whether the two rectangles (x, y, w, h) overlap.
+    """
+    x1, y1, w1, h1 = rect1
+    x2, y2, w2, h2 = rect2
+    return x1 < x2+w2 and x2 < x1+w1 and y1 < y2+h2 and y2 < y1+h1
+
+
+class FramebufferObject(object):
+    """ FramebufferObject()
+    
+    An offscreen render target in OpenGl memory, consisting of a color
+    texture and a depth buffer, which has the size of the figure.
+    
+    The framebuffer keeps track of which regions contain valid content,
+    and for what key (e.g. an axes) they were drawn. Drawing a region
+    invalidates all other regions that it overlaps with. All regions
+    become invalid if the framebuffer is resized or recreated.
+    
+    Methods:
+      * Enable() create (or resize) the framebuffer if necessary and bind it.
+      * Disable() bind the framebuffer that was bound before.
+      * HasRegion() get whether a region is valid.
+      * SetRegion() indicate that a region has been drawn.
+      * DrawRegion() draw a region of the color texture to the screen.
+      * DestroyGl() remove the framebuffer from OpenGl memory.
+      * Destroy() remove the framebuffer and forget all regions.
+    
+    Note: this is not a Wobject nor a Wibject.
+    
+    """
+    
+    def __init__(self):
+        
+        # OpenGl ids of the framebuffer, color texture and depth buffer
+        self._framebufferId = 0
+        self._textureId = 0
+        self._depthId = 0
+        
+        # The size of the framebuffer
+        self._shape = (0, 0)
+        
+        # The framebuffer that was bound before Enable() was called
+        self._previousId = 0
+        
+        # The valid regions: key -> (rect, tag)
+        self._regions = {}
+        
+        # A flag to indicate the state
+        # 1 signifies that the framebuffer must be (re)created.
+        # -1 signifies the framebuffer is ok.
+        # 0 signifies failure; the framebuffer cannot be used.
+        self._uploadFlag = 1
+    
+    
+    def Enable(self, w, h):
+        """ Enable(w, h)
+        
+        Bind the framebuffer, creating it if necessary or if its size
+        does not match the given size. Returns False if framebuffer
+        objects are not supported, in which case nothing is bound.
+        
+        """
+        
+        # Can we use FBO's?
+        if self._uploadFlag == 0:
+            return False
+        if not getOpenGlCapable('3.0', 'framebuffer objects'):
+            self._uploadFlag = 0
+            return False
+        
+        # Store what to bind in Disable()
+        self._previousId = int(gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING))
+        
+        # If framebuffer invalid, or of the wrong size, create it
+        if ( self._framebufferId == 0 or self._shape != (w, h) or
+                        not gl.glIsFramebuffer(self._framebufferId) ):
+            self._uploadFlag = 1
+        if self._uploadFlag > 0:
+            self._CreateNow(w, h)
+            if self._uploadFlag == 0:
+                return False
+        
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._framebufferId)
+        return True
+    
+    
+    def Disable(self):
+        """ Disable()
+        
+        Bind the framebuffer that was bound when Enable() was called
+        (usually the default framebuffer).
+        
+        """
+        if self._uploadFlag != 0:
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._previousId)
+    
+    
+    def _CreateNow(self, w, h):
+        """ Create the framebuffer and its attachments.
+        """
+        
+        # Clean up and forget all regions
+        self.DestroyGl()
+        self._regions = {}
+        
+        try:
+            # Color texture
+            self._textureId = gl.glGenTextures(1)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, self._textureId)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D,
+                                gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D,
+                                gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D,
+                                gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D,
+                                gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+            gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA8, w, h, 0,
+                                gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+            
+            # Depth buffer
+            self._depthId = gl.glGenRenderbuffers(1)
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self._depthId)
+            gl.glRenderbufferStorage(gl.GL_RENDERBUFFER,
+                                gl.GL_DEPTH_COMPONENT24, w, h)
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+            
+            # Framebuffer
+            self._framebufferId = gl.glGenFramebuffers(1)
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._framebufferId)
+            gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER,
+                    gl.GL_COLOR_ATTACHMENT0, gl.GL_TEXTURE_2D,
+                    self._textureId, 0)
+            gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER,
+                    gl.GL_DEPTH_ATTACHMENT, gl.GL_RENDERBUFFER, self._depthId)
+            status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._previousId)
+            if status != gl.GL_FRAMEBUFFER_COMPLETE:
+                raise RuntimeError('framebuffer incomplete (%r)' % status)
+            
+            self._shape = (w, h)
+            self._uploadFlag = -1
+        
+        except Exception as why:
+            print("Warning: could not create framebuffer object, " +
+                    "using screenshots instead: %s" % str(why))
+            try:
+                gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._previousId)
+            except Exception:
+                pass
+            self.DestroyGl()
+            self._uploadFlag = 0
+    
+    
+    def HasRegion(self, key, rect, tag=None):
+        """ HasRegion(key, rect, tag=None)
+        
+        Get whether the given region (x, y, w, h in pixels, with the
+        origin in the lower-left) was drawn for the given key and tag,
+        and has not been invalidated since.
+        
+        """
+        return self._regions.get(key) == (tuple(rect), tag)
+    
+    
+    def SetRegion(self, key, rect, tag=None):
+        """ SetRegion(key, rect, tag=None)
+        
+        Indicate that the given region has been drawn for the given key
+        and tag. All other regions that overlap with it become invalid.
+        
+        """
+        rect = tuple(rect)
+        for otherKey, (otherRect, dummy) in list(self._regions.items()):
+            if _regionsOverlap(rect, otherRect):
+                self._regions.pop(otherKey)
+        self._regions[key] = rect, tag
+    
+    
+    def DrawRegion(self, x, y, w, h):
+        """ DrawRegion(x, y, w, h)
+        
+        Draw the given region of the color texture at the same position
+        in the currently bound framebuffer. The region is copied as-is
+        (no blending, depth test or lighting). Sets the viewport and the
+        projection and modelview matrices.
+        
+        """
+        if self._uploadFlag >= 0:
+            return
+        
+        # Texture coordinates of the region
+        W, H = self._shape
+        u1, v1 = float(x)/W, float(y)/H
+        u2, v2 = float(x+w)/W, float(y+h)/H
+        
+        # Set view
+        gl.glViewport(x, y, w, h)
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glLoadIdentity()
+        gl.glOrtho(0, 1, 0, 1, -1, 1)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glLoadIdentity()
+        
+        # Prepare
+        gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_TEXTURE_BIT)
+        gl.glDisable(gl.GL_BLEND)
+        gl.glDisable(gl.GL_DEPTH_TEST)
+        gl.glDisable(gl.GL_LIGHTING)
+        gl.glEnable(gl.GL_TEXTURE_2D)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self._textureId)
+        gl.glTexEnvi(gl.GL_TEXTURE_ENV, gl.GL_TEXTURE_ENV_MODE, gl.GL_REPLACE)
+        
+        # Draw
+        gl.glBegin(gl.GL_QUADS)
+        gl.glTexCoord2f(u1, v1)
+        gl.glVertex2f(0, 0)
+        gl.glTexCoord2f(u2, v1)
+        gl.glVertex2f(1, 0)
+        gl.glTexCoord2f(u2, v2)
+        gl.glVertex2f(1, 1)
+        gl.glTexCoord2f(u1, v2)
+        gl.glVertex2f(0, 1)
+        gl.glEnd()
+        
+        # Clean up
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glPopAttrib()
+    
+    
+    def DestroyGl(self):
+        """ DestroyGl()
+        
+        Removes the framebuffer (and its attachments) from OpenGl memory.
+        Because the content is lost, all regions become invalid.
+        
+        """
+        try:
+            if self._framebufferId > 0:
+                gl.glDeleteFramebuffers(1, [self._framebufferId])
+            if self._depthId > 0:
+                gl.glDeleteRenderbuffers(1, [self._depthId])
+            if self._textureId > 0:
+                gl.glDeleteTextures([self._textureId])
+        except Exception:
+            pass
+        self._framebufferId = self._textureId = self._depthId = 0
+        self._shape = (0, 0)
+        self._regions = {}
+        if self._uploadFlag != 0:
+            self._uploadFlag = 1
+    
+    
+    def Destroy(self):
+        """ Destroy()
+        
+        Really destroy the framebuffer.
+        
+        """
+        self.DestroyGl()
+    
+    
+    def __del__(self):
+        self.Destroy()
@@ -19,6 +19,7 @@ import OpenGL.GL as gl
 import numpy as np
 
 from visvis.core.misc import getOpenGlCapable, PropWithDraw, Range
+from visvis.core.pyramid import Pyramid
 
 
 # Dict that maps numpy datatypes to openGL data types
@@ -355,21 +356,24 @@ class TextureObject(object):
             # Bind to texture
             gl.glBindTexture(self._texType, self._texId)
             
-            # Should we make the image a power of two?
-            if needPadding:
-                data2 = makePowerOfTwo(data, self._ndim)
-                if data2 is not data:
+            # test whether it fits, downsample if necessary. The padding
+            # (if required) is applied to the level that is tested, so
+            # that we do not downsample a padded array.
+            pyramid = Pyramid(data, self._ndim)
+            ok, count, padded = False, 0, False
+            while True:
+                data = pyramid.GetLevel(count)
+                # Should we make the image a power of two?
+                if needPadding:
+                    data2 = makePowerOfTwo(data, self._ndim)
+                    padded = padded or (data2 is not data)
                     data = data2
-                    print("Warning: the data was padded to make it a power of two.")
-            
-            # test whether it fits, downsample if necessary
-            ok, count = False, 0
-            while not ok and count<8:
                 ok = self._TestUpload(data, internalformat,format,gltype)
-                if not ok:
-                    #if count<2 and data.shape[0]<1000: # for testing
-                    data = downSample(data, self._ndim)
-                    count += 1
+                if ok or count == 8:
+                    break
+                count += 1
+            if padded:
+                print("Warning: the data was padded to make it a power of two.")
             
             # give warning or error
             if count and not ok:
@@ -25,6 +25,8 @@ from visvis.utils.pypoints import Pointset, is_Pointset
 from visvis.core.misc import PropWithDraw, DrawAfter, basestring
 from visvis.core.misc import Range, getColor, getOpenGlCapable
 from visvis.core.base import Wobject
+from visvis.core.baseBuffer import BufferObject
+from visvis.core.cameras import TwoDCamera
 
 
 # int('1010101010101010',2)  int('1100110011001100',2)
@@ -328,6 +330,192 @@ class MarkerManager:
         return d, sprite1, sprite2
 
 
+class MinMaxPyramid(object):
+    """ MinMaxPyramid(values, blockSize=16)
+    
+    A multi-resolution representation of a 1D array, to quickly find
+    the location of the minimum and maximum value in a range of elements.
+    The first level stores for each block of blockSize elements the
+    index of the minimum and maximum; each next level combines two
+    blocks of the previous level. Non-finite values are ignored, but the
+    borders of each run of non-finite values are stored (see gaps).
+    
+    The pyramid uses about 4/blockSize times the memory of the values.
+    A reference to the values is kept (not a copy), so the values
+    should not be changed.
+    
+    """
+    
+    def __init__(self, values, blockSize=16):
+        
+        values = np.asarray(values)
+        if values.ndim != 1:
+            raise ValueError('MinMaxPyramid needs 1D values.')
+        self._values = values
+        self._blockSize = B = max(1, int(blockSize))
+        
+        # Get index type
+        n = len(values)
+        itype = np.int32
+        if n >= 2**31:
+            itype = np.int64
+        
+        # Get indices and values for the first level, in chunks to limit
+        # the amount of memory used.
+        nblocks = (n + B - 1) // B
+        imin = np.zeros((nblocks,), dtype=itype)
+        imax = np.zeros((nblocks,), dtype=itype)
+        chunkSize = B * 2**16
+        gaps, lastValid = [], True
+        for i1 in range(0, n, chunkSize):
+            chunk = values[i1:i1+chunkSize]
+            nb = (len(chunk) + B - 1) // B
+            valid = np.isfinite(chunk)
+            # Find where runs of non-finite values start and stop
+            changes = np.flatnonzero(valid[1:] != valid[:-1]) + 1
+            if valid[0] != lastValid:
+                changes = np.append(0, changes)
+            gaps.append(i1 + changes)
+            lastValid = valid[-1]
+            lo = np.full((nb*B,), np.inf)
+            hi = np.full((nb*B,), -np.inf)
+            lo[:len(chunk)] = np.where(valid, chunk, np.inf)
+            hi[:len(chunk)] = np.where(valid, chunk, -np.inf)
+            offset = i1 + np.arange(nb) * B
+            b1 = i1 // B
+            imin[b1:b1+nb] = offset + lo.reshape(nb, B).argmin(1)
+            imax[b1:b1+nb] = offset + hi.reshape(nb, B).argmax(1)
+        imin = np.minimum(imin, max(n-1, 0)) # Last block may be partial
+        imax = np.minimum(imax, max(n-1, 0))
+        if gaps:
+            self._gaps = np.concatenate(gaps).astype(itype)
+        else:
+            self._gaps = np.zeros((0,), itype)
+        
+        # Build levels. For the max, we store the negative values, so
+        # we can use the same code for min and max.
+        self._levels = [], []
+        for sign, I in [(1, imin), (-1, imax)]:
+            V = sign * values[I]
+            V[~np.isfinite(V)] = np.inf
+            levels = self._levels[sign < 0]
+            levels.append((I, V))
+            while len(I) > 1:
+                if len(I) % 2:
+                    I, V = np.append(I, I[-1]), np.append(V, V[-1])
+                second = V[1::2] < V[0::2]
+                I = np.where(second, I[1::2], I[0::2])
+                V = np.where(second, V[1::2], V[0::2])
+                levels.append((I, V))
+    
+    
+    @property
+    def gaps(self):
+        """ Get the indices at which the values change from finite to
+        non-finite or vice versa, i.e. the first index of each run of
+        non-finite values and the index directly after it.
+        """
+        return self._gaps
+    
+    
+    def Query(self, starts, stops):
+        """ Query(starts, stops)
+        
+        Get the indices of the minimum and maximum value in each range
+        of elements given by the arrays starts and stops (stop exclusive).
+        Each range should contain at least one element. Returns a tuple
+        of two index arrays.
+        
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        return self._Query(starts, stops, 1), self._Query(starts, stops, -1)
+    
+    
+    def _Query(self, starts, stops, sign):
+        
+        values, B = self._values, self._blockSize
+        levels = self._levels[sign < 0]
+        bestI = starts.copy()
+        bestV = np.full(starts.shape, np.inf)
+        
+        def update(sel, I, V):
+            better = sel & (V < bestV)
+            bestI[better] = I[better]
+            bestV[better] = V[better]
+        
+        # Range in full blocks
+        a = -(-starts // B)
+        b = stops // B
+        
+        # The elements before the first and after the last full block
+        headStops = np.minimum(stops, a * B)
+        tailStarts = np.maximum(headStops, b * B)
+        for s, e in [(starts, headStops), (tailStarts, stops)]:
+            for i in range(B):
+                sel = s + i < e
+                I = np.where(sel, s + i, 0)
+                V = sign * values[I].astype(np.float64)
+                V[~np.isfinite(V)] = np.inf
+                update(sel, I, V)
+        
+        # The blocks, like a segment tree: at each level, take the blocks
+        # at the edges that cannot be combined in the next level.
+        for I, V in levels:
+            sel = (a < b) & (a % 2 == 1)
+            j = np.where(sel, a, 0)
+            update(sel, I[j], V[j])
+            a = a + sel
+            sel = (a < b) & (b % 2 == 1)
+            j = np.where(sel, b - 1, 0)
+            update(sel, I[j], V[j])
+            b = b - sel
+            a, b = a // 2, b // 2
+            if not (a < b).any():
+                break
+        
+        return bestI
+
+
+def decimateMinMax(x, pyramid, x0, x1, ncols):
+    """ decimateMinMax(x, pyramid, x0, x1, ncols)
+    
+    Get the indices of the points that are needed to draw a line, for
+    which the x coordinates are monotonically increasing, in ncols
+    pixel columns between x0 and x1, such that it looks the same as
+    when all points are drawn. The pyramid should be a MinMaxPyramid
+    of the y coordinates.
+    
+    For each column, the first, last, lowest and highest point are
+    selected. The points directly outside of the range are included
+    too, so the line continues outside of the view. So are the points
+    at the borders of each run of non-finite values (see
+    MinMaxPyramid.gaps), so that gaps in the line are kept.
+    
+    """
+    n = len(x)
+    
+    # Get for each column the range of points in it
+    edges = np.searchsorted(x, np.linspace(x0, x1, ncols+1))
+    starts, stops = edges[:-1], edges[1:]
+    sel = stops > starts
+    starts, stops = starts[sel], stops[sel]
+    
+    # Select points
+    imin, imax = pyramid.Query(starts, stops)
+    
+    # Select the points around each gap in the view
+    gaps = pyramid.gaps
+    gaps = gaps[np.searchsorted(gaps, edges[0]-1):
+                np.searchsorted(gaps, edges[-1], 'right')]
+    
+    I = np.concatenate([ [edges[0]-1, edges[-1]],
+                         starts, stops-1, imin, imax, gaps-1, gaps ])
+    I = I[(I >= 0) & (I < n)]
+    return np.unique(I)
+
+
+
 class Line(Wobject):
     """ Line(parent, points)
 
@@ -351,6 +539,19 @@ class Line(Wobject):
     """
 
     def __init__(self, parent, points):
+        
+        # Buffer to keep the points in OpenGl memory. Created before
+        # initializing the wobject, because setting the parent draws.
+        self._pointsBuffer = BufferObject(dtype=np.float32)
+        self._vertexCount = 0
+        
+        # For decimation: the pyramid (None if not yet calculated, False if
+        # the points are not suited), and the last decimated points.
+        self._decimate = True
+        self._pyramid = None
+        self._decimated = None
+        self._decimatedBuffer = BufferObject(dtype=np.float32)
+        
         Wobject.__init__(self, parent)
         
         # Store points
@@ -536,6 +737,21 @@ class Line(Wobject):
             self._alpha1 = self._AsFloat(value, 'alpha')
         return locals()
     
+    @PropWithDraw
+    def decimate():
+        """ Get/Set whether the line may be decimated when drawn in a 2D
+        camera. If the line has (many) more points than there are pixels,
+        only the first, last, lowest and highest point in each pixel
+        column are drawn, which looks the same, but is much faster.
+        This applies only to solid lines of which the x coordinates are
+        increasing (e.g. time series). Markers are never decimated.
+        """
+        def fget(self):
+            return self._decimate
+        def fset(self, value):
+            self._decimate = bool(value)
+        return locals()
+    
     ## Set methods
 
     @DrawAfter
@@ -608,6 +824,15 @@ class Line(Wobject):
         """
         return self._points
     
+    
+    def Draw(self, fast=False):
+        # The points may have been changed in place (via the points
+        # property), so make sure they are uploaded again.
+        self._pointsBuffer.SetDirty()
+        self._pyramid = self._decimated = None
+        return Wobject.Draw(self, fast)
+    Draw.__doc__ = Wobject.Draw.__doc__
+    
 
     ## Draw methods
 
@@ -647,6 +872,85 @@ class Line(Wobject):
         #gl.glDisable(gl.GL_BLEND)
 
 
+    def _EnableVertexArray(self, decimate=False):
+        """ Enable the vertex array, using the buffer with points. Note
+        that the buffer holds the whole (preallocated) array of the
+        pointset, so that appending points does not require reallocating.
+        If decimate is True, the decimated points are used if applicable.
+        """
+        pp = None
+        if decimate:
+            pp = self._GetDecimatedPoints()
+        if pp is None:
+            buffer = self._pointsBuffer
+            buffer.SetData(self._points._data)
+            self._vertexCount = len(self._points)
+        else:
+            buffer = self._decimatedBuffer
+            buffer.SetData(pp)
+            self._vertexCount = len(pp)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(3, gl.GL_FLOAT, 0, buffer.Enable())
+        buffer.Disable()
+    
+    
+    def _DrawArrays(self, method):
+        """ Draw the points using the given method (GL_LINE_STRIP,
+        GL_LINES or GL_POINTS). The vertex array should be enabled.
+        """
+        gl.glDrawArrays(method, 0, self._vertexCount)
+    
+    
+    def _GetDecimatedPoints(self):
+        """ Get the points to draw the line with when it is decimated
+        (see the decimate property), for the current view. Returns None
+        if decimation does not apply.
+        """
+        
+        # Only for solid opaque lines in a 2D camera
+        if not (self._decimate and self.ls == '-' and self._alpha1 == 1):
+            return None
+        axes = self.GetAxes()
+        if not axes or not isinstance(axes.camera, TwoDCamera):
+            return None
+        
+        # Only if there are much more points than pixel columns
+        ncols = int(gl.glGetIntegerv(gl.GL_VIEWPORT)[2])
+        if ncols < 1 or len(self._points) <= 4 * ncols:
+            return None
+        
+        # Get how x maps to the screen. OpenGL matrices are column-major,
+        # hence the order. The screen x should depend on x only.
+        modelview = gl.glGetDoublev(gl.GL_MODELVIEW_MATRIX)
+        projection = gl.glGetDoublev(gl.GL_PROJECTION_MATRIX)
+        M = np.dot( np.asarray(modelview).reshape(4,4),
+                    np.asarray(projection).reshape(4,4) )
+        if M[0,0] == 0 or M[1,0] or M[2,0] or M[0,3] or M[1,3] or M[2,3]:
+            return None
+        
+        # Get range of x that is visible (normalized device coords -1 to 1)
+        x0, x1 = [(ndc*M[3,3] - M[3,0]) / M[0,0] for ndc in (-1.0, 1.0)]
+        x0, x1 = min(x0, x1), max(x0, x1)
+        
+        # Get pyramid; the x coordinates should be increasing
+        pp = self._points.data
+        if self._pyramid is None:
+            x = pp[:,0]
+            if np.isfinite(x).all() and (x[1:] >= x[:-1]).all():
+                self._pyramid = MinMaxPyramid(pp[:,1])
+            else:
+                self._pyramid = False
+        if self._pyramid is False:
+            return None
+        
+        # Decimate (or use result from last time)
+        key = x0, x1, ncols
+        if self._decimated is None or self._decimated[0] != key:
+            I = decimateMinMax(pp[:,0], self._pyramid, x0, x1, ncols)
+            self._decimated = key, pp[I]
+        return self._decimated[1]
+
+
     def _DrawLines(self):
 
         # set stipple style
@@ -662,8 +966,7 @@ class Line(Wobject):
             gl.glDisable(gl.GL_LINE_STIPPLE)
 
         # init vertex array
-        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glVertexPointerf(self._points.data)
+        self._EnableVertexArray(True)
         
         # linepieces drawn on top of other should draw just fine. See issue #95
         gl.glDepthFunc(gl.GL_LEQUAL)
@@ -690,7 +993,7 @@ class Line(Wobject):
             method = gl.GL_LINE_STRIP
             if self.ls == '+':
                 method = gl.GL_LINES
-            gl.glDrawArrays(method, 0, len(self._points))
+            self._DrawArrays(method)
             # flush!
             gl.glFlush()
 
@@ -730,8 +1033,7 @@ class Line(Wobject):
             gl.glDisable(gl.GL_DEPTH_TEST)
 
         # init vertex array
-        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glVertexPointerf(self._points.data)
+        self._EnableVertexArray()
 
         # points drawn on top of points should draw (because we draw
         # the face and edge seperately)
@@ -756,7 +1058,7 @@ class Line(Wobject):
             if drawFace:
                 gl.glColor3f(clr1[0],clr1[1],clr1[2])
                 gl.glPointSize(self.mw)
-                gl.glDrawArrays(gl.GL_POINTS, 0, len(self._points))
+                self._DrawArrays(gl.GL_POINTS)
 
         elif self.ms in ['o','.','s'] and drawFace and self.alpha==1:
             # Use standard OpenGL points, faster and anti-aliased
@@ -772,12 +1074,12 @@ class Line(Wobject):
             if drawEdge:
                 gl.glColor3f(clr2[0],clr2[1],clr2[2])
                 gl.glPointSize(self.mw+self.mew*2)
-                gl.glDrawArrays(gl.GL_POINTS, 0, len(self._points))
+                self._DrawArrays(gl.GL_POINTS)
             # draw faces
             if drawFace:
                 gl.glColor3f(clr1[0],clr1[1],clr1[2])
                 gl.glPointSize(self.mw)
-                gl.glDrawArrays(gl.GL_POINTS, 0, len(self._points))
+                self._DrawArrays(gl.GL_POINTS)
 
         #elif self.alpha>0:
         else:
@@ -792,12 +1094,12 @@ class Line(Wobject):
             if drawEdge:
                 sprite2.Enable()
                 gl.glColor3f(clr2[0],clr2[1],clr2[2])
-                gl.glDrawArrays(gl.GL_POINTS, 0, len(self._points))
+                self._DrawArrays(gl.GL_POINTS)
             # draw points for the faces
             if drawFace:
                 sprite1.Enable()
                 gl.glColor3f(clr1[0],clr1[1],clr1[2])
-                gl.glDrawArrays(gl.GL_POINTS, 0, len(self._points))
+                self._DrawArrays(gl.GL_POINTS)
             
             # disable sprites
             sprite1.Disable() # Could as well have used sprite2
@@ -821,10 +1123,6 @@ class Line(Wobject):
         gl.glDisable(gl.GL_LINE_STIPPLE)
         gl.glDisable(gl.GL_POINT_SMOOTH)
 
-        # init vertex array
-        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glVertexPointerf(self._points.data)
-
         # detect which parts to draw
         drawLine, drawMarker = False, False
         if self.lw and self.ls and getColor(self.lc):
@@ -832,12 +1130,15 @@ class Line(Wobject):
         if self.mw and self.ms:
             drawMarker = True
 
+        # init vertex array (markers need all points)
+        self._EnableVertexArray(not drawMarker)
+
         if drawLine:
             # set width and color
             gl.glLineWidth(self.lw)
             gl.glColor3f(clr[0], clr[1], clr[2])
             # draw
-            gl.glDrawArrays(gl.GL_LINE_STRIP, 0, len(self._points))
+            self._DrawArrays(gl.GL_LINE_STRIP)
             gl.glFlush()
 
         if drawMarker:
@@ -848,16 +1149,25 @@ class Line(Wobject):
             gl.glColor3f(clr[0],clr[1],clr[2])
             gl.glPointSize(w)
             # draw
-            gl.glDrawArrays(gl.GL_POINTS, 0, len(self._points))
+            self._DrawArrays(gl.GL_POINTS)
             gl.glFlush()
 
         # clean up
         gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
 
 
+    def OnDestroyGl(self):
+        # Clean up OpenGl resources.
+        self._pointsBuffer.DestroyGl()
+        self._decimatedBuffer.DestroyGl()
+    
+    
     def OnDestroy(self):
         # clean up some memory
         self._points.clear()
+        self._pointsBuffer.Destroy()
+        self._decimatedBuffer.Destroy()
+        self._pyramid = self._decimated = None
 
 
 # This is a new type of wobject called PolarLine which encapsulates
@@ -931,6 +1241,258 @@ class PolarLine(Line):
 
 
 
+class StreamLine(Line):
+    """ StreamLine(parent, capacity, points=None)
+    
+    The StreamLine class is a line for live data, to which points can
+    be appended efficiently. The points are stored in a ring buffer with
+    a fixed capacity; when more points are appended, the oldest points
+    are discarded.
+    
+    Appending takes constant time per point: only the new points are
+    uploaded to OpenGl memory, and the limits are maintained per block
+    of points, so that only the blocks that changed are recalculated.
+    
+    The StreamLine has the same properties as the Line class. Note
+    that the points property returns a copy, and that the '+' line
+    style does not work well once the buffer has wrapped around.
+    
+    """
+    
+    # The number of points in a block for which the limits are stored
+    _blockSize = 1024
+    
+    def __init__(self, parent, capacity, points=None):
+        
+        # Check capacity
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError('The capacity of a StreamLine must be positive.')
+        self._capacity = capacity
+        
+        # The ring buffer, and the index at which the next point is stored
+        self._ring = np.empty((capacity, 3), dtype=np.float32)
+        self._head = 0
+        
+        # The total amount of points appended (for 1D data)
+        self._total = 0
+        
+        # The limits of each block of points
+        nblocks = (capacity + self._blockSize - 1) // self._blockSize
+        self._blockMins = np.empty((nblocks, 3), dtype=np.float32)
+        self._blockMaxs = np.empty((nblocks, 3), dtype=np.float32)
+        
+        # Init
+        if points is None:
+            points = np.zeros((0, 3), dtype=np.float32)
+        Line.__init__(self, parent, points)
+    
+    
+    @property
+    def capacity(self):
+        """ Get the maximum amount of points that this line holds.
+        """
+        return self._capacity
+    
+    
+    @DrawAfter
+    def SetPoints(self, points):
+        """ SetPoints(points)
+        
+        Remove all points and append the given points. Accepts the same
+        arguments as Append().
+        
+        """
+        # Reset ring buffer. The pointset uses the ring buffer as its
+        # data, such that the drawing methods of the Line class work.
+        self._ring.fill(np.inf)
+        self._blockMins.fill(np.nan)
+        self._blockMaxs.fill(np.nan)
+        self._head = self._total = 0
+        self._points = Pointset(3)
+        self._points._data = self._ring
+        self._pointsBuffer.SetData(self._ring)
+        self._pointsBuffer.SetDirty()
+        
+        # Add points
+        self.Append(points)
+    
+    
+    @DrawAfter
+    def Append(self, points):
+        """ Append(points)
+        
+        Append one or more points to the line. The given argument can be
+        anything that can be converted to a pointset. For 1D data, the
+        values are the y coordinates, and the x coordinates are the
+        indices (counting all points that were ever appended).
+        
+        """
+        
+        # Get points as Nx3 array
+        data = self._AsPoints(points)
+        k = len(data)
+        if not k:
+            return
+        self._total += k
+        
+        # If there are more points than fit, only add the last ones
+        cap = self._capacity
+        if k > cap:
+            self._head = (self._head + k - cap) % cap
+            data, k = data[-cap:], cap
+        
+        # Store in ring buffer, in two parts if we wrap around
+        i1 = self._head
+        n1 = min(k, cap - i1)
+        self._ring[i1:i1+n1] = data[:n1]
+        self._ring[:k-n1] = data[n1:]
+        self._head = (i1 + k) % cap
+        self._points._len = min(cap, self._points._len + k)
+        
+        # Update buffer and limits
+        self._UpdateRegion(i1, i1+n1)
+        if k > n1:
+            self._UpdateRegion(0, k-n1)
+    
+    
+    @DrawAfter
+    def SetXdata(self, data):
+        """ SetXdata(data)
+        
+        Set the x coordinates of the points of the line.
+        
+        """
+        self._SetColumn(0, data)
+    
+    @DrawAfter
+    def SetYdata(self, data):
+        """ SetYdata(data)
+        
+        Set the y coordinates of the points of the line.
+        
+        """
+        self._SetColumn(1, data)
+    
+    @DrawAfter
+    def SetZdata(self, data):
+        """ SetZdata(data)
+        
+        Set the z coordinates of the points of the line.
+        
+        """
+        self._SetColumn(2, data)
+    
+    
+    @property
+    def points(self):
+        """ Get a copy of the points of the line (from oldest to newest)
+        as a 3D pointset.
+        """
+        return Pointset(self._GetOrderedData())
+    
+    
+    def Draw(self, fast=False):
+        # The points cannot be changed in place, so unlike Line, there is
+        # no need to upload all points.
+        return Wobject.Draw(self, fast)
+    Draw.__doc__ = Wobject.Draw.__doc__
+    
+    
+    def _AsPoints(self, points):
+        """ Convert the given points to a Nx3 float32 array.
+        """
+        if is_Pointset(points):
+            points = points.data
+        points = np.asarray(handleInvalidValues(points), dtype=np.float32)
+        if points.ndim == 1:
+            points = points.reshape(-1, 1)
+        if points.ndim != 2 or points.shape[1] not in (1, 2, 3):
+            raise ValueError('StreamLine points should be 1D, 2D or 3D.')
+        
+        # Add x and/or z dimension
+        N = points.shape[0]
+        if points.shape[1] == 1:
+            xx = np.arange(self._total, self._total+N, dtype=np.float32)
+            points = np.column_stack([xx, points[:,0]])
+        if points.shape[1] == 2:
+            zz = 0.1*np.ones((N,1), dtype=np.float32)
+            points = np.concatenate((points, zz), 1)
+        return points
+    
+    
+    def _GetOrderedData(self):
+        """ Get the points in order (from oldest to newest).
+        """
+        n = self._points._len
+        if n < self._capacity:
+            return self._ring[:n]
+        else:
+            return np.concatenate((self._ring[self._head:],
+                                    self._ring[:self._head]))
+    
+    
+    def _SetColumn(self, column, data):
+        """ Set one coordinate of all points (from oldest to newest).
+        """
+        n = self._points._len
+        I = np.arange(n)
+        if n == self._capacity:
+            I = (I + self._head) % n
+        self._ring[I, column] = handleInvalidValues(data)
+        self._UpdateRegion(0, n)
+    
+    
+    def _UpdateRegion(self, i1, i2):
+        """ Mark the points from i1 to i2 in the ring buffer as changed:
+        update them in OpenGl memory and recalculate the limits of the
+        blocks that contain them.
+        """
+        self._pointsBuffer.SetDirty(i1, i2)
+        
+        B = self._blockSize
+        for b in range(i1 // B, (i2 - 1) // B + 1):
+            block = self._ring[b*B:(b+1)*B]
+            block = block[np.isfinite(block).all(1)]
+            if len(block):
+                self._blockMins[b] = block.min(0)
+                self._blockMaxs[b] = block.max(0)
+            else:
+                self._blockMins[b] = np.nan
+                self._blockMaxs[b] = np.nan
+    
+    
+    def _GetLimits(self):
+        """ Get the limits in world coordinates between which the object
+        exists. Calculated from the limits of each block.
+        """
+        valid = np.isfinite(self._blockMins[:,0])
+        if not valid.any():
+            return None
+        x1, y1, z1 = self._blockMins[valid].min(0)
+        x2, y2, z2 = self._blockMaxs[valid].max(0)
+        return Wobject._GetLimits(self, x1, x2, y1, y2, z1, z2)
+    
+    
+    def _GetDecimatedPoints(self):
+        # The points in the ring buffer are not ordered
+        return None
+    
+    
+    def _DrawArrays(self, method):
+        n, head = len(self._points), self._head
+        if n < self._capacity or head == 0:
+            gl.glDrawArrays(method, 0, n)
+        else:
+            # The buffer has wrapped around, draw oldest and newest part
+            gl.glDrawArrays(method, head, n - head)
+            gl.glDrawArrays(method, 0, head)
+            if method == gl.GL_LINE_STRIP:
+                # Connect the two parts
+                I = np.array([n-1, 0], dtype=np.uint32)
+                gl.glDrawElements(gl.GL_LINES, 2, gl.GL_UNSIGNED_INT, I)
+
+
 def handleInvalidValues(values):
     """ handleInvalidValues(values)
     
@@ -129,6 +129,22 @@ def getOpenGlCapable(version, what=None):
         return False
 
 
+def getReadBuffer(front=False):
+    """ getReadBuffer(front=False)
+    
+    Get the buffer to read pixels from: the back buffer (in which visvis
+    draws), or the front buffer (what is shown on screen) if front is
+    True. Single buffered contexts (such as those of the headless
+    backend) only have the buffer that is drawn to, which is returned
+    in that case.
+    
+    """
+    if gl.glGetBooleanv(gl.GL_DOUBLEBUFFER):
+        return [gl.GL_BACK, gl.GL_FRONT][bool(front)]
+    else:
+        return int(gl.glGetIntegerv(gl.GL_DRAW_BUFFER))
+
+
 ## Decorators
 
 
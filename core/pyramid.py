@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012, Almar Klein
+#
+# Visvis is distributed under the terms of the (new) BSD License.
+# The full license can be found in 'license.txt'.
+
+""" Module pyramid
+
+Functionality to downsample images and volumes by a factor of two, and
+to build a pyramid of such levels (also known as mipmaps). This is used
+to make textures fit in OpenGl memory, for mipmapping of 2D textures,
+and to upload low resolution bricks of large volumes during interaction.
+
+The data is processed in chunks along the first dimension, which are
+divided over a number of threads (numpy releases the GIL for most of
+the work). The result is written in a preallocated array, so the only
+temporary arrays are those of a chunk.
+
+"""
+
+import multiprocessing
+import multiprocessing.pool
+
+import numpy as np
+
+
+# The number of output elements that are processed at once
+_CHUNK_SIZE = 2**20
+
+
+def _lanczos(x, a=2):
+    w = np.sinc(x) * np.sinc(x/float(a)) * (np.abs(x) < a)
+    return w / w.sum()
+
+
+# The filters as (offsets, weights). The value at index i of the result
+# is the weighted sum of the values at index 2*i + offset of the data.
+FILTERS = {
+    # Average of two values
+    'box': ([0, 1], [0.5, 0.5]),
+    # Smoothing with a 3-tap (binomial) kernel, centered at the even values
+    '3tap': ([-1, 0, 1], [0.25, 0.5, 0.25]),
+    # Lanczos kernel (a=2) for a factor of two, centered between values
+    'lanczos': ( list(range(-3, 5)),
+                 list(_lanczos((np.arange(-3, 5) - 0.5) / 2.0)) ),
+    }
+
+
+def _filterAxis(data, axis, offsets, weights, n, index0=0, size=None):
+    """ Filter and decimate the data along the given axis. The result
+    has size elements along the axis, starting at index0 of the full
+    result. n is the length of the full data along the axis, and the
+    given data starts at (the clipped) 2*index0 + min(offsets).
+    """
+    if size is None:
+        size = max(1, n // 2)
+    first = max(0, 2*index0 + min(offsets))
+    result = None
+    for offset, weight in zip(offsets, weights):
+        i1 = 2*index0 + offset # first index in full data
+        i2 = i1 + 2*(size-1) # last index in full data
+        if i1 >= 0 and i2 < n:
+            # Use a strided view
+            slices = [slice(None)] * data.ndim
+            slices[axis] = slice(i1-first, i2-first+1, 2)
+            tmp = data[tuple(slices)] * weight
+        else:
+            # Near the edges the indices must be clipped
+            indices = np.clip(np.arange(i1, i2+1, 2), 0, n-1) - first
+            tmp = np.take(data, indices, axis)
+            tmp *= weight
+        if result is None:
+            result = tmp
+        else:
+            result += tmp
+    return result
+
+
+def _resultShape(shape, ndim):
+    """ Get the shape of the downsampled data.
+    """
+    return tuple([max(1, n//2) for n in shape[:ndim]]) + tuple(shape[ndim:])
+
+
+def downsample(data, ndim=None, filter='3tap', threads=0, out=None):
+    """ downsample(data, ndim=None, filter='3tap', threads=0, out=None)
+    
+    Downsample the data by a factor of two in its first ndim dimensions
+    (all dimensions by default); any other dimensions (e.g. color) are
+    left as they are. The result has n//2 elements in each downsampled
+    dimension (at least one), which matches the sizes of OpenGl mipmaps.
+    
+    Parameters
+    ----------
+    data : numpy array
+        The image or volume to downsample.
+    ndim : int
+        The number of dimensions to downsample.
+    filter : {'box', '3tap', 'lanczos'}
+        The kernel that is used to prevent aliasing. 'box' averages pairs
+        of values, '3tap' applies a [1 2 1] kernel, 'lanczos' gives the
+        sharpest results.
+    threads : int
+        The number of threads to use. If 0, uses as many threads as there
+        are CPU cores. Small data is always processed in one thread.
+    out : numpy array
+        The array to write the result in. Should have the right shape.
+    
+    The result has the same data type as the given data (integer values
+    are rounded and clipped).
+    
+    """
+    
+    # Check
+    data = np.asanyarray(data)
+    if ndim is None:
+        ndim = data.ndim
+    if ndim < 1 or ndim > data.ndim:
+        raise ValueError('Cannot downsample data of this dimension.')
+    if filter not in FILTERS:
+        raise ValueError('Unknown filter for downsampling: %r' % filter)
+    offsets, weights = FILTERS[filter]
+    
+    # Prepare output
+    shape = _resultShape(data.shape, ndim)
+    if out is None:
+        out = np.empty(shape, data.dtype)
+    elif out.shape != shape:
+        raise ValueError('Output array for downsample has the wrong shape.')
+    
+    # Calculate in float32, unless the data is float64
+    if data.dtype == np.float64:
+        ftype = np.float64
+    else:
+        ftype = np.float32
+    
+    # Determine how to convert back (round and clip integers)
+    kind = out.dtype.kind
+    if kind in 'ui':
+        info = np.iinfo(out.dtype)
+        limits = info.min, info.max
+    
+    # Divide the result in chunks along the first dimension
+    rowSize = max(1, int(np.prod(shape[1:])))
+    step = max(1, _CHUNK_SIZE // rowSize)
+    chunks = [(i, min(i+step, shape[0])) for i in range(0, shape[0], step)]
+    
+    def process(chunk):
+        i0, i1 = chunk
+        n = data.shape[0]
+        # Get the data that is needed for this chunk
+        first = max(0, 2*i0 + min(offsets))
+        last = min(n, 2*(i1-1) + max(offsets) + 1)
+        tmp = np.asarray(data[first:last], ftype)
+        # Filter the first dimension, and then the others
+        tmp = _filterAxis(tmp, 0, offsets, weights, n, i0, i1-i0)
+        for axis in range(1, ndim):
+            tmp = _filterAxis(tmp, axis, offsets, weights, data.shape[axis])
+        # Store
+        if kind == 'b':
+            out[i0:i1] = tmp >= 0.5
+        elif kind in 'ui':
+            out[i0:i1] = np.clip(np.round(tmp), *limits)
+        else:
+            out[i0:i1] = tmp
+    
+    # Process chunks, in parallel if useful
+    threads = threads or multiprocessing.cpu_count()
+    threads = min(threads, len(chunks))
+    if threads > 1:
+        pool = multiprocessing.pool.ThreadPool(threads)
+        try:
+            pool.map(process, chunks)
+        finally:
+            pool.close()
+    else:
+        for chunk in chunks:
+            process(chunk)
+    
+    return out
+
+
+class Pyramid(object):
+    """ Pyramid(data, ndim=None, filter='3tap', threads=0)
+    
+    A pyramid of an image or volume, in which each level is the previous
+    level downsampled by a factor of two (see downsample()). Level 0 is
+    the data itself. The levels are calculated when they are first
+    requested and then kept.
+    
+    """
+    
+    def __init__(self, data, ndim=None, filter='3tap', threads=0):
+        if ndim is None:
+            ndim = data.ndim
+        self._levels = [data]
+        self._ndim = ndim
+        self._filter = filter
+        self._threads = threads
+    
+    
+    @property
+    def levelCount(self):
+        """ Get the total number of levels in the pyramid, up to and
+        including the level in which all dimensions have one element.
+        """
+        n = max(self._levels[0].shape[:self._ndim])
+        count = 1
+        while n > 1:
+            n = n // 2
+            count += 1
+        return count
+    
+    
+    def GetLevel(self, level):
+        """ GetLevel(level)
+        
+        Get the data at the given level. Levels beyond the last level
+        give the last level.
+        
+        """
+        level = min(max(0, int(level)), self.levelCount-1)
+        while len(self._levels) <= level:
+            data = self._levels[-1]
+            self._levels.append( downsample(data, self._ndim,
+                                            self._filter, self._threads) )
+        return self._levels[level]
+    
+    
+    def GetLevels(self, maxLevels=None):
+        """ GetLevels(maxLevels=None)
+        
+        Get a list with the data of all levels (or at most maxLevels).
+        
+        """
+        count = self.levelCount
+        if maxLevels is not None:
+            count = min(count, maxLevels)
+        return [self.GetLevel(i) for i in range(count)]
+
+
+if __name__ == '__main__':
+    # Benchmark against downSample() of baseTexture
+    import time
+    from visvis.core.baseTexture import downSample
+    
+    for dtype in [np.float32, np.int16]:
+        vol = (np.random.rand(256, 256, 256) * 1000).astype(dtype)
+        print('Downsampling a 256**3 %s volume:' % np.dtype(dtype).name)
+        t0 = time.time()
+        downSample(vol, 3)
+        print('  downSample(): %1.3f s' % (time.time()-t0))
+        for filter in ['box', '3tap', 'lanczos']:
+            for threads in [1, 0]:
+                t0 = time.time()
+                downsample(vol, 3, filter, threads)
+                print('  %s (%s threads): %1.3f s' % (filter,
+                        threads or multiprocessing.cpu_count(), time.time()-t0))
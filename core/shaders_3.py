@@ -228,6 +228,46 @@ SH_3F_CALCSTEPS = ShaderCodePart('calcsteps', 'default',
 """)
 
 
+## 3D fragment EMPTYSPACE
+# Skips cells of the volume that are empty, using a low resolution texture
+# that contains the maximum value in each cell (see Texture3D). Rays jump
+# to the border of an empty cell, so only the non-empty cells are sampled.
+# Skipping is disabled if the threshold is negative.
+
+SH_3F_EMPTYSPACE = ShaderCodePart('emptyspace', 'default',
+"""
+    >>--uniforms--
+    uniform sampler3D occupancy; // The maximum value in each cell
+    uniform vec3 occupancyShape; // The number of cells (as in OpenGl)
+    uniform vec3 cellScale; // To convert texture coordinates to cells
+    uniform float emptyThreshold; // Cells with values up to this are empty
+    // --uniforms--
+    
+    >>--pre-loop--
+    // The length of a step in cells, and whether the ray goes up
+    vec3 cellRay = abs(ray * cellScale) + 1e-9;
+    vec3 cellUp = vec3(greaterThan(ray, vec3(0.0, 0.0, 0.0)));
+    // --pre-loop--
+    
+    >>--in-loop--
+    
+    // Skip to the border of the cell if it is empty
+    if (emptyThreshold >= 0.0)
+    {
+        vec3 cellLoc = loc * cellScale;
+        vec3 cell = floor(cellLoc);
+        if (texture3D(occupancy, (cell+0.5)/occupancyShape).r <= emptyThreshold)
+        {
+            vec3 cellSteps = abs(cellUp - (cellLoc - cell)) / cellRay;
+            i += int( min(min(cellSteps.x, cellSteps.y), cellSteps.z) );
+            continue;
+        }
+    }
+    // --in-loop--
+    
+""")
+
+
 ## 3D fragment STYLE MIP
 # Casts a ray all the way through. Displays the highest encountered
 # intensity; there is only one pixel that contributes to the final color.
@@ -242,7 +282,7 @@ SH_3F_STYLE_MIP = ShaderCodePart('renderstyle', 'mip',
     float val; // to store the current value
     float maxval = -99999.0; // The maximum encountered value
     float maxi = 0.0;  // Where the maximum value was encountered
-    vec4 maxcolor; // The color found at the maximum value
+    vec4 maxcolor = vec4(0.0, 0.0, 0.0, 0.0); // The color at the maximum value
     vec4 color1; // What we sample from the texture
     vec4 color2; // What should be displayed
     // --pre-loop--
@@ -300,6 +340,13 @@ SH_3F_STYLE_RAY = ShaderCodePart('renderstyle', 'ray',
     float a = color2.a * max(0.0, 1.0-color3.a) / stepRatio;
     color3.rgb += color2.rgb*a;
     color3.a += a; // color3.a counts total color contribution.
+    
+    // Stop when the ray has become (nearly) opaque
+    if (color3.a >= 0.99)
+    {
+        i = n;
+        break;
+    }
     // --in-loop--
     
     >>--post-loop--
@@ -369,6 +416,13 @@ SH_3F_STYLE_EDGERAY = ShaderCodePart('renderstyle', 'edgeray',
     float a = color2.a * max(0.0, 1.0-color3.a) / stepRatio;
     color3.rgb += color2.rgb*a;
     color3.a += a; // color3.a counts total color contribution.
+    
+    // Stop when the ray has become (nearly) opaque
+    if (color3.a >= 0.99)
+    {
+        i = n;
+        break;
+    }
     // --in-loop--
     
     >>--post-loop--
@@ -491,6 +545,13 @@ SH_3F_STYLE_LITRAY = ShaderCodePart('renderstyle', 'litray',
     
     // Set depth
     iter_depth_f = iter_depth_f + float(iter_depth_f==0.0) * float(color3.a>0.5) * float(i);
+    
+    // Stop when the ray has become (nearly) opaque
+    if (color3.a >= 0.99)
+    {
+        i = n;
+        break;
+    }
     // --in-loop--
     
     >>--post-loop--
@@ -8,14 +8,13 @@ import visvis as vv
 import OpenGL.GL as gl
 import numpy as np
 
+from visvis.core.misc import getReadBuffer
+from visvis.core.baseBuffer import readPixels
 
-def getframe(ob):
-    """ getframe(object)
-    
-    Get a snapshot of the current figure or axes or axesContainer.
-    It is retured as a numpy array (color image).
-    Also see vv.screenshot().
-    
+
+def _getFrameRegion(ob):
+    """ Get the figure of the given object, and the region (x, y, w, h)
+    of the object in it, with the origin in the lower-left.
     """
     
     # Get figure
@@ -23,12 +22,6 @@ def getframe(ob):
     if not fig:
         raise ValueError('Object is not present in any alive figures.')
     
-    # Select the figure
-    fig._SetCurrent() # works on all backends
-
-    # we read the pixels as shown on screen.
-    gl.glReadBuffer(gl.GL_FRONT)
-    
     # establish rectangle to sample
     if isinstance(ob, vv.BaseFigure):
         x,y,w,h = 0, 0, ob.position.w, ob.position.h
@@ -44,16 +37,32 @@ def getframe(ob):
     else:
         raise ValueError("The given object is not a figure nor an axes.")
     
-    # read
-    # use floats to prevent strides etc. uint8 caused crash on qt backend.
-    im = gl.glReadPixels(x, y, w, h, gl.GL_RGB, gl.GL_FLOAT)
+    return fig, x, y, w, h
+
+
+def getframe(ob):
+    """ getframe(object)
+    
+    Get a snapshot of the current figure or axes or axesContainer.
+    It is retured as a numpy array (color image, float32 between 0 and 1).
+    Also see vv.screenshot().
+    
+    """
+    
+    # Get figure and region
+    fig, x, y, w, h = _getFrameRegion(ob)
+    
+    # Select the figure
+    fig._SetCurrent() # works on all backends
+    
+    # we read the pixels as shown on screen.
+    gl.glReadBuffer(getReadBuffer(True))
     
-    # reshape, flip, and store
-    im.shape = h,w,3
-    im = np.flipud(im)
+    # read as bytes (which is 4x less data to transfer than floats)
+    im = readPixels(x, y, w, h)
     
     # done
-    return im
+    return im.astype(np.float32) / 255.0
     
 
 
@@ -18,10 +18,10 @@ except ImportError:
 
 def movieRead(filename, *args, **kwargs):
     """ Proxy for imageio.mimread()
-    """
     
-    if imageio is None:
-        raise RuntimeError("visvis.movieRead requires the imageio package.")
+    If imageio is not available, movie files (e.g. AVI) are read with
+    vvmovie.readAvi(), which reads the frames from ffmpeg through a pipe.
+    """
     
     if not os.path.isfile(filename):
         # try loadingpil from the resource dir
@@ -30,6 +30,13 @@ def movieRead(filename, *args, **kwargs):
         if os.path.isfile(filename2):
             filename = filename2
     
+    if imageio is None:
+        from visvis.functions.movieWrite import VIDEO_EXTENSIONS
+        if os.path.splitext(filename)[1].lower() in VIDEO_EXTENSIONS:
+            from visvis.vvmovie.images2avi import readAvi
+            return readAvi(filename, *args, **kwargs)
+        raise RuntimeError("visvis.movieRead requires the imageio package.")
+    
     return imageio.mimread(filename, *args, **kwargs)
 
 
@@ -4,6 +4,7 @@
 # Visvis is distributed under the terms of the (new) BSD License.
 # The full license can be found in 'license.txt'.
 
+import os
 import visvis as vv
 
 # Try importing imageio
@@ -15,16 +16,107 @@ except ImportError:
     pass
 
 
+# Movie formats that are written with ffmpeg by vvmovie
+VIDEO_EXTENSIONS = ['.avi', '.mpg', '.mpeg', '.mov', '.flv', '.mp4']
+
+
 def movieWrite(filename, images, *args, **kwargs):
     """ Proxy for imageio.mimwrite()
+    
+    Animated GIF files are written with vvmovie.writeGifStream(), and
+    movie files (e.g. AVI) with vvmovie.writeAvi(), if imageio is not
+    available, or if stream=True is given. The images can then be
+    produced by an iterable (e.g. a generator), and need not all be in
+    memory. GIF images are converted in parallel and written as they
+    come; movie images are streamed to ffmpeg. Of the keyword arguments
+    of imageio, fps, duration, loop and subrectangles are supported for
+    GIF files, and fps, codec, quality, bitrate, pixelformat,
+    input_params, output_params and ffmpeg_log_level for movie files.
     """
     
+    ext = os.path.splitext(filename)[1].lower()
+    stream = kwargs.pop('stream', False)
+    if not args and _isStreamed(filename, stream):
+        if ext == '.gif':
+            return _writeGifStream(filename, images, **kwargs)
+        else:
+            return _writeAvi(filename, images, **kwargs)
+    
     if imageio is None:
         raise RuntimeError("visvis.movieWrite requires the imageio package.")
     
     return imageio.mimwrite(filename, images, *args, **kwargs)
 
 
+def _isStreamed(filename, stream=False):
+    """ Get whether movieWrite() writes the given file with the
+    streaming writers of vvmovie.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in ['.gif'] + VIDEO_EXTENSIONS:
+        return bool(stream) or imageio is None
+    return False
+
+
+def _checkKwargs(kwargs, names, what):
+    """ Raise a TypeError for the keyword arguments that the streaming
+    writer does not support.
+    """
+    unsupported = sorted([key for key in kwargs if key not in names])
+    if unsupported:
+        raise TypeError('Keyword arguments %s are not supported when '
+                        'writing %s without imageio (supported are %s).' %
+                        (', '.join(unsupported), what, ', '.join(names)))
+
+
+def _writeGifStream(filename, images, fps=None, loop=0, subrectangles=True,
+                    **kwargs):
+    """ Write a GIF with the streaming writer, accepting the main
+    arguments of imageio.
+    """
+    from visvis.vvmovie.images2gif import writeGifStream
+    _checkKwargs(kwargs, ['duration', 'dither', 'nq', 'dispose',
+                    'sharePalette', 'processes', 'lookAhead'], 'a GIF')
+    if fps:
+        kwargs['duration'] = 1.0 / fps
+    writeGifStream(filename, images, repeat=loop or True, # 0 is infinite
+                    subRectangles=subrectangles, **kwargs)
+
+
+def _writeAvi(filename, images, fps=10, codec=None, quality=None,
+                bitrate=None, pixelformat=None, input_params=None,
+                output_params=None, ffmpeg_log_level=None, **kwargs):
+    """ Write a movie with ffmpeg, accepting the main arguments of imageio
+    (which are translated to options of ffmpeg).
+    """
+    from visvis.vvmovie.images2avi import writeAvi
+    _checkKwargs(kwargs, ['duration', 'encoding', 'inputOptions',
+                    'outputOptions'], 'a movie')
+    kwargs.setdefault('duration', 1.0 / fps)
+    if codec:
+        kwargs['encoding'] = codec
+    
+    inputOptions = kwargs.pop('inputOptions', '').split()
+    outputOptions = kwargs.pop('outputOptions', '').split()
+    if ffmpeg_log_level:
+        inputOptions += ['-loglevel', str(ffmpeg_log_level)]
+    inputOptions += list(input_params or [])
+    if quality is not None:
+        # Quality is 0 (worst) to 10 (best), as in imageio
+        q = 1 - quality / 10.0
+        if codec == 'libx264':
+            outputOptions += ['-crf', str(int(q * 51))]
+        else:
+            outputOptions += ['-qscale:v', str(int(q * 30) + 1)]
+    if bitrate:
+        outputOptions += ['-b:v', str(bitrate)]
+    if pixelformat:
+        outputOptions += ['-pix_fmt', pixelformat]
+    outputOptions += list(output_params or [])
+    
+    writeAvi(filename, images, inputOptions=' '.join(inputOptions),
+                outputOptions=' '.join(outputOptions), **kwargs)
+
 if __name__ == '__main__':
     ims = vv.movieRead('newtonscradle.gif')
     vv.movieWrite('newtonscradle.swf', ims)
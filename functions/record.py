@@ -4,11 +4,26 @@
 # Visvis is distributed under the terms of the (new) BSD License.
 # The full license can be found in 'license.txt'.
 
+import os
+import zlib
+import threading
+try:
+    import queue
+except ImportError: # Python 2
+    import Queue as queue
+
+import numpy as np
+import OpenGL.GL as gl
+
 import visvis as vv
+from visvis.core.misc import getReadBuffer
+from visvis.core.baseBuffer import PixelReader
+from visvis.functions.getframe import _getFrameRegion
+from visvis.functions.movieWrite import _isStreamed
 
 
 class Recorder:
-    """ Recorder(object)
+    """ Recorder(object, queueSize=16)
     
     Recorder class that makes snapshots right after each draw event. Object
     should be an Axes, AxesContainer or Figure.
@@ -16,14 +31,24 @@ class Recorder:
     It is then possible to export the movie to SWF, GIF, AVI, or a series
     of images.
     
+    The snapshots are read asynchronously (using pixel buffer objects),
+    so that drawing is not stalled waiting for them. They are compressed
+    by a thread to keep memory usage low. At most queueSize snapshots
+    wait to be compressed; if the thread cannot keep up, drawing waits.
+    
     See also vv.movieWrite().
     
     """
     
-    def __init__(self, ob):
+    def __init__(self, ob, queueSize=16):
         # init
         self._ob = ob
-        self._frames = []
+        self._frames = [] # (shape, compressed data)
+        
+        # The frames are read by the reader, and compressed by the thread
+        self._reader = PixelReader(2)
+        self._queue = queue.Queue(queueSize)
+        self._thread = None
         
         # register events
         f = ob.GetFigure()
@@ -31,14 +56,55 @@ class Recorder:
     
     
     def _OnAfterDraw(self, event):
-        im = vv.getframe(self._ob)
-        self._frames.append(im)
+        # Start reading this frame, maybe get a previous one
+        fig, x, y, w, h = _getFrameRegion(self._ob)
+        gl.glReadBuffer(getReadBuffer(True))
+        im = self._reader.Read(x, y, w, h)
+        if im is not None:
+            self._Put(im)
+    
+    
+    def _Put(self, im):
+        """ Queue a frame to be compressed; start the thread if needed.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._Compress)
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put(im)
+    
+    
+    def _Compress(self):
+        """ Compress frames in the queue, until None is received.
+        """
+        while True:
+            im = self._queue.get()
+            try:
+                if im is None:
+                    break
+                data = zlib.compress(im.tobytes(), 1)
+                self._frames.append((im.shape, data))
+            finally:
+                self._queue.task_done()
+    
+    
+    def _Flush(self):
+        """ Get the frames that are still being read, and wait until all
+        frames are compressed.
+        """
+        f = self._ob.GetFigure()
+        if f and self._reader.pendingCount:
+            f._SetCurrent()
+            for im in self._reader.Flush():
+                self._Put(im)
+        self._queue.join()
     
     
     def Clear(self):
         """ Clear()
         Clear all recorded images up to now.
         """
+        self._Flush()
         self._frames[:] = []
     
     
@@ -47,6 +113,11 @@ class Recorder:
         Stop recording. """
         f = self._ob.GetFigure()
         f.eventAfterDraw.Unbind(self._OnAfterDraw)
+        self._Flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
     
     
     def Continue(self):
@@ -59,9 +130,19 @@ class Recorder:
     
     def GetFrames(self):
         """ GetFrames()
-        Get a copy of the list (the frames itself are not copied)
-        recorded up to now. """
-        return [frame for frame in self._frames]
+        Get a list of the frames (uint8 color images) recorded up to now.
+        The frames are decompressed, so this list can take a lot of memory.
+        """
+        return list(self._IterFrames())
+    
+    
+    def _IterFrames(self):
+        """ Generate the (decompressed) frames recorded up to now.
+        """
+        self._Flush()
+        for shape, data in list(self._frames):
+            im = np.frombuffer(bytearray(zlib.decompress(data)), np.uint8)
+            yield im.reshape(shape)
     
     
     def Export(self, filename, duration=0.1, repeat=True, **kwargs):
@@ -73,22 +154,35 @@ class Recorder:
           * an SWF (shockwave flash) file
           * an AVI file
         
-        See vv.movieWrite for more information.
+        See vv.movieWrite for more information. If animated GIF or movie
+        (e.g. AVI) files are written without imageio (or with
+        stream=True), the frames are decompressed one by one. GIF frames
+        are then converted in a single process.
         
         """
-        frames = self.GetFrames()
-        if filename.lower().endswith('.gif'):
+        ext = os.path.splitext(filename)[1].lower()
+        stream = _isStreamed(filename, kwargs.get('stream'))
+        if stream:
+            frames = self._IterFrames()
+        else:
+            frames = self.GetFrames()
+        if ext == '.gif':
             loop = 0 if repeat else 1
-            vv.movieWrite(filename, frames, fps=1/duration, loop=loop, **kwargs)
+            if stream:
+                kwargs.setdefault('processes', 1)
+            vv.movieWrite(filename, frames, fps=1/duration, loop=loop,
+                            **kwargs)
         else:
             vv.movieWrite(filename, frames, fps=1/duration, **kwargs)
 
 
-def record(ob):
-    """ record(object)
+def record(ob, queueSize=16):
+    """ record(object, queueSize=16)
     Take a snapshot of the given figure or axes after each draw.
     A Recorder instance is returned, with which the recording can
     be stopped, continued, and exported to GIF, SWF or AVI.
+    The snapshots are compressed in a thread; queueSize is the maximum
+    number of snapshots that wait for that.
     """
     
     # establish wheter we can record that
@@ -96,7 +190,7 @@ def record(ob):
         raise ValueError("The given object is not a figure nor an axes.")
     
     # create recorder
-    return Recorder(ob)
+    return Recorder(ob, queueSize)
 
 
 if __name__ == '__main__':
@@ -8,9 +8,9 @@ import visvis as vv
 import numpy as np
 
 def volshow3(vol, clim=None, renderStyle='mip', cm=None,
-            axesAdjust=True, axes=None):
+            axesAdjust=True, axes=None, brickSize=None):
     """ volshow3(vol, clim=None, renderStyle='mip', cm=CM_GRAY,
-                axesAdjust=True, axes=None)
+                axesAdjust=True, axes=None, brickSize=None)
     
     Display a 3D image (a volume) using volume rendering,
     and returns the Texture3D object.
@@ -35,6 +35,11 @@ def volshow3(vol, clim=None, renderStyle='mip', cm=None,
         set to False.
     axes : Axes instance
         Display the image in this axes, or the current axes if not given.
+    brickSize : int
+        If given, the volume is divided in bricks of this size which are
+        rendered at full resolution, and a BrickedTexture3D is returned.
+        Use this for volumes that are too large to fit in OpenGl memory
+        (e.g. a numpy memmap).
     
     """
     
@@ -54,7 +59,10 @@ def volshow3(vol, clim=None, renderStyle='mip', cm=None,
         raise ValueError('volshow expects a 3D image as a numpy array.')
     
     # create texture
-    t = vv.Texture3D(axes, vol, renderStyle)
+    if brickSize:
+        t = vv.BrickedTexture3D(axes, vol, renderStyle, brickSize)
+    else:
+        t = vv.Texture3D(axes, vol, renderStyle)
     
     # set clim
     if isinstance(clim,list):
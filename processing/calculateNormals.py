@@ -14,12 +14,20 @@ N = v.shape[0]
 faces = np.arange(N); faces.shape = len(v)//3, 3
 
 
-def calculateNormals(mesh):
-    """ calculateNormals(mesh)
+def calculateNormals(mesh, chunkSize=None):
+    """ calculateNormals(mesh, chunkSize=None)
     
     Calculate the normal data from the vertices.
     Handles triangular and quad faces.
     
+    The per-face normals are accumulated at the vertices in a fully
+    vectorized way, which is exact also when a vertex is shared by many
+    faces. The faces are processed in chunks of chunkSize faces (default
+    2**20); the temporary arrays of a chunk scale with chunkSize (not
+    with the number of vertices), also for meshes with tens of millions
+    of faces. Use a smaller chunkSize when
+    memory is tight, or a larger one to trade memory for speed.
+    
     """
     t0 = time.time()  # noqa
     
@@ -34,45 +42,57 @@ def calculateNormals(mesh):
     
     # Get faces array
     faces = mesh._GetFaces()
-    _, vpf = faces.shape
+    Nfaces, vpf = faces.shape
     
-    # Apply
+    # Check chunksize
+    if chunkSize is None:
+        chunkSize = 2**20
+    chunkSize = max(1, int(chunkSize))
     
-    # Select lists of vertices. v1,v2,v3 are lists of vertices
-    # corresponding to the first, second, third vertices of the faces.
-    # They are Nfaces times 3/4
-    
-    if vpf == 3:
-        # Get vertex per faces index (for all faces)
-        v1 = vertices[faces[:,0]]
-        v2 = vertices[faces[:,1]]
-        v3 = vertices[faces[:,2]]
+    # Apply per chunk of faces
+    for i0 in range(0, Nfaces, chunkSize):
+        chunk = faces[i0:i0+chunkSize]
+        
+        # Select lists of vertices. v1,v2,v3 are lists of vertices
+        # corresponding to the first, second, third vertices of the faces.
+        # They are Nfaces times 3/4
         
-        # Calculate normals
-        _vectorsToNormals(v2-v1, v2-v3, faces, normals)
+        if vpf == 3:
+            # Get vertex per faces index (for the faces in this chunk)
+            v1 = vertices[chunk[:,0]]
+            v2 = vertices[chunk[:,1]]
+            v3 = vertices[chunk[:,2]]
+            
+            # Calculate normals
+            normalsPerFace = _vectorsToNormals(v2-v1, v2-v3)
+            
+        elif vpf == 4:
+            # Get vertex per faces index (for the faces in this chunk)
+            v1 = vertices[chunk[:,0]]
+            v2 = vertices[chunk[:,1]]
+            v3 = vertices[chunk[:,2]]
+            v4 = vertices[chunk[:,3]]
+            # Calculate normals using all possible sets of 3 vertices.
+            # (order found by simply testing)
+            normalsPerFace = _vectorsToNormals(v2-v1, v2-v3)
+            normalsPerFace += _vectorsToNormals(v2-v4, v2-v3)
+            normalsPerFace += _vectorsToNormals(v1-v3, v4-v3)
+            normalsPerFace += _vectorsToNormals(v2-v1, v1-v4)
         
-    elif vpf == 4:
-        # Get vertex per faces index (for all faces)
-        v1 = vertices[faces[:,0]]
-        v2 = vertices[faces[:,1]]
-        v3 = vertices[faces[:,2]]
-        v4 = vertices[faces[:,3]]
-        # Calculate normals using all possible sets of 3 vertices.
-        # (order found by simply testing)
-        _vectorsToNormals(v2-v1, v2-v3, faces, normals)
-        _vectorsToNormals(v2-v4, v2-v3, faces, normals)
-        _vectorsToNormals(v1-v3, v4-v3, faces, normals)
-        _vectorsToNormals(v2-v1, v1-v4, faces, normals)
+        else:
+            raise ValueError('Can only calculate normals for triangles or quads.')
+        
+        # Distribute the normals over the vertices
+        _addNormalsToVertices(normalsPerFace, chunk, normals)
     
     # Normalize the normals
     lengths = normals[:,0]**2 + normals[:,1]**2 + normals[:,2]**2
     lengths = lengths**0.5
-    normals[:,0] /= lengths
-    normals[:,1] /= lengths
-    normals[:,2] /= lengths
+    I, = np.where(lengths==0)
+    lengths[I] = 1
+    normals /= lengths.reshape(-1, 1)
     
     # Correct NANs
-    I, = np.where(lengths==0)
     normals[I,0] = 0
     normals[I,1] = 0
     normals[I,2] = 1
@@ -84,33 +104,33 @@ def calculateNormals(mesh):
     mesh._normals = -normals
 
 
-def _vectorsToNormals(a, b, faces, normals):
-    
+def _vectorsToNormals(a, b):
+    """ Calculate the (unnormalized) normals for each face from two
+    vectors in the plane of that face.
+    """
     # The normal is orthogonal to both vectors. Use cross product
-    normalsPerFace = np.zeros((faces.shape[0],3), dtype='float32')
+    normalsPerFace = np.empty((a.shape[0],3), dtype='float32')
     normalsPerFace[:,0] = a[:,1]*b[:,2] - a[:,2]*b[:,1]
     normalsPerFace[:,1] = a[:,2]*b[:,0] - a[:,0]*b[:,2]
     normalsPerFace[:,2] = a[:,0]*b[:,1] - a[:,1]*b[:,0]
-    
-    # Get number of faces.
-    Nfaces = faces.shape[0]
-    
-    # The normals can be distributed over the normals per vertex
-    if Nfaces > 32000:
-        # Fast and dirty: if an index in faces occurs twice in the same
-        # position (0,1,or 2) then only the final one is added.
-        # Thanks to Robert Schroll for pointing this out
-        for f in range(faces.shape[1]):
-            normals[faces[:,f]] += normalsPerFace
-    else:
-        # The right (but slower) way. We could make a cython function of this.
-        # On the teapot (6000+ faces) this takes less then 0.1 secs on my
-        # i3 laptop. Since this only has to be done once for each Mesh object,
-        # that's not too bad, but waiting for over a second can become
-        # iritating.
-        for f in range(faces.shape[1]):
-            for i in range(faces.shape[0]):
-                normals[faces[i,f]] += normalsPerFace[i]
+    return normalsPerFace
+
+
+def _addNormalsToVertices(normalsPerFace, faces, normals):
+    """ Add the normals per face to all the vertices of that face.
+    
+    Uses bincount, which sums all contributions, also when an index
+    occurs more than once (in contrast to normals[faces[:,f]] += ...).
+    The vertex indices are first mapped to the range of unique indices
+    in the given faces, so that the temporary arrays scale with the
+    number of faces, not with the number of vertices.
+    """
+    U, I = np.unique(faces.ravel(), return_inverse=True)
+    I = I.ravel()
+    for j in range(3):
+        # Repeat the face normal for each vertex of the face
+        weights = np.repeat(normalsPerFace[:,j], faces.shape[1])
+        normals[U,j] += np.bincount(I, weights, len(U))
 
 
 def calculateNormals_old(mesh):
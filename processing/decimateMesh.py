@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012, Almar Klein
+#
+# Visvis is distributed under the terms of the (new) BSD License.
+# The full license can be found in 'license.txt'.
+
+import numpy as np
+from visvis.wobjects.polygonalModeling import BaseMesh
+
+def decimateMesh(mesh, gridSize):
+    """ decimateMesh(mesh, gridSize)
+    
+    Produce a simplified version of the given mesh using vertex clustering.
+    The bounding box of the mesh is divided in cubic cells, such that
+    there are gridSize cells along its largest dimension. All vertices
+    in a cell are replaced by a single vertex (at their mean position),
+    and faces that become degenerate are removed.
+    
+    The resulting mesh consists of triangles (quads are split) and has
+    no normals; values are averaged per cell. All steps are vectorized,
+    so this is fast also for meshes with millions of faces.
+    
+    """
+    
+    # Get vertices and faces
+    vertices = mesh._vertices
+    faces = mesh._GetFaces()
+    values = mesh._values
+    
+    # Split quads in triangles
+    if faces.shape[1] == 4:
+        faces = np.concatenate([faces[:,[0,1,2]], faces[:,[0,2,3]]])
+    
+    # Determine cell size
+    gridSize = max(1, int(gridSize))
+    vmin = np.nanmin(vertices, 0)
+    extent = (np.nanmax(vertices, 0) - vmin).max()
+    cellSize = extent / gridSize
+    if not cellSize > 0:
+        cellSize = 1.0
+    
+    # Get cell index for each vertex, and combine to a single key
+    ijk = np.floor((vertices - vmin) / cellSize)
+    ijk = np.nan_to_num(ijk).astype(np.int64)
+    np.clip(ijk, 0, gridSize, ijk)
+    n = gridSize + 1
+    key = (ijk[:,0] * n + ijk[:,1]) * n + ijk[:,2]
+    
+    # Map each vertex to a cluster
+    _, clusters = np.unique(key, return_inverse=True)
+    clusters = clusters.ravel()
+    
+    # Map faces to clusters and remove degenerate faces
+    faces = clusters[faces]
+    valid = ( (faces[:,0] != faces[:,1]) & (faces[:,1] != faces[:,2]) &
+              (faces[:,0] != faces[:,2]) )
+    faces = faces[valid]
+    
+    # Remove duplicate faces (regardless of the order of their vertices)
+    if len(faces):
+        sortedFaces = np.ascontiguousarray(np.sort(faces, 1))
+        voidType = np.dtype((np.void, sortedFaces.itemsize * 3))
+        _, I = np.unique(sortedFaces.view(voidType).ravel(), return_index=True)
+        faces = faces[np.sort(I)]
+    
+    # No faces left?
+    if not len(faces):
+        return BaseMesh(np.zeros((0,3), np.float32))
+    
+    # Only keep clusters that are used, and number them consecutively
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3).astype(np.uint32)
+    remap = -np.ones(clusters.max()+1, np.int64)
+    remap[used] = np.arange(len(used))
+    clusters = remap[clusters]
+    
+    # Calculate new vertices (and values) as the mean of their cluster
+    sel = clusters >= 0
+    clusters = clusters[sel]
+    counts = np.bincount(clusters, minlength=len(used)).astype(np.float64)
+    def average(data):
+        data = data[sel]
+        result = np.zeros((len(used), data.shape[1]), np.float32)
+        for i in range(data.shape[1]):
+            result[:,i] = np.bincount(clusters, data[:,i], len(used)) / counts
+        return result
+    newVertices = average(vertices)
+    newValues = None
+    if values is not None:
+        newValues = average(values)
+    
+    # Done
+    return BaseMesh(newVertices, faces, None, newValues)
@@ -0,0 +1,285 @@
+import numpy as np
+
+
+def test_buffer_dirty_tracking():
+    import visvis as vv
+    
+    data = np.zeros((10, 3), np.float32)
+    buffer = vv.BufferObject(dtype=np.float32)
+    assert buffer.data is None
+    
+    # New data is dirty as a whole
+    buffer.SetData(data)
+    assert buffer.data is data
+    assert buffer._dirty == [(0, 10)]
+    
+    # Setting the same array again does not mark it
+    buffer._dirty = []
+    buffer.SetData(data)
+    assert buffer._dirty == []
+    
+    # Regions are clipped, and combined if they overlap
+    buffer.SetDirty(2, 4)
+    assert buffer._dirty == [(2, 4)]
+    buffer.SetDirty(7, 20)
+    assert buffer._dirty == [(2, 4), (7, 10)]
+    buffer.SetDirty(3, 7)
+    assert buffer._dirty == [(2, 10)]
+    buffer._dirty = []
+    buffer.SetDirty(5, 5)
+    assert buffer._dirty == []
+    
+    # Many regions are combined into one
+    buffer._maxRegions = 3
+    for i in range(0, 8, 2):
+        buffer.SetDirty(i, i+1)
+    assert buffer._dirty == [(0, 7)]
+    buffer.SetDirty()
+    assert buffer._dirty == [(0, 10)]
+    
+    # Data is converted for use as client side array
+    a = buffer._GetData(np.arange(6, dtype=np.float64).reshape(3,2)[:,:1])
+    assert a.dtype == np.float32 and a.flags.c_contiguous
+    
+    buffer.Destroy()
+    assert buffer.data is None
+
+
+def test_stream_line():
+    import visvis as vv
+    
+    line = vv.StreamLine(None, 5)
+    assert line._GetLimits() is None
+    
+    # 1D data is appended with running x coordinates
+    line.Append([1, 2, 3])
+    assert len(line.points) == 3
+    assert line.points.data[:,0].tolist() == [0, 1, 2]
+    
+    # The oldest points are discarded when the buffer wraps around
+    line.Append(np.arange(12).reshape(4, 3))
+    pp = line.points.data
+    assert len(pp) == 5
+    assert pp[0].tolist() == [2, 3, np.float32(0.1)]
+    assert pp[1:].tolist() == np.arange(12).reshape(4, 3).tolist()
+    
+    # Setting a coordinate uses the order of the points
+    line.SetYdata([9, 8, 7, 6, 5])
+    assert line.points.data[:,1].tolist() == [9, 8, 7, 6, 5]
+    
+    # Limits are maintained per block, and are equal to those of all points
+    line = vv.StreamLine(None, 3000)
+    data = np.random.normal(0, 1, (4000, 3)).astype(np.float32)
+    data[123] = np.nan
+    for i in range(0, 4000, 250):
+        line.Append(data[i:i+250])
+        pp = line.points.data
+        pp = pp[np.isfinite(pp).all(1)]
+        lim = line._GetLimits()
+        for d in range(3):
+            assert lim[d].min == pp[:,d].min() and lim[d].max == pp[:,d].max()
+
+
+def test_minmax_pyramid():
+    from visvis.core.line import MinMaxPyramid
+    
+    rng = np.random.RandomState(0)
+    for n in [1, 7, 1000]:
+        y = rng.normal(0, 1, (n,)).astype(np.float32)
+        y[rng.uniform(0, 1, (n,)) < 0.05] = np.inf
+        pyramid = MinMaxPyramid(y, 4)
+        starts = rng.randint(0, n, (200,))
+        stops = np.minimum(starts + 1 + rng.randint(0, n, (200,)), n)
+        imin, imax = pyramid.Query(starts, stops)
+        for i1, i2, j1, j2 in zip(starts, stops, imin, imax):
+            assert i1 <= j1 < i2 and i1 <= j2 < i2
+            yy = y[i1:i2]
+            yy = yy[np.isfinite(yy)]
+            if len(yy):
+                assert y[j1] == yy.min() and y[j2] == yy.max()
+
+
+def test_decimate_minmax():
+    from visvis.core.line import MinMaxPyramid, decimateMinMax
+    
+    rng = np.random.RandomState(0)
+    n, ncols = 100000, 100
+    x = np.sort(rng.uniform(0, 1000, (n,)))
+    y = np.cumsum(rng.normal(0, 1, (n,)))
+    
+    x0, x1 = 100.0, 600.0
+    I = decimateMinMax(x, MinMaxPyramid(y), x0, x1, ncols)
+    assert len(I) <= 4 * ncols + 2
+    assert (np.diff(I) > 0).all()
+    
+    # Points directly outside of the view are included
+    assert x[I[0]] < x0 and x[I[0]+1] >= x0
+    assert x[I[-1]] >= x1 and x[I[-1]-1] < x1
+    
+    # Each column has the same first, last, min and max point
+    col1 = np.floor((x - x0) / (x1 - x0) * ncols)
+    col2 = np.floor((x[I] - x0) / (x1 - x0) * ncols)
+    for c in range(ncols):
+        yy1, yy2 = y[col1 == c], y[I][col2 == c]
+        assert yy1[0] == yy2[0] and yy1[-1] == yy2[-1]
+        assert yy1.min() == yy2.min() and yy1.max() == yy2.max()
+    
+    # Gaps (runs of nan) are kept: two consecutive points that are both
+    # finite are only connected if there is no gap between them.
+    y[1000:1003] = np.nan
+    y[20000:25000] = np.nan
+    y[30000] = np.inf
+    pyramid = MinMaxPyramid(y)
+    assert pyramid.gaps.tolist() == [1000, 1003, 20000, 25000, 30000, 30001]
+    I = decimateMinMax(x, pyramid, x[0] - 1, x[-1] + 1, ncols)
+    valid = np.isfinite(y)
+    for i1, i2 in zip(I[:-1], I[1:]):
+        if valid[i1] and valid[i2]:
+            assert valid[i1:i2].all()
+    assert set([999, 1000, 1002, 1003, 29999, 30001]).issubset(I)
+
+
+def test_picker_helper():
+    import weakref
+    from visvis.core.baseFigure import ObjectPickerHelper
+    
+    class Ob(object):
+        def __init__(self, parent):
+            self.parent, self._children = parent, []
+            if parent is not None:
+                parent._children.append(self)
+        def GetWeakref(self):
+            return weakref.ref(self)
+    
+    class Position(object):
+        size = 100, 80
+    
+    class Figure(Ob):
+        position = Position()
+        mousepos = 10, 20
+        def _DrawShapes(self, roi):
+            # Draw object b everywhere, by creating the ids directly
+            x, y, w, h = roi
+            helper.screen = np.zeros((h, w), np.int64)
+            helper.screen[:, :] = b._id
+            helper.roi = roi
+            self.ndraws += 1
+    
+    helper = ObjectPickerHelper()
+    figure = Figure(None)
+    figure.ndraws = 0
+    a = Ob(figure)
+    b = Ob(a)
+    c = Ob(figure)
+    helper.AssignIds(figure)
+    assert [a._id, b._id, c._id] == [1, 2, 3]
+    
+    # Colors and ids map back and forth
+    for id in [0, 1, 255, 256, 65535, 123456]:
+        assert helper.GetIdFromColor(*helper.GetColorFromId(id)) == id
+    
+    # Items are found via the id, including the parents
+    assert helper.GetItemsUnderMouse(figure) == [figure, a, b]
+    assert figure.ndraws == 1
+    assert helper.roi == (0, 4, 32, 32)
+    
+    # The region is reused as long as the mouse is in it
+    figure.mousepos = 30, 30
+    assert helper.GetItemsUnderMouse(figure) == [figure, a, b]
+    assert figure.ndraws == 1
+    figure.mousepos = 90, 70
+    helper.GetItemsUnderMouse(figure)
+    assert figure.ndraws == 2
+    assert helper.roi == (74, 54, 26, 26)
+    
+    # Until the figure is drawn
+    helper.ClearScreen()
+    helper.GetItemsUnderMouse(figure)
+    assert figure.ndraws == 3
+
+
+def test_downsample():
+    from visvis.core import pyramid
+    from visvis.core.pyramid import downsample, Pyramid
+    
+    # Shapes follow the OpenGl mipmap convention, color is kept
+    im = np.random.uniform(0, 255, (9, 16, 3)).astype(np.uint8)
+    assert downsample(im, 2).shape == (4, 8, 3)
+    assert downsample(im, 2).dtype == np.uint8
+    assert downsample(np.zeros((1, 5)), 2).shape == (1, 2)
+    
+    # Constant data stays constant, for all filters
+    vol = np.ones((7, 8, 9), np.float32) * 3
+    for filter in pyramid.FILTERS:
+        result = downsample(vol, 3, filter)
+        assert result.shape == (3, 4, 4)
+        assert np.allclose(result, 3)
+    
+    # Integers are rounded and clipped
+    im = np.zeros((8, 8), np.uint8)
+    im[::2] = 255
+    assert (downsample(im, 2, 'box') == 128).all()
+    im = np.zeros((8, 16), np.uint8)
+    im[:, 8:] = 255 # step edge gives over- and undershoot
+    result = downsample(im, 2, 'lanczos')
+    assert result.min() == 0 and result.max() == 255
+    
+    # The box filter averages pairs
+    data = np.arange(10, dtype=np.float64)
+    assert np.allclose(downsample(data, 1, 'box'), [0.5, 2.5, 4.5, 6.5, 8.5])
+    assert np.allclose(downsample(data, 1, '3tap')[1:], [2, 4, 6, 8])
+    
+    # Chunks and threads give the same result
+    vol = np.random.normal(size=(20, 11, 12)).astype(np.float32)
+    expected = downsample(vol, 3, 'lanczos', 1)
+    chunkSize = pyramid._CHUNK_SIZE
+    pyramid._CHUNK_SIZE = 50
+    try:
+        out = np.zeros((10, 5, 6), np.float32)
+        result = downsample(vol, 3, 'lanczos', 4, out)
+        assert result is out
+        assert np.allclose(result, expected, atol=1e-6)
+    finally:
+        pyramid._CHUNK_SIZE = chunkSize
+    
+    # Pyramid
+    p = Pyramid(np.zeros((16, 5)), 2)
+    assert p.levelCount == 5
+    assert [l.shape for l in p.GetLevels()] == [(16, 5), (8, 2), (4, 1), (2, 1), (1, 1)]
+    assert p.GetLevel(10).shape == (1, 1)
+    assert len(p.GetLevels(2)) == 2
+    
+    # The downSample() function of baseTexture keeps its own kernel
+    from visvis.core.baseTexture import downSample
+    data = np.arange(5, dtype=np.float64)
+    assert np.allclose(downSample(data, 1), [0.3, 2.0, 2.5])
+    assert downSample(np.ones((5, 6, 7)), 3).shape == (3, 3, 4)
+
+
+def test_framebuffer_regions():
+    import visvis as vv
+    
+    framebuffer = vv.FramebufferObject()
+    a, b = (0, 0, 50, 40), (50, 0, 50, 40)
+    assert not framebuffer.HasRegion(1, a)
+    
+    # Regions are valid for their key and tag
+    framebuffer.SetRegion(1, a, (1, 1, 1))
+    framebuffer.SetRegion(2, b, (1, 1, 1))
+    assert framebuffer.HasRegion(1, a, (1, 1, 1))
+    assert framebuffer.HasRegion(2, [50, 0, 50, 40], (1, 1, 1))
+    assert not framebuffer.HasRegion(1, b, (1, 1, 1))
+    assert not framebuffer.HasRegion(1, a, (0, 0, 0))
+    assert not framebuffer.HasRegion(1, (0, 0, 50, 41), (1, 1, 1))
+    
+    # Drawing a region invalidates the regions it overlaps
+    framebuffer.SetRegion(3, (40, 30, 5, 5))
+    assert not framebuffer.HasRegion(1, a, (1, 1, 1))
+    assert framebuffer.HasRegion(2, b, (1, 1, 1))
+    framebuffer.SetRegion(3, (40, 30, 20, 5))
+    assert not framebuffer.HasRegion(2, b, (1, 1, 1))
+    assert framebuffer.HasRegion(3, (40, 30, 20, 5))
+    
+    # Without OpenGl objects, all regions are invalid
+    framebuffer.DestroyGl()
+    assert not framebuffer.HasRegion(3, (40, 30, 20, 5))
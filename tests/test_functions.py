@@ -12,3 +12,147 @@ def test_mesh_read_write():
     m = vv.meshRead('bunny.ssdf')
     assert isinstance(m, vv.BaseMesh)
     vv.meshWrite(os.path.expanduser('~/bunny2.stl'), m)
+
+
+def test_stl_bin_read_write():
+    import numpy as np
+    import visvis as vv
+    from visvis.vvio.stl import StlReader
+    m = vv.meshRead('bunny.ssdf')
+    fname = os.path.expanduser('~/bunny3.stl')
+    vv.meshWrite(fname, m)
+    
+    m2 = StlReader.read(fname)
+    assert m2._faces is None
+    assert m2._vertices.shape == (len(m._faces), 3)
+    assert np.all(m2._vertices == m._vertices[m._faces])
+    
+    m3 = StlReader.read(fname, merge=True)
+    assert m3._vertices.shape == m._vertices.shape
+    assert np.all(m3._vertices[m3._faces] == m2._vertices)
+
+
+def test_wavefront_read_write():
+    import numpy as np
+    import visvis as vv
+    from visvis.vvio.wavefront import WavefrontReader
+    m = vv.meshRead('bunny.ssdf')
+    vv.processing.calculateNormals(m)
+    fname = os.path.expanduser('~/bunny4.obj')
+    vv.meshWrite(fname, m)
+    
+    # Read in bulk, also with chunks that split lines
+    for chunkSize in (2**24, 10000):
+        m2 = WavefrontReader.read(fname, chunkSize=chunkSize)
+        assert np.all(m2._faces == m._faces)
+        assert np.abs(m2._vertices - m._vertices).max() < 1e-5
+        assert np.abs(m2._normals - m._normals).max() < 1e-5
+    
+    # Relative indices, and a mix of triangles and quads (read line by line)
+    fname = os.path.expanduser('~/mixed.obj')
+    with open(fname, 'wb') as f:
+        f.write(b'v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nf -4 -3 -2\n')
+    m3 = WavefrontReader.read(fname)
+    assert m3._faces.tolist() == [0, 1, 2]
+    with open(fname, 'ab') as f:
+        f.write(b'f 1 2 3 4\n')
+    try:
+        WavefrontReader.read(fname)
+    except RuntimeError:
+        pass  # Mixed triangles and quads are not supported
+    else:
+        assert False
+    
+    # Faces with different formats are read line by line
+    with open(fname, 'wb') as f:
+        f.write(b'v 0 0 0\nv 1 0 0\nv 1 1 0\nvt 0 0\nvn 0 0 1\n')
+        f.write(b'f 1/1 2/1 3/1\nf 1/1/1 2 3/1\n')
+    m4 = WavefrontReader.read(fname)
+    assert m4._faces.tolist() == [0, 1, 2, 3, 4, 2]
+    assert m4._vertices.tolist()[3:] == [[0, 0, 0], [1, 0, 0]]
+    assert m4._values is None
+    
+    # Vertices with different amounts of numbers are read line by line
+    with open(fname, 'wb') as f:
+        f.write(b'v 0 0 0\nv 1 0 0\nv 0 1 0 1 0 0\nf 1 2 3\n')
+    m5 = WavefrontReader.read(fname)
+    assert m5._vertices.tolist() == [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+
+
+def test_movie_write_gif(monkeypatch):
+    import sys
+    import numpy as np
+    import pytest
+    import visvis as vv
+    mw = sys.modules['visvis.functions.movieWrite']
+    
+    frames = [np.full((20, 30, 3), 50 * i, np.uint8) for i in range(4)]
+    fname = os.path.expanduser('~/movie.gif')
+    
+    # With imageio, the frames and its arguments are passed to it
+    calls = []
+    class FakeImageio:
+        def mimwrite(self, *args, **kwargs):
+            calls.append((args, kwargs))
+    monkeypatch.setattr(mw, 'imageio', FakeImageio())
+    vv.movieWrite(fname, frames, fps=10, loop=0, palettesize=64)
+    assert calls == [((fname, frames), dict(fps=10, loop=0, palettesize=64))]
+    assert not mw._isStreamed(fname) and mw._isStreamed(fname, True)
+    
+    # Unless asked to stream them
+    vv.movieWrite(fname, iter(frames), fps=10, stream=True, processes=1)
+    assert len(calls) == 1
+    assert os.path.getsize(fname) > 0
+    
+    # Without imageio, the frames are streamed
+    monkeypatch.setattr(mw, 'imageio', None)
+    assert mw._isStreamed(fname)
+    os.remove(fname)
+    vv.movieWrite(fname, (im for im in frames), fps=10, loop=0, processes=1)
+    assert os.path.getsize(fname) > 0
+    with pytest.raises(TypeError) as err:
+        vv.movieWrite(fname, iter(frames), fps=10, palettesize=64)
+    assert 'palettesize' in str(err.value)
+
+
+def test_movie_write_avi(monkeypatch):
+    import sys
+    import numpy as np
+    import pytest
+    import visvis as vv
+    from visvis.vvmovie import images2avi
+    mw = sys.modules['visvis.functions.movieWrite']
+    
+    frames = [np.full((16, 32, 3), 50 * i, np.uint8) for i in range(4)]
+    fname = os.path.expanduser('~/movie.mp4')
+    calls = []
+    def writeAvi(*args, **kwargs):
+        calls.append((args, kwargs))
+    monkeypatch.setattr(images2avi, 'writeAvi', writeAvi)
+    
+    # With imageio, the frames and its arguments are passed to it
+    class FakeImageio:
+        def mimwrite(self, *args, **kwargs):
+            calls.append(('imageio', args, kwargs))
+    monkeypatch.setattr(mw, 'imageio', FakeImageio())
+    vv.movieWrite(fname, frames, fps=5, quality=8, macro_block_size=1)
+    assert calls == [('imageio', (fname, frames),
+                        dict(fps=5, quality=8, macro_block_size=1))]
+    
+    # Without imageio, the frames are streamed to ffmpeg, with the
+    # arguments of imageio as options of ffmpeg
+    monkeypatch.setattr(mw, 'imageio', None)
+    calls[:] = []
+    gen = iter(frames)
+    vv.movieWrite(fname, gen, fps=5, codec='libx264', quality=10,
+                    bitrate='1M', pixelformat='yuv420p',
+                    output_params=['-g', '1'], ffmpeg_log_level='quiet')
+    assert calls == [((fname, gen), dict(duration=0.2, encoding='libx264',
+                    inputOptions='-loglevel quiet',
+                    outputOptions='-crf 0 -b:v 1M -pix_fmt yuv420p -g 1'))]
+    calls[:] = []
+    vv.movieWrite(fname, gen, quality=5, outputOptions='-an')
+    assert calls[0][1]['outputOptions'] == '-an -qscale:v 16'
+    with pytest.raises(TypeError) as err:
+        vv.movieWrite(fname, gen, macro_block_size=16)
+    assert 'macro_block_size' in str(err.value)
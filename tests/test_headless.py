@@ -0,0 +1,303 @@
+import os
+
+import numpy as np
+import pytest
+
+
+def get_app():
+    """ Get the app of the headless backend, skip if PyOpenGL is not
+    set up for offscreen rendering.
+    """
+    import OpenGL.platform
+    platform = type(OpenGL.platform.PLATFORM).__name__
+    if platform not in ('EGLPlatform', 'OSMesaPlatform'):
+        pytest.skip('Set PYOPENGL_PLATFORM to egl or osmesa to ' +
+                    'test the headless backend.')
+    import visvis as vv
+    return vv.use('headless')
+
+
+def test_headless_draw():
+    import visvis as vv
+    from PIL import Image
+    app = get_app()
+    
+    fig = vv.figure()
+    try:
+        fig.position = 0, 0, 200, 150
+        assert fig.position.size == (200, 150)
+        
+        # Draw a red line on white
+        a = vv.gca()
+        a.bgcolor = 'w'
+        a.axis.visible = False
+        line = vv.plot([0, 1, 0, 1], lc='r', lw=5, axes=a)
+        fig.DrawNow()
+        im = vv.getframe(fig)
+        assert im.shape == (150, 200, 3)
+        red = (im[:,:,0] > 0.9) & (im[:,:,1] < 0.1) & (im[:,:,2] < 0.1)
+        assert red.sum() > 100
+        
+        # Draw() takes effect when the events are processed
+        frames = []
+        fig.eventAfterDraw.Bind(lambda event: frames.append(1))
+        line.SetYdata([1, 0, 1, 0])
+        assert not frames
+        app.ProcessEvents()
+        assert len(frames) == 1
+        im2 = vv.getframe(fig)
+        assert not np.all(im2 == im)
+        
+        # Redrawing from the buffered axes gives the same image
+        fig.DrawNow()
+        assert np.all(vv.getframe(fig) == im2)
+        
+        # Screenshot and recording
+        assert vv.screenshot(None, fig, sf=1).shape == (150, 200, 3)
+        rec = vv.record(fig)
+        line.SetYdata([0, 0, 1, 1])
+        vv.processEvents()
+        rec.Stop()
+        frames = rec.GetFrames()
+        assert len(frames) == 1
+        assert frames[0].shape == (150, 200, 3)
+        assert frames[0].dtype == np.uint8
+        assert np.all(frames[0] == np.round(vv.getframe(fig) * 255))
+        
+        # Export streams the frames to the GIF file
+        fname = os.path.expanduser('~/recording.gif')
+        rec.Export(fname)
+        im = Image.open(fname)
+        assert im.size == (200, 150) and getattr(im, 'n_frames', 1) == 1
+        im.close()
+    
+    finally:
+        fig.Destroy()
+
+
+def test_headless_subplots():
+    import visvis as vv
+    get_app()
+    
+    fig = vv.figure()
+    try:
+        fig.position = 0, 0, 300, 200
+        a1 = vv.subplot(121)
+        a2 = vv.subplot(122)
+        a1.axis.visible = a2.axis.visible = False
+        vv.plot([1, 2, 3], lc='b', axes=a1)
+        line = vv.plot([1, 2, 3], lc='g', axes=a2)
+        fig.DrawNow()
+        im1, im2 = vv.getframe(a1), vv.getframe(a2)
+        
+        # Only the second axes draws anew, the first is the same
+        assert not a1._isdirty and not a2._isdirty
+        line.SetYdata([3, 2, 1])
+        assert a2._isdirty and not a1._isdirty
+        fig.DrawNow()
+        assert np.all(vv.getframe(a1) == im1)
+        assert not np.all(vv.getframe(a2) == im2)
+    
+    finally:
+        fig.Destroy()
+
+
+def test_headless_mesh_shading():
+    import visvis as vv
+    get_app()
+    
+    fig = vv.figure()
+    try:
+        fig.position = 0, 0, 150, 150
+        a = vv.gca()
+        a.axis.visible = False
+        m = vv.solidSphere(N=8, M=8)
+        m.faceShading = 'flat'
+        fig.DrawNow()
+        im1 = vv.getframe(fig)
+        
+        # Flat and smooth normals are kept in their own buffer
+        m.faceShading = 'smooth'
+        m.edgeShading = 'flat'
+        fig.DrawNow()
+        buffers = dict((key[1], b) for key, b in m._buffers.items()
+                                    if key[0] == id(m))
+        assert buffers['normals']._dataRef is m._normals
+        assert buffers['flatNormals']._dataRef is m._flatNormals
+        
+        # Switching back gives the same image
+        m.faceShading = 'flat'
+        m.edgeShading = None
+        fig.DrawNow()
+        assert np.all(vv.getframe(fig) == im1)
+    
+    finally:
+        fig.Destroy()
+
+
+def test_headless_mesh_lod():
+    import visvis as vv
+    get_app()
+    
+    fig = vv.figure()
+    try:
+        fig.position = 0, 0, 150, 150
+        a = vv.gca()
+        a.axis.visible = False
+        m = vv.solidSphere(N=64, M=64)
+        m.lod = True
+        fig.DrawNow(True) # Fast draw uses the coarsest level
+        levels = [b for key, b in m._buffers.items() if key[0] != id(m)]
+        assert levels and all(b._bufferId for b in levels)
+        
+        # Toggling the levels of detail destroys their buffers
+        m.lod = False
+        assert all(not b._bufferId and b.data is None for b in levels)
+        m.lod = True
+        fig.DrawNow(True)
+        levels2 = [b for key, b in m._buffers.items() if key[0] != id(m)]
+        assert len(levels2) == len(levels)
+        assert not [b for b in levels2 if b in levels]
+    
+    finally:
+        fig.Destroy()
+
+
+def test_headless_texture_clim():
+    import visvis as vv
+    get_app()
+    
+    fig = vv.figure()
+    try:
+        data = np.arange(100, dtype=np.float32).reshape(10, 10)
+        t = vv.imshow(data)
+        vv.gca().axis.visible = False
+        fig.DrawNow()
+        assert t._GetMinmax() == (0, 99)
+        assert t._GetMinmax() is t._GetMinmax()
+        
+        # The min and max are calculated anew when the data is set again
+        data[0, 0] = -5
+        t.Refresh()
+        t.SetClim()
+        assert (t.clim.min, t.clim.max) == (-5, 99)
+        t.SetData(data * 2)
+        t.SetClim()
+        assert (t.clim.min, t.clim.max) == (-10, 198)
+    
+    finally:
+        fig.Destroy()
+
+
+def test_headless_texture_mipmap():
+    import OpenGL.GL as gl
+    import visvis as vv
+    get_app()
+    
+    def getMinFilter(t):
+        fig.MakeCurrent()
+        gl.glBindTexture(gl.GL_TEXTURE_2D, t._texture1._texId)
+        value = gl.glGetTexParameteriv(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        return int(np.asarray(value).ravel()[0])
+    
+    fig = vv.figure()
+    try:
+        t = vv.imshow(np.random.uniform(0, 1, (64, 64)).astype(np.float32))
+        vv.gca().axis.visible = False
+        fig.DrawNow()
+        
+        # Mipmaps are opt-in
+        assert not t.mipmap
+        assert getMinFilter(t) == gl.GL_NEAREST
+        t.mipmap = True
+        fig.DrawNow()
+        assert getMinFilter(t) == gl.GL_NEAREST_MIPMAP_NEAREST
+        t.interpolate = True
+        fig.DrawNow()
+        assert getMinFilter(t) == gl.GL_LINEAR_MIPMAP_LINEAR
+    
+    finally:
+        fig.Destroy()
+
+
+def test_headless_axis_layout():
+    import visvis as vv
+    get_app()
+    
+    fig = vv.figure()
+    try:
+        fig.position = 0, 0, 200, 150
+        a = vv.gca()
+        vv.plot([1, 2, 3], axes=a)
+        
+        # Count how often the lines and labels are calculated
+        calls = []
+        def create(axes):
+            calls.append(1)
+            return vv.Pointset(3), vv.Pointset(3), vv.Pointset(3)
+        a.axis._CreateLinesAndLabels = create
+        
+        # The layout is reused if nothing changes
+        fig.DrawNow()
+        fig.DrawNow()
+        assert len(calls) == 1
+        
+        # It is calculated anew when the limits change ...
+        a.SetLimits((0, 10), (0, 5))
+        fig.DrawNow()
+        assert len(calls) == 2
+        
+        # ... when the ticks or their formatting change ...
+        a.axis.xTicks = {1: 'one', 2: 'two'}
+        fig.DrawNow()
+        assert len(calls) == 3
+        a.axis.xTicksAngle = 45
+        fig.DrawNow()
+        a.axis.tickFontSize = 12
+        fig.DrawNow()
+        assert len(calls) == 5
+        
+        # ... and when the size of the axes changes
+        fig.position = 0, 0, 300, 200
+        fig.DrawNow()
+        assert len(calls) == 6
+        fig.DrawNow()
+        assert len(calls) == 6
+    
+    finally:
+        fig.Destroy()
+
+
+def test_pixel_reader():
+    import visvis as vv
+    from visvis.core.baseBuffer import PixelReader
+    get_app()
+    
+    fig = vv.figure()
+    try:
+        fig.position = 0, 0, 100, 80
+        a = vv.gca()
+        a.axis.visible = False
+        line = vv.plot([0, 1], lc='r', lw=3, axes=a)
+        fig.DrawNow()
+        
+        # The reader returns the previous frame
+        reader = PixelReader(2)
+        assert reader.Read(0, 0, 100, 80) is None
+        assert reader.pendingCount == 1
+        im1 = vv.getframe(fig)
+        line.SetYdata([1, 0])
+        fig.DrawNow()
+        frame = reader.Read(0, 0, 100, 80)
+        assert frame.shape == (80, 100, 3) and frame.dtype == np.uint8
+        assert np.all(frame == np.round(im1 * 255))
+        
+        # Flush gives the remaining frames
+        frames = reader.Flush()
+        assert len(frames) == 1 and reader.pendingCount == 0
+        assert np.all(frames[0] == np.round(vv.getframe(fig) * 255))
+        reader.Destroy()
+    
+    finally:
+        fig.Destroy()
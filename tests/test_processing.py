@@ -57,6 +57,7 @@ def test_combine_meshes():
 
 
 def test_calculate_normals():
+    import numpy as np
     import visvis as vv
     
     pp = vv.Pointset(3)
@@ -74,6 +75,10 @@ def test_calculate_normals():
     assert m._normals is not None
     assert m._normals.shape == (4, 3)
     
+    # Processing the faces in chunks gives the same result
+    vv.processing.calculateNormals(m, chunkSize=1)
+    assert np.abs(m._normals - normals1).max() < 1e-6
+    
     vv.processing.calculateFlatNormals(m)
     normals2 = m._normals
     
@@ -111,3 +116,77 @@ def test_statistics():
     assert d.percentile(0.7)
     assert d.histogram()
     assert d.kde()
+
+
+def test_calculate_normals_shared_vertices():
+    import numpy as np
+    import visvis as vv
+    
+    # A fan of triangles that all share vertex 0 at the same position
+    # in the faces array, so that index repeats within one column.
+    pp = vv.Pointset(3)
+    pp.append((0, 0, 0))
+    for i in range(9):
+        a = i * np.pi / 4
+        pp.append((np.cos(a), np.sin(a), 0.5 * (i % 2)))
+    faces = []
+    for i in range(1, 9):
+        faces.extend([0, i, i + 1])
+    m = vv.BaseMesh(pp, faces=faces)
+    
+    # Reference: accumulate with a plain loop
+    vertices = m._vertices.astype('float64')
+    ref = np.zeros_like(vertices)
+    for f in m._GetFaces():
+        n = np.cross(vertices[f[1]] - vertices[f[0]],
+                     vertices[f[1]] - vertices[f[2]])
+        ref[f] += n
+    ref /= ((ref**2).sum(1)**0.5).reshape(-1, 1)
+    ref = -ref
+    
+    # Whole mesh at once, and in small chunks
+    for chunkSize in (None, 1, 3):
+        m._normals = None
+        vv.processing.calculateNormals(m, chunkSize)
+        assert np.abs(m._normals - ref).max() < 1e-5
+
+
+def test_decimate_mesh():
+    import numpy as np
+    import visvis as vv
+    
+    m = vv.meshRead('bunny.ssdf')
+    nfaces = len(m._GetFaces())
+    
+    previous = nfaces
+    for gridSize in (64, 32, 16):
+        m2 = vv.processing.decimateMesh(m, gridSize)
+        faces = m2._GetFaces()
+        assert isinstance(m2, vv.BaseMesh)
+        assert 0 < len(faces) < previous
+        assert faces.max() < len(m2._vertices)
+        # No degenerate faces
+        assert np.all(faces[:,0] != faces[:,1])
+        assert np.all(faces[:,1] != faces[:,2])
+        # Vertices stay within the bounding box of the original
+        assert np.all(m2._vertices.min(0) >= m._vertices.min(0) - 1e-6)
+        assert np.all(m2._vertices.max(0) <= m._vertices.max(0) + 1e-6)
+        previous = len(faces)
+
+
+def test_select_level_of_detail():
+    import numpy as np
+    from visvis.wobjects.polygonalModeling import (getProjectedSize,
+                                                   selectLevelOfDetail)
+    
+    # Orthographic projection of the unit cube on a 200x100 viewport
+    bounds = np.zeros(3), np.ones(3)
+    eye = np.eye(4)
+    size = getProjectedSize(bounds, eye, eye, (0, 0, 200, 100))
+    assert size == 100.0
+    
+    levels = [(128, 'a'), (64, 'b'), (32, 'c')]
+    assert selectLevelOfDetail(levels, 100, 'full') == 'b'
+    assert selectLevelOfDetail(levels, 10, 'full') == 'c'
+    assert selectLevelOfDetail(levels, 1000, 'full') == 'full'
+    assert selectLevelOfDetail(levels, None, 'full') == 'full'
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from visvis.utils.pypoints import Point, Pointset
+
+
+def test_pointset_append_many():
+    pp = Pointset(3)
+    pp.append(1, 2, 3)
+    pp.append_many(np.arange(30).reshape(10, 3))
+    pp.append_many([Point(7, 8, 9), (4, 5, 6)])
+    pp.append_many([])
+    assert len(pp) == 13
+    assert pp[1].data.tolist() == [[0, 1, 2]]
+    assert pp[-1].data.tolist() == [[4, 5, 6]]
+    pp.extend(np.ones((2, 3)))
+    assert len(pp) == 15
+    
+    # Wrong dimension
+    try:
+        pp.append_many(np.zeros((4, 2)))
+    except ValueError:
+        pass
+    else:
+        assert False, 'Expected ValueError'
+    
+    # The array interface does not copy
+    a = np.asarray(pp)
+    assert a.shape == (15, 3)
+    a[0, 0] = 100
+    assert pp[0, 0] == 100
+    assert np.asarray(pp, np.float64).dtype == np.float64
+    
+    # Iteration gives points
+    assert [p.x for p in pp][:3] == [100, 0, 3]
+    
+    # The deprecated next() still works after iter()
+    assert iter(pp) is not pp
+    with pytest.deprecated_call():
+        assert pp.next().x == 100 and next(pp).x == 0
+        assert [next(pp).x for i in range(13)][-1] == 1
+        pytest.raises(StopIteration, pp.next)
+
+
+def test_pointset_find():
+    pp = Pointset(np.array([(0, 0), (1, 1), (2, 2), (1, 1), (1.05, 1)]))
+    assert pp.contains(1, 1) and not pp.contains(1, 2)
+    assert pp.contains_many([(1, 1), (3, 3)]).tolist() == [True, False]
+    assert pp.contains_many([(1.04, 1.0)], 0.1).tolist() == [True]
+    
+    pp.remove_all(1, 1)
+    assert len(pp) == 3
+    pp.remove_many([(1, 1), (2.01, 2)], tol=0.1)
+    assert pp.data.tolist() == [[0, 0]]
+    pp.remove(0, 0)
+    assert len(pp) == 0
+
+
+def test_pointset_capacity():
+    pp = Pointset(2)
+    pp.reserve(1000)
+    assert pp.capacity == 1000
+    pp.append_many(np.zeros((1000, 2)))
+    assert pp.capacity == 1000
+    
+    # Does not shrink below the reserved capacity
+    del pp[10:]
+    assert pp.capacity == 1000
+    pp.shrink_to_fit()
+    assert pp.capacity == 10 and len(pp) == 10
+    pp.append(1, 2)
+    assert pp.capacity == 16 and pp[10].data.tolist() == [[1, 2]]
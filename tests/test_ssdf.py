@@ -0,0 +1,98 @@
+import os
+
+
+def _get_struct():
+    import numpy as np
+    import visvis as vv
+    s = vv.ssdf.new()
+    s.sampling = [1.0, 2.0, 3.0]
+    s.vol = np.random.normal(size=(20, 30, 40)).astype('float32')
+    s.sub = vv.ssdf.new()
+    s.sub.a = np.arange(10)
+    s.sub.items = [1, 'x', None, np.zeros((0, 3))]
+    return s
+
+
+def test_ssdf_bin_read_write():
+    import visvis as vv
+    from visvis.utils.ssdf.ssdf_base import _not_equal
+    s = _get_struct()
+    
+    for compress in (True, False):
+        s2 = vv.ssdf.loadb(vv.ssdf.saveb(s, compress=compress))
+        assert not _not_equal(s, s2)
+
+
+def test_ssdf_bin_mmap():
+    import numpy as np
+    import visvis as vv
+    from visvis.utils.ssdf.ssdf_base import _not_equal
+    s = _get_struct()
+    fname = os.path.expanduser('~/test_mmap.bsdf')
+    
+    vv.ssdf.save(fname, s, compress=False)
+    s2 = vv.ssdf.load(fname)
+    assert not _not_equal(s, s2)
+    assert not isinstance(s2.vol, np.memmap)
+    
+    s3 = vv.ssdf.load(fname, mmap=True)
+    assert not _not_equal(s, s3)
+    assert isinstance(s3.vol, np.memmap)
+    assert s3.vol.offset % 4096 == 0
+    assert s3.sampling == s.sampling
+    del s3
+    
+    # Compressed files can be loaded with mmap, but are read into memory
+    vv.ssdf.save(fname, s)
+    s4 = vv.ssdf.load(fname, mmap=True)
+    assert not _not_equal(s, s4)
+    assert not isinstance(s4.vol, np.memmap)
+
+
+def test_ssdf_bin_threads():
+    import visvis as vv
+    from visvis.utils.ssdf.ssdf_base import _not_equal
+    s = _get_struct()
+    fname = os.path.expanduser('~/test_threads.bsdf')
+    
+    # Small partitions, so that the arrays span many of them
+    vv.ssdf.save(fname, s, compress=1, threads=4, partitionSize=2**12)
+    for threads in (1, 3, 0):
+        s2 = vv.ssdf.load(fname, threads=threads)
+        assert not _not_equal(s, s2)
+    
+    bb1 = vv.ssdf.saveb(s)
+    bb2 = vv.ssdf.saveb(s, threads=4)
+    assert bb1 == bb2
+    
+    # Level 0 means uncompressed, as compress=False
+    assert vv.ssdf.saveb(s, compress=0)[:4] == vv.ssdf.saveb(s, compress=False)[:4]
+    assert vv.ssdf.saveb(s, compress=0)[:4] == b'BSDU'
+    try:
+        vv.ssdf.saveb(s, compress=10)
+    except ValueError:
+        pass
+    else:
+        assert False, 'Expected ValueError'
+
+
+def test_ssdf_bin_threads_error():
+    import threading
+    from visvis.utils.ssdf import ssdf_bin
+    s = _get_struct()
+    
+    class FailingFile(object):
+        def write(self, data):
+            if len(data) > 100:
+                raise IOError('disk full')
+    
+    # The thread pool is stopped when writing fails
+    count = threading.active_count()
+    writer = ssdf_bin.BinarySSDFWriter(threads=4, partitionSize=2**12)
+    try:
+        writer.write(s, FailingFile())
+    except IOError:
+        pass
+    else:
+        assert False, 'Expected IOError'
+    assert threading.active_count() == count
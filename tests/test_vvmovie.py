@@ -0,0 +1,337 @@
+import numpy as np
+import pytest
+
+
+def get_image():
+    y, x = np.mgrid[0:100, 0:150]
+    im = np.zeros((100, 150, 3), np.uint8)
+    im[:, :, 0] = x * 255 // 150
+    im[:, :, 1] = y * 255 // 100
+    im[:, :, 2] = 128
+    im[20:40, 30:90] = 255, 0, 0
+    return im
+
+
+def test_neuquant():
+    from visvis.vvmovie.images2gif import NeuQuant, nearestColors
+    
+    im = get_image()
+    nq = NeuQuant(im, 10)
+    assert nq.colormap.shape == (256, 4)
+    
+    # Each pixel gets the nearest color of the palette
+    indices = nq.quantizeArray(im)
+    assert indices.shape == (100, 150) and indices.dtype == np.uint8
+    palette = nq.colormap[:, :3]
+    dists = ((palette[None] - im.reshape(-1, 1, 3).astype(int))**2).sum(2)
+    assert np.all(dists.min(1) == dists[np.arange(len(dists)), indices.ravel()])
+    assert np.abs(palette[indices] - im).mean() < 8
+    assert (palette == (255, 0, 0)).all(1).any()
+    
+    # The result is the same when the colors are known
+    assert np.all(nq.quantizeArray(im) == indices)
+    assert np.all(nq.quantizeArray(im[::2, ::3]) == indices[::2, ::3])
+    assert nearestColors([(0, 0, 0), (250, 5, 0)], [(0, 0, 0), (255, 0, 0)]).tolist() == [0, 1]
+    
+    # PIL image with the palette
+    pim = nq.quantize(im)
+    assert pim.mode == 'P'
+    assert np.all(np.asarray(pim.convert('RGB')) == palette[indices])
+
+
+def test_neuquant_compat():
+    from visvis.vvmovie.images2gif import NeuQuant
+    
+    im = get_image()
+    nq = NeuQuant(im, 10)
+    
+    # The per-pixel training steps still work
+    nq.setUpArrays()
+    i = nq.contest(255, 0, 0)
+    assert nq.SPECIALS <= i < nq.NETSIZE
+    nq.altersingle(0.5, i, 255, 0, 0)
+    nq.alterneigh(0.5, 4, i, 255, 0, 0)
+    assert nq.network[i, 0] > 100
+    assert nq.geta(0.5, 4).shape == (7,)
+    assert nq.specialFind(255, 255, 255) == 1
+    assert nq.specialFind(1, 2, 3) == -1
+    
+    # The scipy variants of quantize() are deprecated aliases
+    nq = NeuQuant(im, 10)
+    ref = np.asarray(nq.quantize(im))
+    for name in ('quantize_with_scipy', 'quantize_without_scipy'):
+        with pytest.warns(DeprecationWarning):
+            pim = getattr(nq, name)(im)
+        assert np.all(np.asarray(pim) == ref)
+
+
+def test_gif_shared_palette():
+    from visvis.vvmovie.images2gif import GifWriter
+    
+    im = get_image()
+    frames = [im, np.roll(im, 10, 1), im, im[:, :, 0]]
+    writer = GifWriter()
+    
+    # Same images share the palette
+    cache = {}
+    result = writer.convertImagesToPIL(frames, False, 10, False, cache)
+    assert len(cache) == 3
+    assert result[0].getpalette() == result[2].getpalette()
+    assert result[0].getpalette() != result[1].getpalette()
+    
+    # One palette for all images
+    cache = {}
+    result = writer.convertImagesToPIL(frames, False, 10, True, cache)
+    assert len(cache) == 1
+    assert len(set([tuple(im.getpalette()) for im in result])) == 1
+    assert np.all(np.asarray(result[2]) == np.asarray(result[0]))
+
+
+def test_gif_stream():
+    import os
+    from PIL import Image
+    from visvis.vvmovie.images2gif import writeGifStream
+    
+    def generate(n):
+        for i in range(n):
+            im = np.zeros((60, 80, 3), np.uint8)
+            im[:, :, 2] = 200
+            im[10:20, 2*i:2*i+10] = 255, 0, 0
+            yield im
+    
+    fname = os.path.expanduser('~/stream.gif')
+    for processes in [1, 2]:
+        n = writeGifStream(fname, generate(12), [0.1] * 6 + [0.2] * 6,
+                            processes=processes, lookAhead=3)
+        assert n == 12
+        
+        # Read back; the sub-rectangles are combined by PIL
+        im = Image.open(fname)
+        assert im.n_frames == 12
+        for i, frame in enumerate(generate(12)):
+            im.seek(i)
+            assert im.info['duration'] == (100 if i < 6 else 200)
+            frame2 = np.asarray(im.convert('RGB'))
+            assert np.abs(frame2.astype(int) - frame).max() < 8
+        im.close()
+    
+    # With a shared NeuQuant palette
+    n = writeGifStream(fname, generate(3), nq=10, sharePalette=True,
+                        subRectangles=False, processes=2)
+    im = Image.open(fname)
+    assert im.n_frames == 3
+    im.close()
+
+
+def test_swf_bits():
+    from visvis.vvmovie.images2swf import (BitArray, intToBits, bitsToInt,
+                                           signedIntToBits, twitsToBits)
+    
+    assert str(intToBits(5, 8)) == '00000101'
+    assert str(signedIntToBits(-5)) == '1011'
+    assert str(signedIntToBits(-5, 8)) == '11111011'
+    assert str(signedIntToBits(5)) == '0101'
+    assert len(intToBits(0)) == 0
+    assert str(twitsToBits([0, 1])) == '00110' + '000000' + '010100'
+    
+    # Fields and padding
+    bits = BitArray('101')
+    bits.AppendInt(3, 4)
+    bits.AppendInt(-1, 3, True)
+    assert str(bits) == '1010011111'
+    assert bits.ToBytes() == b'\xa7\xc0'
+    assert bitsToInt(b'\x34\x12', 16) == 0x1234
+    
+    # Bulk append (numpy is used for many values) equals appending one by one
+    values = list(range(-100, 100, 3))
+    bits1, bits2 = BitArray(), BitArray('1')
+    for value in values:
+        bits1.AppendInt(value, 9, True)
+    bits2.AppendInts(np.array(values), 9, True)
+    assert len(bits2) == len(bits1) + 1
+    assert str(bits2) == '1' + str(bits1)
+    
+    for args in [(8, 3), (-5, 3, True), (4, 3, True)]:
+        try:
+            BitArray().AppendInt(*args)
+        except ValueError:
+            pass
+        else:
+            assert False, 'Expected ValueError'
+
+
+def test_swf_write_read():
+    import os
+    from visvis.vvmovie.images2swf import writeSwf, readSwf
+    
+    im = get_image()
+    frames = [im, im[:, :, 1], np.dstack([im, im[:, :, :1]])]
+    fname = os.path.expanduser('~/movie.swf')
+    writeSwf(fname, frames, [0.1, 0.2, 0.1], repeat=False)
+    frames2 = readSwf(fname)
+    assert len(frames2) == 3
+    assert np.all(frames2[0][:, :, :3] == im)
+    assert np.all(frames2[1][:, :, 0] == im[:, :, 1])
+    assert np.all(frames2[2] == frames[2])
+
+
+def test_avi_pipe():
+    import os
+    from visvis.vvmovie.images2avi import getFfmpegExe, writeAvi, AviReader
+    if getFfmpegExe() is None:
+        pytest.skip('ffmpeg is not available')
+    
+    im = get_image()
+    fname = os.path.expanduser('~/movie.avi')
+    frames = (np.roll(im, 4*i, 1) for i in range(20))
+    assert writeAvi(fname, frames, 0.1, outputOptions='-q:v 2') == 20
+    
+    reader = AviReader(fname, 4)
+    assert reader.size == (150, 100)
+    frames2 = list(reader)
+    assert len(frames2) == 20
+    for i, frame in enumerate(frames2):
+        assert frame.shape == (100, 150, 3) and frame.dtype == np.uint8
+        diff = np.abs(frame.astype(int) - np.roll(im, 4*i, 1))
+        assert diff.mean() < 10
+    
+    # Stop reading halfway
+    for i, frame in enumerate(AviReader(fname, 2)):
+        if i == 5:
+            break
+
+
+FAKE_FFMPEG = """#!%s
+# A fake ffmpeg that reads and writes raw rgb24 frames, prefixed by the size
+import os, sys, signal
+signal.alarm(20) # Fail instead of hanging if stdin is never closed
+args = sys.argv[1:]
+mode = os.environ.get('FAKE_FFMPEG_MODE', '')
+if args[0] == '-y':
+    if mode == 'fail':
+        sys.exit(1)
+    size = args[args.index('-s') + 1]
+    w, h = [int(i) for i in size.split('x')]
+    data = sys.stdin.buffer.read() # Until stdin is closed
+    if len(data) %% (w * h * 3):
+        sys.exit(2)
+    open(args[-1], 'wb').write(size.encode() + b'\\n' + data)
+    sys.stderr.write('x' * 200000) # Lots of logging
+elif len(args) == 2:
+    size = open(args[1], 'rb').readline().decode().strip()
+    if mode != 'nosize':
+        sys.stderr.write('  Stream #0:0: Video: rawvideo, rgb24, %%s, 10 fps\\n' %% size)
+    sys.exit(1)
+else:
+    f = open(args[1], 'rb')
+    f.readline()
+    sys.stdout.buffer.write(f.read())
+    if mode == 'fail':
+        sys.exit(1)
+"""
+
+
+def test_avi_fake_ffmpeg(monkeypatch):
+    import os, sys
+    from visvis.vvmovie.images2avi import (getFfmpegExe, writeAvi, readAvi,
+                                           AviWriter, AviReader)
+    if os.name == 'nt':
+        pytest.skip('The fake ffmpeg needs a posix system')
+    
+    # Put the fake ffmpeg on the PATH
+    dirname = os.path.expanduser('~/fakeffmpeg')
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    exe = os.path.join(dirname, 'ffmpeg')
+    f = open(exe, 'w')
+    f.write(FAKE_FFMPEG % sys.executable)
+    f.close()
+    os.chmod(exe, 0o755)
+    monkeypatch.delenv('FFMPEG_EXE', raising=False)
+    monkeypatch.delenv('FAKE_FFMPEG_MODE', raising=False)
+    monkeypatch.setenv('PATH', dirname)
+    assert getFfmpegExe() == exe
+    
+    # Frames are passed as raw rgb24 data, and stdin is closed at the end
+    im = get_image()
+    fname = os.path.expanduser('~/fakeffmpeg/movie.avi')
+    frames = [np.roll(im, 4*i, 1) for i in range(20)]
+    frames[3] = im[:, :, 0] # Gray
+    assert writeAvi(fname, (frame for frame in frames), 0.1) == 20
+    data = open(fname, 'rb').read()
+    assert data.startswith(b'150x100\n')
+    assert len(data) == 8 + 20 * 100 * 150 * 3
+    
+    reader = AviReader(fname, 2)
+    assert reader.size == (150, 100)
+    frames2 = readAvi(fname)
+    assert len(frames2) == 20
+    assert np.all(frames2[0] == frames[0]) and np.all(frames2[-1] == frames[-1])
+    assert np.all(frames2[3] == np.dstack([frames[3]] * 3))
+    for i, frame in enumerate(reader):
+        if i == 5:
+            break # Stop reading halfway
+    
+    # Frames should have the same shape
+    writer = AviWriter(fname)
+    writer.Write(im)
+    pytest.raises(ValueError, writer.Write, im[::2])
+    writer.Close()
+    
+    # Errors of ffmpeg
+    monkeypatch.setenv('FAKE_FFMPEG_MODE', 'fail')
+    pytest.raises(RuntimeError, writeAvi, fname, frames)
+    pytest.raises(RuntimeError, writeAvi, fname, [im])
+    pytest.raises(RuntimeError, readAvi, fname)
+    monkeypatch.setenv('FAKE_FFMPEG_MODE', 'nosize')
+    pytest.raises(RuntimeError, AviReader, fname)
+    
+    # No ffmpeg
+    monkeypatch.setenv('PATH', '')
+    assert getFfmpegExe() is None
+    pytest.raises(RuntimeError, AviWriter, fname)
+    monkeypatch.setenv('FFMPEG_EXE', exe)
+    assert getFfmpegExe() == exe
+
+
+def test_ims_threaded():
+    import os
+    from visvis.vvmovie.images2ims import writeIms, readIms, imap
+    
+    # imap keeps the order, and takes items only as needed
+    taken = []
+    def generate():
+        for i in range(50):
+            taken.append(i)
+            yield i
+    results = imap(lambda x: x * 2, generate(), 4, 5)
+    assert next(results) == 0
+    assert len(taken) <= 6
+    assert list(results) == list(range(2, 100, 2))
+    
+    # Write and read with progress
+    im = get_image()
+    frames = [np.roll(im, 10*i, 1) for i in range(12)]
+    fname = os.path.expanduser('~/ims/frame*.png')
+    progress = []
+    assert writeIms(fname, (f for f in frames), 3, 2,
+                    lambda i, n: progress.append((i, n))) == 12
+    assert progress[-1] == (12, None)
+    progress = []
+    frames2 = readIms(fname, threads=3, progress=lambda i, n: progress.append((i, n)))
+    assert progress == [(i, 12) for i in range(1, 13)]
+    assert len(frames2) == 12
+    assert all([np.all(a == b) for a, b in zip(frames, frames2)])
+    
+    # Lazy reading with a cache
+    seq = readIms(fname, lazy=True)
+    seq._cacheSize = 3
+    assert len(seq) == 12
+    assert np.all(seq[-1] == frames[-1])
+    assert seq[2] is seq[2]
+    for i in range(5):
+        seq[i]
+    assert list(seq._cache.keys()) == [2, 3, 4]
+    assert len(seq[1:6:2]) == 3
+    assert all([np.all(a == b) for a, b in zip(seq, frames)])
+    assert readIms(fname, False)[0].size == (150, 100)
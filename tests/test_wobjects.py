@@ -0,0 +1,175 @@
+import numpy as np
+
+
+def test_bricked_volume():
+    from visvis.wobjects.brickedTextures import BrickedVolume
+
+    vol = np.zeros((10, 20, 30), np.float32)
+    vol[1, 2, 3] = 5.0
+    vol[9, 19, 29] = np.nan
+    vol[8, 19, 29] = 2.0
+    bricks = BrickedVolume(vol, 8)
+    assert bricks.grid == (2, 3, 4)
+
+    # Regions, with and without border
+    assert bricks.GetRegion((1, 2, 3)) == ((8, 16, 24), (10, 20, 30))
+    assert bricks.GetPaddedRegion((1, 2, 3)) == ((7, 15, 23), (10, 20, 30))
+    assert bricks.GetPaddedRegion((0, 0, 0)) == ((0, 0, 0), (9, 9, 9))
+    assert bricks.GetBrickData((0, 1, 0)).shape == (9, 10, 9)
+
+    # Index ignores nan, and includes the border
+    assert bricks.maxs[0, 0, 0] == 5.0
+    assert bricks.maxs[1, 2, 3] == 2.0
+    assert bricks.mins.min() == 0.0
+    assert bricks.GetNonEmptyBricks(1.0) == [(0, 0, 0), (0, 2, 3), (1, 2, 3)]
+    assert bricks.GetNonEmptyBricks(3.0) == [(0, 0, 0)]
+    assert len(bricks.GetNonEmptyBricks()) == 2 * 3 * 4
+    vol[8, 15, 23] = 4.0 # in the border of brick (0, 1, 2)
+    bricks = BrickedVolume(vol, 8)
+    assert (0, 1, 2) in bricks.GetNonEmptyBricks(3.0)
+
+    # Bricks without finite values
+    bricks = BrickedVolume(np.zeros((4, 4, 4)) * np.nan, 2)
+    assert np.isnan(bricks.maxs).all()
+    assert bricks.GetNonEmptyBricks() == []
+    assert bricks.GetNonEmptyBricks(0) == []
+
+    # Sort back to front; camera looks along -z in eye coordinates
+    bricks = BrickedVolume(np.zeros((4, 4, 4)), 2)
+    indices = [(0, 0, 0), (1, 0, 0), (0, 1, 1)]
+    modelView = np.eye(4)
+    assert bricks.SortBricks(indices, modelView) == [(0, 0, 0), (0, 1, 1), (1, 0, 0)]
+    modelView[2, 2] = -1
+    assert bricks.SortBricks(indices, modelView) == [(1, 0, 0), (0, 0, 0), (0, 1, 1)]
+    assert bricks.SortBricks([], modelView) == []
+
+
+def test_brick_cache():
+    from visvis.wobjects.brickedTextures import BrickCache
+
+    class FakeTexture:
+        destroyed = False
+        def Destroy(self):
+            self.destroyed = True
+
+    cache = BrickCache(100)
+    t1, t2, t3, t4 = [FakeTexture() for i in range(4)]
+    cache.Add(1, t1, 40)
+    cache.Add(2, t2, 40)
+    assert len(cache) == 2 and cache.nbytes == 80
+
+    # Using a texture makes it the most recent
+    assert cache.Get(1) is t1
+    assert cache.Get(5) is None
+    cache.Add(3, t3, 40)
+    assert 2 not in cache and t2.destroyed
+    assert 1 in cache and 3 in cache
+    assert cache.nbytes == 80
+
+    # A texture that is larger than the cache is kept on its own
+    cache.Add(4, t4, 200)
+    assert len(cache) == 1 and cache.Get(4) is t4
+    assert t1.destroyed and t3.destroyed
+
+    cache.Clear()
+    assert len(cache) == 0 and cache.nbytes == 0 and t4.destroyed
+
+
+def test_minmax():
+    from visvis.wobjects import textures
+    from visvis.wobjects.textures import minmax
+    
+    data = np.arange(1000, dtype=np.float32).reshape(10, 10, 10)
+    data[0, 0, 0] = np.nan
+    data[9, 9, 9] = np.inf
+    data[5, 5, 5] = -np.inf
+    assert minmax(data) == (1.0, 998.0)
+    assert minmax([3, 1, 2]) == (1, 3)
+    
+    # Chunked and threaded gives the same result
+    chunkSize, threadSize = textures._MINMAX_CHUNK_SIZE, textures._MINMAX_THREAD_SIZE
+    textures._MINMAX_CHUNK_SIZE, textures._MINMAX_THREAD_SIZE = 64, 10
+    try:
+        data2 = data.copy()
+        data2[:3] = np.nan # chunks without finite values
+        assert minmax(data2) == (300.0, 998.0)
+        data3 = np.arange(1000, dtype=np.int16).reshape(10, 10, 10)
+        assert minmax(data3[1:]) == (100, 999)
+    finally:
+        textures._MINMAX_CHUNK_SIZE, textures._MINMAX_THREAD_SIZE = chunkSize, threadSize
+    
+    # No finite values
+    try:
+        minmax(np.zeros(5) * np.nan)
+    except ValueError:
+        pass
+    else:
+        assert False, 'Expected ValueError'
+    
+    # Results are not cached, changes in place are seen
+    data = np.arange(100, dtype=np.float64)
+    assert minmax(data) == (0, 99)
+    data[0] = -5
+    assert minmax(data) == (-5, 99)
+    
+    # Percentiles
+    data = np.arange(101, dtype=np.float32)
+    data[50] = 1e6
+    mi, ma = minmax(data, 5)
+    assert abs(mi - 5) < 0.1 and abs(ma - 96) < 0.1 # 50 is an outlier
+    mi, ma = minmax(data, (0, 100))
+    assert mi == 0 and ma == 1e6
+    mi, ma = minmax(np.arange(1001, dtype=np.uint16), (10, 50))
+    assert abs(mi - 100) <= 1 and abs(ma - 500) <= 1
+
+
+def test_occupancy():
+    from visvis.wobjects.textures import calculateOccupancy
+    
+    data = np.zeros((20, 17, 8), np.float32)
+    data[9, 3, 0] = 4.0
+    data[19, 16, 7] = 2.0
+    data[0, 0, 0] = np.nan
+    occupancy = calculateOccupancy(data, 8, 2)
+    assert occupancy.shape == (3, 3, 1)
+    
+    # Compare with the brute force approach
+    for z in range(3):
+        for y in range(3):
+            cell = data[max(0, 8*z-2):8*z+10, max(0, 8*y-2):8*y+10]
+            assert occupancy[z, y, 0] == np.nanmax(cell)
+    
+    # Voxels near the border of a cell also occupy the neighbouring cell
+    assert occupancy[1, 0, 0] == 4.0 and occupancy[0, 0, 0] == 4.0
+    assert occupancy[2, 0, 0] == 0.0 and occupancy[1, 1, 0] == 0.0
+    
+    # Cells without finite values, and integer data
+    assert np.isnan(calculateOccupancy(np.zeros((4, 4, 4)) * np.nan, 2)).all()
+    data = np.arange(64, dtype=np.uint8).reshape(4, 4, 4)
+    assert calculateOccupancy(data, 2, 0).ravel().tolist() == [
+                                    21, 23, 29, 31, 53, 55, 61, 63]
+
+
+def test_cube_quads():
+    from visvis.wobjects.textures import createCubeQuads
+    
+    tex, ver = createCubeQuads((-0.5, -0.5, -0.5), (9.5, 19.5, 29.5),
+                                (0, 0, 0), (1, 1, 1), 2)
+    assert tex.shape == ver.shape == (24 * 4**2, 3)
+    assert tex.dtype == ver.dtype == np.float32
+    assert tex.min() == 0 and tex.max() == 1
+    assert (ver.min(0) == -0.5).all() and (ver.max(0) == (9.5, 19.5, 29.5)).all()
+    
+    # All vertices are on the surface of the box
+    onSurface = ((tex == 0) | (tex == 1)).any(1)
+    assert onSurface.all()
+    
+    # The first quad is a quarter of the quarter of the bottom
+    assert tex[:4].tolist() == [[0, 0, 0], [0.25, 0, 0], [0.25, 0.25, 0], [0, 0.25, 0]]
+    
+    # The arrays are shared by all volumes with the same box
+    tex2, ver2 = createCubeQuads([-0.5, -0.5, -0.5], [9.5, 19.5, 29.5],
+                                (0, 0, 0), (1.0, 1.0, 1.0), 2)
+    assert tex2 is tex and ver2 is ver
+    assert not tex.flags.writeable
+
@@ -240,8 +240,7 @@ class Graph(list):
         
         # Create array of nodes
         pp = Pointset(ndim)
-        for node in self:
-            pp.append(node)
+        pp.append_many(self)
         struct.nodes = pp.data
         
         # Create the edges
@@ -507,8 +506,7 @@ class Graph(list):
         # Build node list
         if mc and mw:
             pp = Pointset(self[0].ndim)
-            for p in self:
-                pp.append(p)
+            pp.append_many(self)
             # Draw nodes, reuse if possible!
             l_node = self._lines[0]
             if l_node and len(l_node._points) == len(pp):
@@ -530,8 +528,7 @@ class Graph(list):
             cc = self.GetEdges()
             # Draw edges
             pp = Pointset(self[0].ndim)
-            for c in cc:
-                pp.append(c.end1); pp.append(c.end2)
+            pp.append_many([end for c in cc for end in (c.end1, c.end2)])
             tmp = vv.plot(pp, ms='', ls='+', lc=lc, lw=lw,
                 axesAdjust=0, axes=axes, alpha=alpha)
             self._lines[1] = tmp
@@ -724,11 +721,9 @@ def compareGraphs(graph1, graph2, maxDist):
     
     # Create pointsets of the nodes
     pp1 = Pointset(3)
-    for node in graph1:
-        pp1.append(node)
+    pp1.append_many(graph1)
     pp2 = Pointset(3)
-    for node in graph2:
-        pp2.append(node)
+    pp2.append_many(graph2)
     
     # Match the nodes of graph1 to graph2
     for node in graph1:
@@ -815,9 +810,9 @@ def compareGraphsVisually(graph1, graph2, fig=None):
     
     # Make a line from the edges
     pp = Pointset(3)
-    for node in graph1:
-        if hasattr(node, 'match') and node.match is not None:
-            pp.append(node); pp.append(node.match)
+    pp.append_many([p for node in graph1
+                    if getattr(node, 'match', None) is not None
+                    for p in (node, node.match)])
     
     # Plot edges
     vv.plot(pp, lc='g', ls='+')
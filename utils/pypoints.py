@@ -64,6 +64,7 @@ __version__ = 2.2
 
 import numpy as np
 import sys
+import warnings
 
 
 # todo: mention in next release notes that warning is not displayed by default
@@ -846,11 +847,22 @@ class Pointset(BasePoints):
     pp1.append(3,4)     # add a point
     pp1.append(p)       # add an existing point p
     pp1.extend(pp1)     # extend pp1 to itself
+    pp1.append_many(a)  # add all points in a at once
     pp2[:4] = pp1       # replace first four points of pp2
     pp[1]               # returns the point (3,4) (as a Point instance)
     pp[1,0]             # returns the value 3.0
     pp[:,1]             # get all y values
     pp.contains(3,4)    # will return True
+    np.asarray(pp)      # the points as an array (without copying)
+    
+    Adding many points
+    ------------------
+    Appending points one by one creates a Point instance for each point.
+    When many points are added, it is much faster to collect them in an
+    array (or a list) and use append_many(). If the final number of points
+    is known, reserve() can be used to allocate the memory in advance.
+    The methods contains_many() and remove_many() compare many points at
+    once, optionally with a tolerance.
     
     """
     
@@ -887,6 +899,9 @@ class Pointset(BasePoints):
         else:
             self._len = 0
             self._data = np.zeros((initialLength, ndim), dtype=np.float32)
+        
+        # the capacity that was reserved (the array is not shrunk below it)
+        self._reserved = 0
     
     
     @property
@@ -900,7 +915,28 @@ class Pointset(BasePoints):
         always 2D.
         """
         return self._data[:self._len,:]
-
+    
+    
+    def __array__(self, dtype=None, copy=None):
+        """ Get the points as a numpy array. This is a view of the
+        internal data (unless a dtype is given or a copy is requested),
+        so np.asarray(pp) does not copy the points.
+        """
+        data = self.data
+        if dtype is not None and np.dtype(dtype) != data.dtype:
+            data = data.astype(dtype)
+        elif copy:
+            data = data.copy()
+        return data
+    
+    
+    @property
+    def capacity(self):
+        """ Get the number of points that fit in the internal array
+        without resizing it.
+        """
+        return self._data.shape[0]
+    
     
     def _as_point(self, *p):
         """ _as_point(*p)
@@ -927,6 +963,59 @@ class Pointset(BasePoints):
         return p
     
     
+    def _as_array(self, pp):
+        """ _as_array(pp)
+        
+        Return the input (a pointset, a 2D array, or a sequence of
+        points) as a 2D array, and check whether the dimensions match.
+        
+        """
+        
+        if is_Pointset(pp):
+            data = pp.data
+        elif isinstance(pp, np.ndarray):
+            data = pp
+        else:
+            # a sequence of points (Point instances, tuples, ...)
+            data = [p._data if is_Point(p) else p for p in pp]
+            if not data:
+                return np.zeros((0, self.ndim), dtype=np.float32)
+            data = np.array(data, dtype=np.float32)
+        
+        # check shape
+        if len(data.shape) != 2 or data.shape[1] != self.ndim:
+            tmp = "Given points do not match dimension of pointset."
+            raise ValueError(tmp)
+        
+        # done
+        return data
+    
+    
+    def _find(self, data, tol=0.0):
+        """ _find(data, tol=0.0)
+        
+        Get a boolean array that indicates for each point in the set
+        whether it is equal to any of the given points (a 2D array).
+        Coordinates can differ at most tol. Also returns a boolean
+        array that indicates for each given point whether it is found.
+        
+        """
+        mask = np.zeros((self._len,), dtype=bool)
+        found = np.zeros((len(data),), dtype=bool)
+        if not self._len or not len(data):
+            return mask, found
+        
+        # compare in chunks of the given points, to limit memory usage
+        step = max(1, 2**20 // self._len)
+        pp = self.data[:,np.newaxis,:]
+        for i in range(0, len(data), step):
+            diff = np.abs(pp - data[np.newaxis,i:i+step,:])
+            equal = (diff <= tol).all(2)
+            mask |= equal.any(1)
+            found[i:i+step] = equal.any(0)
+        return mask, found
+    
+    
     def _resize_if_required(self, n=None):
         """ _resize_if_required(n=None)
         
@@ -942,22 +1031,57 @@ class Pointset(BasePoints):
         if n is None:
             n = self._len
         
-        # reduce or increase size?
+        # reduce or increase size? (not below the reserved capacity)
         internalLen = self._data.shape[0]
         if n > internalLen:
             L = nearest_power_of_two(n)
-        elif n*4 <= internalLen and internalLen > 16:
-            L = nearest_power_of_two(n*2)
+        elif n*4 <= internalLen and internalLen > max(16, self._reserved):
+            L = max(nearest_power_of_two(n*2), self._reserved)
         else:
             # return Now
             return
         
+        self._set_capacity(L)
+    
+    
+    def _set_capacity(self, L):
+        """ _set_capacity(L)
+        
+        Reallocate the internal array so that it can hold L points.
+        
+        """
         # keep reference of old data
         tmp = self._data
         # create new data array
         self._data = np.zeros( (L, self.ndim), dtype=np.float32 )
         # copy data
         self._data[:self._len,:] = tmp[:self._len,:]
+    
+    
+    def reserve(self, n):
+        """ reserve(n)
+        
+        Make sure that n points fit in the pointset without resizing
+        the internal array. The array is also not made smaller than this
+        when points are removed (until shrink_to_fit() is called).
+        
+        """
+        n = int(n)
+        self._reserved = n
+        if n > self._data.shape[0]:
+            self._set_capacity(n)
+    
+    
+    def shrink_to_fit(self):
+        """ shrink_to_fit()
+        
+        Reduce the memory used by the pointset to what is needed for the
+        current points. This also cancels the effect of reserve().
+        
+        """
+        self._reserved = 0
+        if self._data.shape[0] > max(1, self._len):
+            self._set_capacity(max(1, self._len))
 
 
     
@@ -1068,30 +1192,40 @@ class Pointset(BasePoints):
         """ extend(pp)
         
         Extend this pointset with another pointset, thus combining the two.
-        If pp is not an instance of the Pointset class, the constructor
-        of Pointset is called to create one from the given argument.
+        pp can also be a 2D numpy array or a sequence of points. See also
+        append_many().
         
         """
         
-        # make sure we are dealing with a pointset
-        if not is_Pointset(pp):
-            try:
-                pp = Pointset(pp)
-            except Exception:
-                raise ValueError(str(getExceptionInstance()))
-        
         # check whether we can append it
-        if self.ndim != pp.ndim:
+        if is_Pointset(pp) and self.ndim != pp.ndim:
             raise ValueError("Can only extend pointsets of equal dimensions.")
         
+        self.append_many(pp)
+    
+    
+    def append_many(self, pp):
+        """ append_many(pp)
+        
+        Append many points at once. pp can be a pointset, a 2D numpy
+        array (with a row for each point), or a sequence of points (e.g.
+        a list of Point instances or tuples). The internal array is
+        resized at most once.
+        
+        """
+        
+        # make sure we have an array
+        try:
+            data = self._as_array(pp)
+        except Exception:
+            raise ValueError(str(getExceptionInstance()))
+        
         # resize the array if needed
-        newLen = self._len + pp._len
+        newLen = self._len + data.shape[0]
         self._resize_if_required(newLen)
         
         # append new data
-        i1 = self._len
-        i2 = i1 + pp._len
-        self._data[i1:i2,:] = pp._data[:pp._len,:]
+        self._data[self._len:newLen,:] = data
         self._len = newLen
 
 
@@ -1139,13 +1273,9 @@ class Pointset(BasePoints):
         except Exception:
             raise ValueError(str(getExceptionInstance()))
         
-        # calculate mask
-        mask = np.zeros((len(self),),dtype='uint8')
-        for i in range(self.ndim):
-            mask += self.data[:,i]==p[i]
-        
         # find points given
-        I, = np.where(mask==self.ndim)
+        mask, found = self._find(p.data)
+        I, = np.where(mask)
         
         # produce error if not found
         if len(I) == 0:
@@ -1169,18 +1299,39 @@ class Pointset(BasePoints):
         except Exception:
             raise ValueError(str(getExceptionInstance()))
         
-        # calculate mask
-        mask = np.zeros((len(self),),dtype='uint8')
-        for i in range(self.ndim):
-            mask += self.data[:,i]==p[i]
+        self._remove_mask(self._find(p.data)[0])
+    
+    
+    def remove_many(self, pp, tol=0.0):
+        """ remove_many(pp, tol=0.0)
         
-        # find points given
-        I, = np.where(mask==self.ndim)
+        Remove all occurances of any of the given points (a pointset, 2D
+        array or sequence of points). Points are considered equal if none
+        of their coordinates differ more than tol.
+        
+        """
+        
+        # make sure we have an array
+        try:
+            data = self._as_array(pp)
+        except Exception:
+            raise ValueError(str(getExceptionInstance()))
         
-        # remove all points (backwards!)
-        indices = sorted( [i for i in I] )
-        for i in reversed(indices):
-            del self[i]
+        self._remove_mask(self._find(data, tol)[0])
+    
+    
+    def _remove_mask(self, mask):
+        """ _remove_mask(mask)
+        
+        Remove the points for which mask is True, in one go.
+        
+        """
+        if not mask.any():
+            return
+        data = self.data[~mask]
+        self._data[:len(data),:] = data
+        self._len = len(data)
+        self._resize_if_required()
     
     
     def pop(self, index=-1):
@@ -1238,11 +1389,20 @@ class Pointset(BasePoints):
         return self._len
     
     def __iter__(self):
-        self._index = -1
-        return self
+        # Note: use self.data to iterate over the points as arrays,
+        # which is faster since no Point instances are created
+        self._index = -1 # For the deprecated next()
+        return self._iter_points()
+    
+    def _iter_points(self):
+        for i in range(self._len):
+            yield Point(self._data[i])
     
     def __next__(self):
-        self._index +=1
+        """ Deprecated: iterate over iter(pointset) instead. """
+        warnings.warn('Pointset.next() is deprecated, iterate over ' +
+                        'iter(pointset) instead.', DeprecationWarning, 2)
+        self._index = getattr(self, '_index', -1) + 1
         if self._index >= len(self): raise StopIteration
         return self[self._index]
     
@@ -1262,13 +1422,27 @@ class Pointset(BasePoints):
         except Exception:
             raise ValueError(str(getExceptionInstance()))
         
-        mask = np.zeros((len(self),),dtype='uint8')
-        for i in range(self.ndim):
-            mask += self.data[:,i]==p[i]
-        if mask.max() >= self.ndim:
-            return True
-        else:
-            return False
+        mask, found = self._find(p.data)
+        return bool(found[0])
+    
+    
+    def contains_many(self, pp, tol=0.0):
+        """ contains_many(pp, tol=0.0)
+        
+        Check for each of the given points (a pointset, 2D array or
+        sequence of points) whether it is in this set. Points are
+        considered equal if none of their coordinates differ more than
+        tol. Returns a boolean array.
+        
+        """
+        
+        # make sure we have an array
+        try:
+            data = self._as_array(pp)
+        except Exception:
+            raise ValueError(str(getExceptionInstance()))
+        
+        return self._find(data, tol)[1]
 
 
     ## String representation
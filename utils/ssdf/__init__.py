@@ -21,6 +21,16 @@ the whole file (the text format only compresses arrays). It is more suited
 for storing really large databases or structures containing large arrays.
 Both formats are fully compatible.
 
+The binary format can also be stored uncompressed (use compress=False
+when saving). In this variant the data of arrays is stored page-aligned,
+which allows loading a file without reading the array data: use
+load(filename, mmap=True) to obtain memory mapped arrays, so that the
+data is only read from disk when it is accessed.
+
+The compressed binary format is compressed in independent partitions.
+Large structs can be (de)compressed faster using multiple threads (see
+the threads argument of save() and load()).
+
 Functions of interest
 ---------------------
   * save    - save a struct to a file
@@ -96,8 +106,10 @@ def _get_mode(filename, mode):
     return mode
 
 
-def save(filename, struct, mode=None):
-    """ save(filename, struct, mode=None)
+def save(filename, struct, mode=None, compress=True, threads=1,
+         partitionSize=ssdf_bin._PARTITION_SIZE):
+    """ save(filename, struct, mode=None, compress=True, threads=1,
+             partitionSize=2**20)
     
     Save the given struct or dict to the filesystem using the given filename.
     
@@ -117,12 +129,26 @@ def save(filename, struct, mode=None):
         This parameter can be used to explicitly specify the mode. Note
         that it is an error to use binary mode on a '.ssdf' file or text
         mode on a '.bsdf' file.
+    compress : bool or int
+        Whether to compress the data in binary mode. Can also be an int
+        between 1 and 9 to specify the compression level. If False (or 0),
+        the data is stored uncompressed, with the data of arrays
+        page-aligned, so that it can be memory mapped when loading.
+        Default True.
+    threads : int
+        The number of threads to use for compression in binary mode. If 0,
+        the number of CPU cores is used. Default 1.
+    partitionSize : int
+        The size in bytes of the partitions that are compressed
+        independently in binary mode. Default 1 MB.
     
     """
     
     # Check
     if not (isstruct(struct) or isinstance(struct, dict)):
         raise ValueError('ssdf.save() expects the second argument to be a struct.')
+    if not compress and _get_mode(filename, mode) != 2:
+        raise ValueError('ssdf.save() supports compress=False only in binary mode.')
     
     # Open file
     f = open(filename, 'wb')
@@ -142,7 +168,7 @@ def save(filename, struct, mode=None):
             # Write lines
             writer.write(struct, f)
         elif mode==2:
-            writer = ssdf_bin.BinarySSDFWriter()
+            writer = ssdf_bin.BinarySSDFWriter(compress, partitionSize, threads)
             writer.write(struct, f)
     
     finally:
@@ -169,8 +195,8 @@ def saves(struct):
     return writer.write(struct)
 
 
-def saveb(struct):
-    """ saveb(struct)
+def saveb(struct, compress=True, threads=1):
+    """ saveb(struct, compress=True, threads=1)
     
     Serialize the given struct or dict to (compressed) bytes.
     
@@ -178,6 +204,12 @@ def saveb(struct):
     ----------
     struct : {Struct, dict}
         The object to save.
+    compress : bool or int
+        Whether to compress the data, or the compression level. If False
+        (or 0), the data is stored uncompressed. Default True.
+    threads : int
+        The number of threads to use for compression (0 means the number
+        of CPU cores). Default 1.
     
     """
     
@@ -186,12 +218,12 @@ def saveb(struct):
         raise ValueError('ssdf.saveb() expects a struct.')
     
     # Write
-    writer = ssdf_bin.BinarySSDFWriter()
+    writer = ssdf_bin.BinarySSDFWriter(compress, threads=threads)
     return writer.write(struct)
 
 
-def load(filename):
-    """ load(filename)
+def load(filename, mmap=False, threads=1):
+    """ load(filename, mmap=False, threads=1)
     
     Load a struct from the filesystem using the given filename.
     
@@ -202,6 +234,14 @@ def load(filename):
     ----------
     filename : str
         The location in the filesystem of the file to load.
+    mmap : bool
+        For uncompressed binary files (see save()), return the arrays
+        as read-only memory mapped arrays. The array data is then not
+        read until it is accessed. Ignored for other files. Note that the
+        file should not be overwritten while the arrays are in use.
+    threads : int
+        The number of threads to use for decompressing binary files. If 0,
+        the number of CPU cores is used. Default 1.
     
     """
     
@@ -214,7 +254,7 @@ def load(filename):
             firstfour = f.read(4).decode('utf-8')
         except Exception:
             raise ValueError('Not a valid ssdf file.')
-        if firstfour == 'BSDF':
+        if firstfour in ('BSDF', 'BSDU'):
             mode = 2
         else:
             mode = 1 # This is an assumption.
@@ -225,15 +265,15 @@ def load(filename):
             reader = ssdf_text.TextSSDFReader()
             return reader.read(f)
         elif mode==2:
-            reader = ssdf_bin.BinarySSDFReader()
+            reader = ssdf_bin.BinarySSDFReader(mmap, threads)
             return reader.read(f)
     
     finally:
         f.close()
 
 
-def loadb(bb):
-    """ loadb(bb)
+def loadb(bb, threads=1):
+    """ loadb(bb, threads=1)
     
     Load a struct from the given bytes.
     
@@ -241,6 +281,9 @@ def loadb(bb):
     ----------
     bb : bytes
         A serialized struct (obtained using ssdf.saveb()).
+    threads : int
+        The number of threads to use for decompression (0 means the number
+        of CPU cores). Default 1.
     
     """
     # Check
@@ -248,7 +291,7 @@ def loadb(bb):
         raise ValueError('ssdf.loadb() expects bytes.')
     
     # Read
-    reader = ssdf_bin.BinarySSDFReader()
+    reader = ssdf_bin.BinarySSDFReader(threads=threads)
     return reader.read(bb)
 
 
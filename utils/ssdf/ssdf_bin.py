@@ -7,10 +7,18 @@
 """ ssdf.ssdf_bin.py
 
 Implements functionality to read/write binary ssdf (.bsdf) files.
+
+There are two variants of the binary format. The default variant
+compresses the whole file (header b'BSDF'). The uncompressed variant
+(header b'BSDU') stores the data of arrays page-aligned and outside of
+the block data, so that a reader can skip them, or map them into memory.
 """
 
 import struct
 import zlib
+import collections
+import multiprocessing
+import multiprocessing.pool
 
 from . import ClassManager
 from .ssdf_base import Struct, VirtualArray, SSDFReader, SSDFWriter, Block, _CLASS_NAME
@@ -23,6 +31,12 @@ _LARGE_NUMBER_FMT = '<Q'
 _TYPE_FMT = '<B'
 _PARTITION_LEN_FMT = '<I'
 _PARTITION_SIZE = 2**20 # 1 MB
+_PAD_LEN_FMT = '<I'
+_ALIGNMENT = 2**12 # 4 KB, the page size on most systems
+
+# Headers for the compressed and uncompressed variant
+_HEADER = 'BSDF'.encode('utf-8')
+_HEADER_UNCOMPRESSED = 'BSDU'.encode('utf-8')
 
 # Types for binary
 _TYPE_NONE = ord('N')
@@ -36,7 +50,11 @@ _TYPE_DICT = ord('D')
 
 class BinarySSDFReader(SSDFReader):
     
-   
+    def __init__(self, mmap=False, threads=1):
+        self._mmap = mmap
+        self._threads = threads
+    
+    
     def read_binary_blocks(self, f):
         """ read_binary_blocks(f)
         
@@ -69,7 +87,13 @@ class BinarySSDFReader(SSDFReader):
             data = f.read(data_len)
             
             # Create block instance
-            yield BinaryBlock(indent, count, name, type_id, data=data)
+            block = BinaryBlock(indent, count, name, type_id, data=data)
+            
+            # Get array data stored outside of the block?
+            if type_id == _TYPE_ARRAY and f.aligned:
+                block._read_array_payload(f, self._mmap)
+            
+            yield block
     
     
     def read(self, file_or_bytes):
@@ -88,21 +112,25 @@ class BinarySSDFReader(SSDFReader):
             f = file_or_bytes
         
         # Check header
-        bb1 = "BSDF".encode('utf-8')
         try:
-            bb2 = f.read(len(bb1))
+            bb = f.read(len(_HEADER))
         except Exception:
             raise ValueError('Could not read header of binary SSDF file.')
-        if bb1 != bb2:
+        if bb == _HEADER:
+            # Create compressed file to read from
+            fc = _CompressedFile(f, threads=self._threads)
+        elif bb == _HEADER_UNCOMPRESSED:
+            fc = _AlignedFile(f)
+        else:
             raise ValueError('Given SSDF bytes/file does not have the right header.')
         
-        # Create compressed file to read from
-        fc = _CompressedFile(f)
-        
         # Create blocks and build tree
         root = BinaryBlock(-1, -1, type=_TYPE_DICT)
         block_gen = self.read_binary_blocks(fc)
-        self.build_tree(root, block_gen)
+        try:
+            self.build_tree(root, block_gen)
+        finally:
+            fc.close()
         
         # Convert to real objects and return
         return root.to_object()
@@ -110,6 +138,19 @@ class BinarySSDFReader(SSDFReader):
 
 class BinarySSDFWriter(SSDFWriter):
     
+    def __init__(self, compress=True, partitionSize=_PARTITION_SIZE, threads=1):
+        # compress can be a bool or a compression level (1-9). False or
+        # level 0 means to store the data uncompressed (and page-aligned).
+        if compress is True:
+            compress = -1 # zlib's default level
+        elif not compress:
+            compress = 0
+        elif compress not in range(-1, 10):
+            raise ValueError('Invalid compression level: %r' % compress)
+        self._compress = compress
+        self._partitionSize = partitionSize
+        self._threads = threads
+    
     
     def write_binary_blocks(self, blocks, f):
         """ write_binary_blocks(blocks, f)
@@ -136,7 +177,12 @@ class BinarySSDFWriter(SSDFWriter):
                 f.write_number(0)
             
             # Write data
-            if isinstance(block._data, list):
+            if block._type == _TYPE_ARRAY and f.aligned:
+                # Write array info, and array data at an aligned position
+                f.write_number(len(block._data[0]))
+                f.write(block._data[0])
+                f.write_aligned(block._data[1])
+            elif isinstance(block._data, list):
                 data_len = sum([len(d) for d in block._data])
                 f.write_number(data_len)
                 for part in block._data:
@@ -163,19 +209,26 @@ class BinarySSDFWriter(SSDFWriter):
         else:
             return_bytes = False
         
-        # Write header
-        f.write('BSDF'.encode('utf-8'))
-        
-        # Make compressed file
-        fc = _CompressedFile(f)
-        
         # Create block object
         root = BinaryBlock.from_object(-1, binary_type(), object)
         
-        # Collect blocks and write
-        blocks = self.flatten_tree(root)
-        self.write_binary_blocks(blocks, fc)
-        fc.flush()
+        # Write header and make compressed file
+        if self._compress == 0:
+            f.write(_HEADER_UNCOMPRESSED)
+            fc = _AlignedFile(f)
+        else:
+            f.write(_HEADER)
+            fc = _CompressedFile(f, self._compress, self._partitionSize,
+                                 self._threads)
+        
+        # Collect blocks and write. Make sure that the thread pool is
+        # stopped, also if an error occurs.
+        try:
+            blocks = self.flatten_tree(root)
+            self.write_binary_blocks(blocks, fc)
+            fc.flush()
+        finally:
+            fc.close()
         
         # Return?
         if return_bytes:
@@ -242,18 +295,51 @@ class BinaryBlock(Block):
         for s in value.shape:
             f.write_number(s)
         f.write_string(str(value.dtype))
-        # Write data
-        # tostring() returns bytes, not a string on py3k
-        self._data = [f.get_bytes(), value.tostring()]
+        # Write data (as a bytes-like object, to avoid copying)
+        if isinstance(value, VirtualArray):
+            data = value.data
+        else:
+            data = np.ascontiguousarray(value).reshape(-1).view(np.uint8)
+        self._data = [f.get_bytes(), data]
     
-    def _to_array(self):
+    def _read_array_info(self):
         f = _VirtualFile(self._data)
         # Get shape and dtype
         ndim = f.read_number()
         shape = [f.read_number() for i in range(ndim)]
         dtypestr = ascii_type(f.read_string())
+        return shape, dtypestr, f._fp
+    
+    def _read_array_payload(self, f, mmap=False):
+        """ Read the array data that is stored after the block (in the
+        uncompressed variant). If mmap is True and f is a real file, the
+        data is not read, but a memory mapped array is created.
+        """
+        shape, dtypestr, i = self._read_array_info()
+        nbytes = int(np.prod(shape)) * np.dtype(dtypestr).itemsize if np else None
+        pad, = struct.unpack(_PAD_LEN_FMT, f.read(4))
+        f.skip(pad)
+        if nbytes is None:
+            # Without numpy, we cannot know the size
+            raise RuntimeError('Reading uncompressed binary SSDF requires numpy.')
+        elif mmap and nbytes and f.fileno() is not None:
+            # Note that np.memmap moves the file pointer
+            offset = f.tell()
+            payload = np.memmap(f._file, dtypestr, 'r', offset, tuple(shape))
+            f.seek(offset + nbytes)
+        else:
+            payload = f.read(nbytes)
+        self._payload = payload
+    
+    def _to_array(self):
+        shape, dtypestr, i = self._read_array_info()
+        # Array data stored outside of the block?
+        payload = getattr(self, '_payload', None)
+        if np and isinstance(payload, np.memmap):
+            return payload
+        elif payload is not None:
+            self._data, i = payload, 0
         # Create numpy array or Virtual array
-        i = f._fp
         if not np:
             return VirtualArray(shape, dtypestr, self._data[i:])
         else:
@@ -384,6 +470,15 @@ class _VirtualFile(_FileWithExtraMethods):
     
     def write(self, data):
         self._parts.append(data)
+        self._fp += len(data)
+    
+    def tell(self):
+        return self._fp
+    
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._fp
+        self._fp = offset
     
     def close(self):
         pass
@@ -393,7 +488,7 @@ class _VirtualFile(_FileWithExtraMethods):
 
 
 class _CompressedFile(_FileWithExtraMethods):
-    """ _CompressedFile(file)
+    """ _CompressedFile(file, level=-1, partitionSize=_PARTITION_SIZE, threads=1)
     
     Wraps a file object to transparantly support reading and writing
     data from/to a compressed file.
@@ -403,12 +498,32 @@ class _CompressedFile(_FileWithExtraMethods):
     representing the body's length (little endian unsigned 32 bit int).
     The body consists of bytes compressed using DEFLATE (i.e. zip).
     
+    Because the partitions are independent, they can be (de)compressed
+    in parallel. If threads is not 1, a pool of threads is used for this
+    (zlib releases the GIL). The partitions are still written and read in
+    order, so the file is the same as when using a single thread. A value
+    of 0 means to use as many threads as there are CPU cores.
+    
     """
     
-    def __init__(self, f):
+    aligned = False
+    
+    def __init__(self, f, level=-1, partitionSize=_PARTITION_SIZE, threads=1):
         
-        # Store file
+        # Store file and settings
         self._file = f
+        self._level = level
+        self._partitionSize = int(partitionSize)
+        
+        # Create thread pool
+        self._pool = None
+        if threads != 1:
+            threads = threads or multiprocessing.cpu_count()
+            self._pool = multiprocessing.pool.ThreadPool(threads)
+        # Results that are being (de)compressed, at most two per thread
+        self._pending = collections.deque()
+        self._maxPending = 2 * threads
+        self._eof = False
         
         # For reading
         self._buffer = binary_type()
@@ -427,21 +542,36 @@ class _CompressedFile(_FileWithExtraMethods):
         
         """
         
-        # Get bytes and read partition length
-        # If eof, return True
-        bb = self._file.read(4)
-        if not bb:
+        # Read partitions ahead and start decompressing them
+        while not self._eof and len(self._pending) < max(1, self._maxPending):
+            
+            # Get bytes and read partition length
+            # If eof, stop
+            bb = self._file.read(4)
+            if not bb:
+                self._eof = True
+                break
+            n, = struct.unpack(_PARTITION_LEN_FMT, bb)
+            
+            # Read partition and decompress
+            bb = self._file.read(n)
+            if self._pool is None:
+                self._pending.append(zlib.decompress(bb))
+            else:
+                self._pending.append(self._pool.apply_async(zlib.decompress, (bb,)))
+            del bb
+        
+        # EOF?
+        if not self._pending:
             self._buffer = binary_type()
             self._bp = 0
+            self.close()
             return False
-        n, = struct.unpack(_PARTITION_LEN_FMT, bb)
-        
-        # Read partition and decompress
-        bb = self._file.read(n)
-        data = zlib.decompress(bb)
-        del bb
         
         # Done
+        data = self._pending.popleft()
+        if self._pool is not None:
+            data = data.get()
         return data
     
     
@@ -459,9 +589,28 @@ class _CompressedFile(_FileWithExtraMethods):
         self._parts = []
         self._pp = 0
         
-        # Compress and write
-        bb = zlib.compress(data)
+        # Compress (possibly in another thread)
+        if self._pool is None:
+            self._pending.append(zlib.compress(data, self._level))
+        else:
+            self._pending.append(
+                        self._pool.apply_async(zlib.compress, (data, self._level)))
         del data
+        
+        # Write partitions that are done (in order)
+        while len(self._pending) > self._maxPending - 1:
+            self._write_pending_partition()
+    
+    
+    def _write_pending_partition(self):
+        """ _write_pending_partition()
+        
+        Write the oldest pending compressed partition to file.
+        
+        """
+        bb = self._pending.popleft()
+        if self._pool is not None:
+            bb = bb.get()
         header = struct.pack(_PARTITION_LEN_FMT, len(bb))
         self._file.write(header)
         self._file.write(bb)
@@ -521,10 +670,9 @@ class _CompressedFile(_FileWithExtraMethods):
         
         """
         
-        # Get how many bytes we have beyond _PARTITION_SIZE
-        i = (self._pp + len(data)) - _PARTITION_SIZE
-        
-        if i > 0:
+        # Fill partitions while the data does not fit in the current one
+        while self._pp + len(data) > self._partitionSize:
+            i = self._partitionSize - self._pp
             # Add portion to buffer, store remainder
             self._parts.append(data[:i])
             data = data[i:]
@@ -544,3 +692,106 @@ class _CompressedFile(_FileWithExtraMethods):
         
         """
         self._write_new_partition()
+        while self._pending:
+            self._write_pending_partition()
+        self.close()
+    
+    
+    def close(self):
+        """ close()
+        
+        Stop the thread pool (if there is one), and wait for its threads
+        to finish. Partitions that are still pending are discarded.
+        
+        """
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+class _AlignedFile(_FileWithExtraMethods):
+    """ _AlignedFile(file)
+    
+    Wraps a file object for reading and writing the uncompressed binary
+    variant. The data is written as is, except that the data of arrays is
+    written at a position that is a multiple of _ALIGNMENT. This is done
+    by first writing the amount of padding bytes (as a little endian
+    unsigned 32 bit int), then the padding, and then the array data. This
+    allows mapping the array data into memory.
+    
+    """
+    
+    aligned = True
+    
+    def __init__(self, f):
+        self._file = f
+    
+    
+    def fileno(self):
+        """ fileno()
+        
+        Get the file number of the underlying file, or None if it is not
+        a real file (e.g. when reading from bytes).
+        
+        """
+        try:
+            return self._file.fileno()
+        except Exception:
+            return None
+    
+    
+    def tell(self):
+        return self._file.tell()
+    
+    
+    def seek(self, pos):
+        self._file.seek(pos)
+    
+    
+    def skip(self, n):
+        """ skip(n)
+        
+        Skip n bytes when reading.
+        
+        """
+        self._file.seek(n, 1)
+    
+    
+    def read(self, n):
+        """ read(n)
+        
+        Read n bytes. If the end of the file is reached, raises StopIteration.
+        
+        """
+        data = self._file.read(n)
+        if n and not data:
+            raise StopIteration
+        return data
+    
+    
+    def write(self, data):
+        self._file.write(data)
+    
+    
+    def write_aligned(self, data):
+        """ write_aligned(data)
+        
+        Write padding, so that the given data is written at an aligned
+        position in the file.
+        
+        """
+        pos = self._file.tell() + struct.calcsize(_PAD_LEN_FMT)
+        pad = (-pos) % _ALIGNMENT
+        self._file.write(struct.pack(_PAD_LEN_FMT, pad))
+        self._file.write('\x00'.encode('ascii') * pad)
+        self._file.write(data)
+    
+    
+    def flush(self):
+        pass
+    
+    
+    def close(self):
+        pass
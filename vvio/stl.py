@@ -21,21 +21,64 @@ faces.
 
 The classes are written with compatibility of Python3 in mind.
 
+Binary files are read and written in bulk, using a structured numpy
+dtype for the whole body of the file. The reader can optionally merge
+duplicate vertices, producing an indexed mesh (see mergeVertices()).
+
 """
 
+import os
 import visvis as vv
 import numpy as np
 import struct
 
 
+# The layout of one face in a binary STL file: normal, three vertices
+# and the "attribute byte count" (a short int used by some apps).
+STL_BIN_FACE_DTYPE = np.dtype([ ('normal', '<f4', (3,)),
+                                ('vertices', '<f4', (3,3)),
+                                ('attr', '<u2') ])
+
+
+def mergeVertices(vertices):
+    """ mergeVertices(vertices)
+    
+    Merge duplicate vertices in an Nx3 array of unindexed triangle
+    vertices (as stored in an STL file). Returns a tuple (vertices, faces),
+    where vertices is an Mx3 array with the unique vertices, and faces
+    an (N/3)x3 uint32 array that indexes them. This is a vectorized step
+    that does not go through the vertices one by one.
+    
+    """
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    if not len(vertices):
+        return vertices, np.zeros((0,3), dtype=np.uint32)
+    
+    # View each vertex as a single (void) element, so that np.unique
+    # compares the three coordinates at once.
+    voidType = np.dtype((np.void, vertices.dtype.itemsize * 3))
+    vv1 = vertices.view(voidType).ravel()
+    _, I, faces = np.unique(vv1, return_index=True, return_inverse=True)
+    
+    # Keep the unique vertices in order of first occurance
+    order = np.argsort(I)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    
+    # Done
+    newVertices = vertices[I[order]]
+    faces = rank[faces.ravel()].astype(np.uint32)
+    return newVertices, faces.reshape(-1, 3)
+
+
 class StlReader(object):
     
     def __init__(self, f):
         self._f = f
     
     @classmethod
-    def read(cls, fname, check=False):
-        """ read(fname, check=False)
+    def read(cls, fname, check=False, merge=False):
+        """ read(fname, check=False, merge=False)
         
         This classmethod is the entry point for reading STL files.
         
@@ -46,6 +89,9 @@ class StlReader(object):
         check : bool
             If check is True and the file is in ascii, some checks to the
             integrity of the file are done (which is a bit slower).
+        merge : bool
+            If True, duplicate vertices are merged, and an indexed mesh
+            is returned (which can be shaded smoothly).
         
         """
         
@@ -71,15 +117,25 @@ class StlReader(object):
                 reader = StlBinReader(f)
             
             # Read all
-            vertices = vv.Pointset(3)
-            while True:
-                reader.readFace(vertices, check)
+            if isinstance(reader, StlBinReader):
+                vertices = reader.readFaces()
+            else:
+                vertices = vv.Pointset(3)
+                while True:
+                    reader.readFace(vertices, check)
             
         except EOFError:
             pass
         finally:
             f.close()
         
+        # Merge vertices?
+        if merge:
+            if vv.utils.pypoints.is_Pointset(vertices):
+                vertices = vertices.data
+            vertices, faces = mergeVertices(vertices)
+            return vv.BaseMesh(vertices, faces)
+        
         # Done
         return vv.BaseMesh(vertices)
 
@@ -180,8 +236,11 @@ class StlWriter(object):
                 writer = StlAsciiWriter(f)
                 writer.writeLine('solid %s' % name)
             # Write vertices
-            for i in range(len(vv1)):
-                writer.writeFace(vv1[i], vv2[i], vv3[i])
+            if bin:
+                writer.writeFaces(vv1, vv2, vv3)
+            else:
+                for i in range(len(vv1)):
+                    writer.writeFace(vv1[i], vv2[i], vv3[i])
             # Write end
             if not bin:
                 writer.writeLine('endsolid %s' % name)
@@ -328,6 +387,37 @@ class StlBinReader(StlReader):
         # Increase counter
         self._count += 1
     
+    
+    def readFaces(self):
+        """ readFaces()
+        
+        Read all remaining faces from the file in one go, using a
+        structured numpy dtype for the whole body. Returns the vertices
+        as an Nx3 float32 array (three vertices per face). The normals
+        are ignored.
+        
+        """
+        
+        # Determine how many faces there are left (also in truncated files)
+        n = self._n - self._count
+        try:
+            nbytes = os.fstat(self._f.fileno()).st_size - self._f.tell()
+            n = min(n, nbytes // STL_BIN_FACE_DTYPE.itemsize)
+            data = np.fromfile(self._f, STL_BIN_FACE_DTYPE, n)
+        except (AttributeError, OSError, IOError):
+            # Not a real file (e.g. a file-like object)
+            nbytes = n * STL_BIN_FACE_DTYPE.itemsize
+            data = self._f.read(nbytes)
+            n = len(data) // STL_BIN_FACE_DTYPE.itemsize
+            data = np.frombuffer(data, STL_BIN_FACE_DTYPE, n)
+        
+        # Increase counter
+        self._count += n
+        
+        # Get vertices, ignore normal
+        vertices = data['vertices'].reshape(n*3, 3)
+        return np.ascontiguousarray(vertices, dtype=np.float32)
+    
 
 class StlBinWriter(StlWriter):
     
@@ -354,3 +444,31 @@ class StlBinWriter(StlWriter):
         # Write data
         data = ''.encode('ascii').join(dataList)
         self._f.write(data)
+    
+    
+    def writeFaces(self, vv1, vv2, vv3):
+        """ writeFaces(vv1, vv2, vv3)
+        
+        Write all faces in one go. vv1, vv2 and vv3 are Nx3 arrays (or
+        Pointsets) with the first, second and third vertex of each face.
+        A dummy normal is written.
+        
+        """
+        
+        # Get arrays
+        arrays = []
+        for vvi in (vv1, vv2, vv3):
+            if vv.utils.pypoints.is_Pointset(vvi):
+                vvi = vvi.data
+            arrays.append(np.asarray(vvi))
+        
+        # Construct data
+        data = np.zeros((len(arrays[0]),), dtype=STL_BIN_FACE_DTYPE)
+        for i in range(3):
+            data['vertices'][:,i,:] = arrays[i]
+        
+        # Write data
+        try:
+            data.tofile(self._f)
+        except (AttributeError, OSError, IOError):
+            self._f.write(data.tobytes())
@@ -16,6 +16,11 @@ to be described.
 This implementation does only supports mesh stuff, so no nurbs etc. Further,
 material properties are ignored, although this might be implemented later,
 
+Files are read in large chunks that are parsed with numpy (see
+WavefrontBulkReader), so that huge files can be streamed with bounded
+memory for the raw text. Files with an irregular structure (e.g. mixed
+triangles and quads) are read line by line instead.
+
 The classes are written with compatibility of Python3 in mind.
 
 """
@@ -85,8 +90,8 @@ class WavefrontReader(object):
     
     
     @classmethod
-    def read(cls, fname, check='ignored'):
-        """ read(fname)
+    def read(cls, fname, check='ignored', chunkSize=2**24):
+        """ read(fname, chunkSize=2**24)
         
         This classmethod is the entry point for reading OBJ files.
         
@@ -94,6 +99,9 @@ class WavefrontReader(object):
         ----------
         fname : string
             The name of the file to read.
+        chunkSize : int
+            The amount of bytes to read and parse in one go. The file is
+            streamed in chunks of (approximately) this size.
         
         """
         
@@ -102,9 +110,16 @@ class WavefrontReader(object):
         # Open file
         f = open(fname, 'rb')
         try:
-            reader = WavefrontReader(f)
-            while True:
-                reader.readLine()
+            try:
+                reader = WavefrontBulkReader(f)
+                while True:
+                    reader.readChunk(chunkSize)
+            except _IrregularObjError:
+                # Start over and read line by line
+                f.seek(0)
+                reader = WavefrontReader(f)
+                while True:
+                    reader.readLine()
         except EOFError:
             pass
         finally:
@@ -251,6 +266,284 @@ class WavefrontReader(object):
     
 
 
+class _IrregularObjError(Exception):
+    """ Raised by the bulk reader if a file cannot be parsed in bulk.
+    """
+    pass
+
+
+class WavefrontBulkReader(WavefrontReader):
+    """ WavefrontBulkReader(f)
+    
+    Reader for OBJ files that parses the file in large chunks. Each
+    chunk is tokenized with numpy: the lines are classified by their first
+    characters, the bytes of all v/vt/vn/f lines are gathered, and the
+    numbers are parsed in one call. The index sets of the faces are mapped
+    to final vertices using np.unique (the vectorized equivalent of the
+    _facemap of the line based reader).
+    
+    Raises _IrregularObjError if the file has a structure that cannot be
+    handled in bulk, in which case the line based reader should be used.
+    
+    """
+    
+    # Lines starting with these characters are silently ignored:
+    # comments, groups, smoothing groups, object names, usemtl, mtllib
+    _IGNORE = b'#gsoum'
+    
+    def __init__(self, f):
+        WavefrontReader.__init__(self, f)
+        
+        # Bytes of the last incomplete line of the previous chunk
+        self._remainder = b''
+        
+        # Amount of v/vt/vn seen so far (for relative indices)
+        self._nv = self._nvt = self._nvn = 0
+        
+        # Face format: vertices per face, and which indices are given
+        self._vpf = None
+        self._faceFormat = None
+        
+        # List of face index arrays, each Nx(vpf)x3
+        self._faceIndices = []
+        self._noticedMaterial = False
+    
+    
+    def readChunk(self, chunkSize=2**24):
+        """ readChunk(chunkSize=2**24)
+        
+        Read the next chunk of the file and process the complete lines
+        in it. Raises EOFError when the whole file has been processed.
+        
+        """
+        
+        # Read data
+        data = self._f.read(chunkSize)
+        if not data:
+            if self._remainder.strip():
+                block, self._remainder = self._remainder + b'\n', b''
+                self.processBlock(block)
+            raise EOFError()
+        
+        # Split off incomplete line
+        data = self._remainder + data
+        i = data.rfind(b'\n')
+        if i < 0:
+            self._remainder = data
+        else:
+            self._remainder = data[i+1:]
+            self.processBlock(data[:i+1])
+    
+    
+    def processBlock(self, block):
+        """ processBlock(block)
+        
+        Process a bytes object containing complete lines.
+        
+        """
+        
+        # Get writable array and normalize whitespace
+        buf = np.frombuffer(block, np.uint8).copy()
+        buf[buf == 9] = 32  # tab
+        buf[buf == 13] = 32  # carriage return
+        
+        # Get line starts and lengths (excluding the newline)
+        ends = np.flatnonzero(buf == 10)
+        starts = np.empty_like(ends)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        lengths = ends - starts
+        
+        # Classify lines by their first three characters
+        c = [buf[np.minimum(starts+i, len(buf)-1)] for i in range(3)]
+        isV = (c[0] == ord('v')) & (c[1] == 32) & (lengths >= 2)
+        isVT = (c[0] == ord('v')) & (c[1] == ord('t')) & (c[2] == 32) & (lengths >= 3)
+        isVN = (c[0] == ord('v')) & (c[1] == ord('n')) & (c[2] == 32) & (lengths >= 3)
+        isF = (c[0] == ord('f')) & (c[1] == 32) & (lengths >= 2)
+        
+        # Check remaining lines
+        other = ~(isV | isVT | isVN | isF) & (lengths > 0)
+        if other.any():
+            firstChars = c[0][other]
+            if not np.isin(firstChars, np.frombuffer(self._IGNORE, np.uint8)).all():
+                raise _IrregularObjError()
+            if (firstChars == ord('m')).any() and not self._noticedMaterial:
+                print('Notice reading .OBJ: material properties are ignored.')
+                self._noticedMaterial = True
+        
+        # Blank out the line identifiers, so only numbers remain
+        buf[starts[isV | isVT | isVN | isF]] = 32
+        buf[starts[isVT | isVN] + 1] = 32
+        
+        # Get type of each byte (newlines included, to separate lines)
+        lineType = isV * 1 + isVT * 2 + isVN * 3 + isF * 4
+        byteType = np.repeat(lineType.astype(np.uint8), lengths + 1)
+        
+        # Count the numbers on each line (the starts of the words)
+        isWord = (buf != 32) & (buf != 10)
+        isWord[1:] &= ~isWord[:-1]
+        lineIndex = np.repeat(np.arange(len(ends)), lengths + 1)
+        wordCounts = np.bincount(lineIndex[isWord], minlength=len(ends))
+        
+        # Parse vertices, texcords and normals
+        for i, n, target in [   (1, isV.sum(), self._v),
+                                (2, isVT.sum(), self._vt),
+                                (3, isVN.sum(), self._vn) ]:
+            if n:
+                # All lines should have the same amount of numbers
+                counts = wordCounts[lineType == i]
+                if (counts != counts[0]).any():
+                    raise _IrregularObjError()
+                numbers = np.fromstring(buf[byteType == i].tobytes(),
+                                        np.float32, sep=' ')
+                if numbers.size != n * counts[0]:
+                    raise _IrregularObjError()
+                numbers = numbers.reshape(n, -1)[:, :3]
+                if target and target[0].shape[1] != numbers.shape[1]:
+                    raise _IrregularObjError()
+                target.append(numbers)
+        
+        # Parse faces
+        nf = isF.sum()
+        if nf:
+            # Relative indices are relative to the v/vt/vn read until then
+            refs = [self._nv + np.cumsum(isV)[isF],
+                    self._nvt + np.cumsum(isVT)[isF],
+                    self._nvn + np.cumsum(isVN)[isF] ]
+            text = buf[byteType == 4].tobytes()
+            self._faceIndices.append(self._parseFaces(text, nf, refs))
+        
+        # Update counts
+        self._nv += int(isV.sum())
+        self._nvt += int(isVT.sum())
+        self._nvn += int(isVN.sum())
+    
+    
+    def _parseFaces(self, text, nf, refs):
+        """ Parse the text of nf face lines. Returns an array of shape
+        (nf, vpf, 3), with zero-based indices to v, vt and vn. Indices
+        that are not given are -1.
+        """
+        
+        # Determine format from the first face
+        if self._vpf is None:
+            indexSets = text[:text.find(b'\n')].split()
+            indexSet = indexSets[0]
+            if b'//' in indexSet:
+                self._faceFormat = (0, 2)
+            else:
+                self._faceFormat = (0, 1, 2)[:indexSet.count(b'/')+1]
+            self._vpf = len(indexSets)
+        vpf, fmt = self._vpf, self._faceFormat
+        
+        # Check that all faces have vpf index sets, and that each index set
+        # has the same format as those of the first face. Files that mix
+        # formats are read by the line based reader instead.
+        nsets = nf * vpf
+        if not self._checkFaceFormat(text, vpf, fmt):
+            raise _IrregularObjError()
+        
+        # Parse numbers
+        text = text.replace(b'/', b' ')
+        numbers = np.fromstring(text, np.int64, sep=' ')
+        if numbers.size != nsets * len(fmt):
+            raise _IrregularObjError()
+        numbers.shape = nf, vpf, len(fmt)
+        
+        # Make absolute and zero-based
+        indices = -np.ones((nf, vpf, 3), np.int64)
+        for i, j in enumerate(fmt):
+            ii = numbers[:, :, i]
+            ref = refs[j].reshape(nf, 1)
+            indices[:, :, j] = np.where(ii > 0, ii - 1, ii + ref)
+        return indices
+    
+    
+    def _checkFaceFormat(self, text, vpf, fmt):
+        """ Get whether all lines in the text of the faces have vpf index
+        sets, that all have the given format.
+        """
+        buf = np.frombuffer(text, np.uint8)
+        
+        # Find starts of the index sets, slashes and newlines
+        isSep = (buf == 32) | (buf == 10)
+        isStart = ~isSep
+        isStart[1:] &= isSep[:-1]
+        starts = np.flatnonzero(isStart)
+        slashes = np.flatnonzero(buf == 47)
+        newlines = np.flatnonzero(buf == 10)
+        
+        # Count index sets per line
+        counts = np.diff(np.searchsorted(starts, newlines), prepend=0)
+        if (counts != vpf).any():
+            return False
+        
+        # Count slashes and double slashes per index set
+        ns, nd = {(0,): (0, 0), (0, 1): (1, 0),
+                  (0, 2): (2, 1), (0, 1, 2): (2, 0)}[fmt]
+        setIds = np.searchsorted(starts, slashes, 'right') - 1
+        if (np.bincount(setIds, minlength=len(starts)) != ns).any():
+            return False
+        doubles = setIds[1:][np.diff(slashes) == 1]
+        if (np.bincount(doubles, minlength=len(starts)) != nd).any():
+            return False
+        return True
+    
+    
+    def finish(self):
+        """ Converts gathered arrays to the final numpy arrays and creates
+        BaseMesh instance.
+        """
+        
+        def concatenate(arrays, n):
+            if arrays:
+                return np.concatenate(arrays).astype('float32')
+            else:
+                return np.zeros((0, n), 'float32')
+        
+        v = concatenate(self._v, 3)
+        
+        # No faces: use vertices only
+        if not self._faceIndices:
+            return vv.BaseMesh(v, None, None, None)
+        
+        vt = concatenate(self._vt, 3)
+        vn = concatenate(self._vn, 3)
+        indices = np.concatenate(self._faceIndices)
+        nf, vpf, _ = indices.shape
+        indices.shape = nf * vpf, 3
+        
+        # Get which indices we use. As in the line based reader, texcords
+        # and normals are only used if all faces specify them.
+        columns = [j for j in self._faceFormat if indices[:, j].min() >= 0]
+        
+        # Combine indices to a single key per index set
+        key = indices[:, columns[0]].copy()
+        for j, n in [(1, len(vt)), (2, len(vn))]:
+            if j in columns:
+                key *= n + 1
+                key += indices[:, j]
+        if len(v) * (len(vt) + 1) * (len(vn) + 1) >= 2**63:
+            # Would overflow; compare the raw index sets instead
+            tmp = np.ascontiguousarray(indices[:, columns])
+            key = tmp.view(np.dtype((np.void, tmp.itemsize * len(columns)))).ravel()
+        
+        # Find unique index sets, in order of first occurance
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        first = first[order]
+        
+        # Build final arrays
+        vertices = v[indices[first, 0]]
+        texcords = vt[indices[first, 1]] if 1 in columns else None
+        normals = vn[indices[first, 2]] if 2 in columns else None
+        faces = rank[inverse.ravel()].astype('uint32').reshape(nf, vpf)
+        
+        return vv.BaseMesh(vertices, faces, normals, texcords)
+
+
 class WavefrontWriter(object):
     
     def __init__(self, f):
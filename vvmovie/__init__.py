@@ -31,6 +31,7 @@ All submodules have been designed to be work independent of each-other
 
 Provides the following functions:
   * readGif & writeGif  -> a movie stored as animated GIF
+  * writeGifStream      -> write an animated GIF from an iterable of images
   * readSwf & writeSwf  -> a movie stored as shockwave flash
   * readAvi & writeAvi  -> a movie stored as compressed video
   * readIms & writeIms  -> a movie stored as a series of images
@@ -60,10 +61,10 @@ import os, time, warnings
 # Python 3 needs absolute import, which makes that this package
 # cannot be a subpackage anymore. We cannot use the dot-notation,
 # because that doesnt work on Python 2.
-from visvis.vvmovie.images2gif import readGif, writeGif
+from visvis.vvmovie.images2gif import readGif, writeGif, writeGifStream
 from visvis.vvmovie.images2swf import readSwf, writeSwf
-from visvis.vvmovie.images2avi import readAvi, writeAvi
-from visvis.vvmovie.images2ims import readIms, writeIms
+from visvis.vvmovie.images2avi import readAvi, writeAvi, AviReader, AviWriter
+from visvis.vvmovie.images2ims import readIms, writeIms, ImageSequence
 
 videoTypes = ['AVI', 'MPG', 'MPEG', 'MOV', 'FLV']
 imageTypes = ['JPG', 'JPEG', 'PNG', 'TIF', 'TIFF', 'BMP']
@@ -83,7 +84,9 @@ def movieWrite(filename, images, duration=0.1, repeat=True, **kwargs):
     images : list
         Should be a list consisting of PIL images or numpy arrays.
         The latter should be between 0 and 255 for integer types,
-        and between 0 and 1 for float types.
+        and between 0 and 1 for float types. For GIF, AVI/MPEG and series
+        of images, this can also be an iterable (e.g. a generator), see
+        writeGifStream(), writeAvi() and writeIms().
     duration : scalar
         The duration for all frames. For GIF and SWF this can also be a list
         that specifies the duration for each frame. (For swf the durations
@@ -115,6 +118,15 @@ def movieWrite(filename, images, duration=0.1, repeat=True, **kwargs):
         in place. 2 means the background color should be restored after
         each frame. 3 means the decoder should restore the previous frame.
         If subRectangles==False, the default is 2, otherwise it is 1.
+    sharePalette : bool
+        If True and nq is nonzero, one palette is learned from all images,
+        instead of one for each image.
+    processes : int
+        When images is an iterable, the amount of processes to convert
+        the images with. The default (0) uses all CPU cores.
+    lookAhead : int
+        When images is an iterable, the maximum amount of images that is
+        being converted at the same time.
     
     Special AVI/MPEG parameters
     ---------------------------
@@ -131,11 +143,14 @@ def movieWrite(filename, images, duration=0.1, repeat=True, **kwargs):
     If the filenenumber contains an asterix, a sequence number is introduced
     at its location. Otherwise the sequence number is introduced right before
     the final dot. To enable easy creation of a new directory with image
-    files, it is made sure that the full path exists.
+    files, it is made sure that the full path exists. The images are
+    encoded in a pool of threads; the threads, maxInFlight and progress
+    arguments of writeIms() can be given.
     
     Notes for writing AVI/MPEG
     --------------------------
-    Writing AVI requires the "ffmpeg" application:
+    The frames are passed to ffmpeg through a pipe, no temporary files
+    are used. Writing AVI requires the "ffmpeg" application:
       * Most linux users can install it using their package manager.
       * There is a windows installer on the visvis website.
     
@@ -157,21 +172,29 @@ def movieWrite(filename, images, duration=0.1, repeat=True, **kwargs):
     
     warnings.warn('Visvis movieWrite() function and vvmovie module are supersceded by the imageio library.')
     
-    # Test images
-    if not isinstance(images, (tuple, list)):
-        raise ValueError("Images should be a tuple or list.")
-    if not images:
-        raise ValueError("List of images is empty.")
-    
     # Get extension
     EXT = os.path.splitext(filename)[1]
     EXT = EXT[1:].upper()
     
+    # Test images
+    stream = not isinstance(images, (tuple, list))
+    stream = stream and (EXT == 'GIF' or EXT in videoTypes + imageTypes)
+    if not isinstance(images, (tuple, list)) and not stream:
+        raise ValueError("Images should be a tuple or list.")
+    if not stream and not images:
+        raise ValueError("List of images is empty.")
+    
     # Start timer
     t0 = time.time()
     
     # Write
-    if EXT == 'GIF':
+    if stream and EXT == 'GIF':
+        count = writeGifStream(filename, images, duration, repeat, **kwargs)
+    elif stream and EXT in videoTypes:
+        count = writeAvi(filename, images, duration, **kwargs)
+    elif stream:
+        count = writeIms(filename, images, **kwargs)
+    elif EXT == 'GIF':
         writeGif(filename, images, duration, repeat, **kwargs)
     elif EXT == 'SWF':
         writeSwf(filename, images, duration, repeat, **kwargs)
@@ -185,10 +208,12 @@ def movieWrite(filename, images, duration=0.1, repeat=True, **kwargs):
     # Stop timer
     t1 = time.time()
     dt = t1-t0
+    if not stream:
+        count = len(images)
     
     # Notify
     print("Wrote %i frames to %s in %1.2f seconds (%1.0f ms/frame)" %
-                        (len(images), EXT, dt, 1000*dt/len(images)) )
+                        (count, EXT, dt, 1000*dt/max(1, count)) )
 
 
 def movieRead(filename, asNumpy=True, **kwargs):
@@ -212,6 +237,10 @@ def movieRead(filename, asNumpy=True, **kwargs):
       * Most linux users can install it using their package manager
       * There is a windows installer on the visvis website
     
+    A series of images is read in a pool of threads. Give lazy=True to
+    obtain an ImageSequence, which reads the images when they are
+    indexed or iterated over (see readIms()).
+    
     """
     
     warnings.warn('Visvis movieRead() function and vvmovie module are supersceded by the imageio library.')
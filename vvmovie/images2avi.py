@@ -27,7 +27,17 @@
 
 """ Module images2avi
 
-Uses ffmpeg to read and write AVI files. Requires PIL
+Uses ffmpeg to read and write AVI files (or other movie formats that
+ffmpeg supports). Requires numpy.
+
+The frames are passed to and from ffmpeg through pipes, as raw RGB data,
+so no temporary files are used and the frames are not compressed twice.
+A background thread feeds ffmpeg (or reads its output), with a bounded
+queue of frames in between, so that converting the frames and encoding
+(or decoding) them happens at the same time.
+
+The ffmpeg executable is looked up on the PATH. Set the FFMPEG_EXE
+environment variable to use another one.
 
 I found these sites usefull:
 http://www.catswhocode.com/blog/19-ffmpeg-commands-for-all-needs
@@ -35,21 +45,297 @@ http://linux.die.net/man/1/ffmpeg
 
 """
 
-import os, time
-import subprocess, shutil
+import os, re
+import subprocess, tempfile, threading
+try:
+    import queue
+except ImportError: # Python 2
+    import Queue as queue
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from visvis.vvmovie import images2ims
 
 
-def _cleanDir(tempDir):
-    for i in range(3):
+def getFfmpegExe():
+    """ getFfmpegExe()
+    
+    Get the path of the ffmpeg executable: the value of the FFMPEG_EXE
+    environment variable, or ffmpeg on the PATH. Returns None if ffmpeg
+    cannot be found.
+    
+    """
+    exe = os.environ.get('FFMPEG_EXE', '')
+    if exe:
+        return exe
+    names = ['ffmpeg']
+    if os.name == 'nt':
+        names.insert(0, 'ffmpeg.exe')
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        for name in names:
+            exe = os.path.join(path, name)
+            if os.path.isfile(exe) and os.access(exe, os.X_OK):
+                return exe
+    return None
+
+
+def _getExe():
+    exe = getFfmpegExe()
+    if exe is None:
+        raise RuntimeError('Could not find ffmpeg. Install it, or set ' +
+                            'the FFMPEG_EXE environment variable.')
+    return exe
+
+
+def _readLog(log):
+    """ Get the text that ffmpeg has written to the given temp file. """
+    log.seek(0)
+    return log.read().decode('utf-8', 'ignore')
+
+
+class AviWriter:
+    """ AviWriter(filename, duration=0.1, encoding='mpeg4',
+                    inputOptions='', outputOptions='', queueSize=16)
+    
+    Write a movie with ffmpeg, one frame at a time. The frames are
+    passed to ffmpeg as raw RGB data through a pipe, by a background
+    thread. At most queueSize frames wait to be passed; Write() blocks
+    if ffmpeg cannot keep up. All frames should have the same size.
+    
+    ffmpeg is started when the first frame is written. Use Close() to
+    finish the movie.
+    
+    """
+    
+    def __init__(self, filename, duration=0.1, encoding='mpeg4',
+                    inputOptions='', outputOptions='', queueSize=16):
+        
+        # Get fps
+        try:
+            self._fps = float(1.0/duration)
+        except Exception:
+            raise ValueError("Invalid duration parameter for writeAvi.")
+        
+        self._exe = _getExe()
+        self._filename = filename
+        self._encoding = encoding
+        self._inputOptions = inputOptions
+        self._outputOptions = outputOptions
+        
+        self._queue = queue.Queue(queueSize)
+        self._process = None
+        self._thread = None
+        self._log = None
+        self._error = None
+        self._shape = None
+        self._count = 0
+    
+    
+    @property
+    def count(self):
+        """ The number of frames that was written.
+        """
+        return self._count
+    
+    
+    def _Start(self, shape):
+        """ Start ffmpeg and the thread that feeds it.
+        """
+        self._shape = shape
+        h, w = shape[:2]
+        command = [self._exe, '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                    '-s', '%ix%i' % (w, h), '-r', '%.02f' % self._fps]
+        command += self._inputOptions.split()
+        command += ['-i', '-', '-an', '-g', '1', '-vcodec', self._encoding]
+        command += self._outputOptions.split()
+        command += [self._filename]
+        
+        # Run ffmpeg; its messages go to a temp file, which (unlike a
+        # pipe) cannot fill up and block it
+        self._log = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                    stdout=self._log, stderr=self._log)
+        
+        self._thread = threading.Thread(target=self._Feed)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    
+    def _Feed(self):
+        """ Pass the frames in the queue to ffmpeg, until None is received.
+        """
+        stdin = self._process.stdin
+        while True:
+            im = self._queue.get()
+            if im is None:
+                break
+            if self._error is None:
+                try:
+                    stdin.write(im.tobytes())
+                except Exception as why:
+                    self._error = why # Probably, ffmpeg has stopped
         try:
-            shutil.rmtree(tempDir)
+            stdin.close()
         except Exception:
-            time.sleep(0.2) # Give OS time to free sources
-        else:
+            pass
+    
+    
+    def Write(self, im):
+        """ Write(im)
+        
+        Add a frame (a numpy array or PIL image).
+        
+        """
+        if self._queue is None:
+            raise RuntimeError('Cannot write to a closed AviWriter.')
+        if self._error is not None:
+            self.Close()
+        
+        # Get as contiguous uint8 RGB array
+        im = images2ims.checkImages([im])[0]
+        im = np.asarray(im)
+        if im.ndim == 2:
+            im = np.dstack([im, im, im])
+        im = np.ascontiguousarray(im[:, :, :3])
+        
+        # Start ffmpeg, or check shape
+        if self._process is None:
+            self._Start(im.shape)
+        elif im.shape != self._shape:
+            raise ValueError('All frames should have the same shape.')
+        
+        self._queue.put(im)
+        self._count += 1
+    
+    
+    def Close(self):
+        """ Close()
+        
+        Wait until ffmpeg has encoded all frames. Raises a RuntimeError
+        if ffmpeg failed.
+        
+        """
+        if self._queue is None:
+            return
+        if self._process is None:
+            self._queue = None
+            return
+        
+        # Finish
+        self._queue.put(None)
+        self._thread.join()
+        self._queue = None
+        returnCode = self._process.wait()
+        log = _readLog(self._log)
+        self._log.close()
+        if returnCode or self._error is not None:
+            print(log)
+            raise RuntimeError("Could not write avi.")
+
+
+class AviReader:
+    """ AviReader(filename, queueSize=16)
+    
+    Read the frames of a movie with ffmpeg, one at a time. Iterate over
+    the reader to get the frames as numpy arrays (uint8 RGB). ffmpeg
+    decodes the movie to raw RGB data, which a background thread reads
+    from a pipe. At most queueSize frames are kept in memory.
+    
+    The size of the frames (w, h) is available as the size attribute.
+    
+    """
+    
+    def __init__(self, filename, queueSize=16):
+        
+        # Check whether it exists
+        if not os.path.isfile(filename):
+            raise IOError('File not found: '+str(filename))
+        
+        self._exe = _getExe()
+        self._filename = filename
+        self._queueSize = queueSize
+        self.size = self._GetSize()
+    
+    
+    def _GetSize(self):
+        """ Get the size of the frames from the info of ffmpeg.
+        """
+        S = subprocess.Popen([self._exe, '-i', self._filename],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        info = S.communicate()[1].decode('utf-8', 'ignore')
+        for line in info.splitlines():
+            if 'Video:' in line:
+                match = re.search(r' (\d+)x(\d+)[ ,]', line)
+                if match:
+                    return int(match.group(1)), int(match.group(2))
+        print(info)
+        raise RuntimeError("Could not read avi.")
+    
+    
+    def __iter__(self):
+        w, h = self.size
+        frameSize = w * h * 3
+        command = [self._exe, '-i', self._filename, '-f', 'rawvideo',
+                    '-pix_fmt', 'rgb24', '-an', '-']
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                    stderr=log)
+        frames = queue.Queue(self._queueSize)
+        stop = []
+        
+        def read():
+            try:
+                while not stop:
+                    data = _readFrom(process.stdout, frameSize)
+                    if len(data) < frameSize:
+                        break
+                    im = np.frombuffer(data, np.uint8).reshape(h, w, 3)
+                    frames.put(im)
+            finally:
+                frames.put(None)
+        
+        thread = threading.Thread(target=read)
+        thread.daemon = True
+        thread.start()
+        
+        try:
+            while True:
+                im = frames.get()
+                if im is None:
+                    break
+                yield im
+        finally:
+            # Stop ffmpeg if the frames were not all consumed
+            stop.append(True)
+            if process.poll() is None:
+                process.terminate()
+            while thread.is_alive():
+                try:
+                    frames.get(timeout=0.1) # make room so it can finish
+                except queue.Empty:
+                    pass
+            process.stdout.close()
+            returnCode = process.wait()
+            text = _readLog(log)
+            log.close()
+        
+        if returnCode:
+            print(text)
+            raise RuntimeError("Could not read avi.")
+
+
+def _readFrom(fp, n):
+    """ Read n bytes from the file (less at the end of the file). """
+    bb = fp.read(n)
+    while bb and len(bb) < n:
+        tmp = fp.read(n - len(bb))
+        if not tmp:
             break
-    else:
-        print("Oops, could not fully clean up temporary files.")
+        bb += tmp
+    return bb
 
 
 def writeAvi(filename, images, duration=0.1, encoding='mpeg4',
@@ -61,9 +347,10 @@ def writeAvi(filename, images, duration=0.1, encoding='mpeg4',
     encoding. Hint for Windows users: the 'msmpeg4v2' codec is
     natively supported on Windows.
     
-    Images should be a list consisting of PIL images or numpy arrays.
-    The latter should be between 0 and 255 for integer types, and
-    between 0 and 1 for float types.
+    Images should be a list (or another iterable, e.g. a generator)
+    consisting of PIL images or numpy arrays. The latter should be
+    between 0 and 255 for integer types, and between 0 and 1 for float
+    types. The frames are streamed to ffmpeg (see AviWriter).
     
     Requires the "ffmpeg" application:
       * Most linux users can install using their package manager
@@ -71,57 +358,21 @@ def writeAvi(filename, images, duration=0.1, encoding='mpeg4',
     
     """
     
-    # Get fps
+    writer = AviWriter(filename, duration, encoding,
+                        inputOptions, outputOptions)
     try:
-        fps = float(1.0/duration)
-    except Exception:
-        raise ValueError("Invalid duration parameter for writeAvi.")
-    
-    # Determine temp dir and create images
-    tempDir = os.path.join( os.path.expanduser('~'), '.tempIms')
-    images2ims.writeIms( os.path.join(tempDir, 'im*.jpg'), images)
-    
-    # Determine formatter
-    N = len(images)
-    formatter = '%04d'
-    if N < 10:
-        formatter = '%d'
-    elif N < 100:
-        formatter = '%02d'
-    elif N < 1000:
-        formatter = '%03d'
-    
-    # Compile command to create avi
-    command = "ffmpeg -r %i %s " % (int(fps), inputOptions)
-    command += "-i im%s.jpg " % (formatter,)
-    command += "-g 1 -vcodec %s %s " % (encoding, outputOptions)
-    command += "output.avi"
-    
-    # Run ffmpeg
-    S = subprocess.Popen(command, shell=True, cwd=tempDir,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    
-    # Show what ffmpeg has to say
-    outPut = S.stdout.read()
-    
-    if S.wait():
-        # An error occured, show
-        print(outPut)
-        print(S.stderr.read())
-        # Clean up
-        _cleanDir(tempDir)
-        raise RuntimeError("Could not write avi.")
-    else:
-        # Copy avi
-        shutil.copy(os.path.join(tempDir, 'output.avi'), filename)
-        # Clean up
-        _cleanDir(tempDir)
+        for im in images:
+            writer.Write(im)
+    finally:
+        writer.Close()
+    return writer.count
 
 
 def readAvi(filename, asNumpy=True):
     """ readAvi(filename, asNumpy=True)
     
-    Read images from an AVI (or MPG) movie.
+    Read images from an AVI (or MPG) movie. To process the frames one
+    at a time (without keeping them all in memory) use AviReader.
     
     Requires the "ffmpeg" application:
       * Most linux users can install using their package manager
@@ -129,38 +380,12 @@ def readAvi(filename, asNumpy=True):
     
     """
     
-    # Check whether it exists
-    if not os.path.isfile(filename):
-        raise IOError('File not found: '+str(filename))
+    images = list(AviReader(filename))
     
-    # Determine temp dir, make sure it exists
-    tempDir = os.path.join( os.path.expanduser('~'), '.tempIms')
-    if not os.path.isdir(tempDir):
-        os.makedirs(tempDir)
-    
-    # Copy movie there
-    shutil.copy(filename, os.path.join(tempDir, 'input.avi'))
-    
-    # Run ffmpeg
-    command = "ffmpeg -i input.avi im%d.jpg"
-    S = subprocess.Popen(command, shell=True, cwd=tempDir,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    
-    # Show what mencodec has to say
-    outPut = S.stdout.read()
-    
-    if S.wait():
-        # An error occured, show
-        print(outPut)
-        print(S.stderr.read())
-        # Clean up
-        _cleanDir(tempDir)
-        raise RuntimeError("Could not read avi.")
-    else:
-        # Read images
-        images = images2ims.readIms(os.path.join(tempDir, 'im*.jpg'), asNumpy)
-        # Clean up
-        _cleanDir(tempDir)
+    # Convert to PIL images if needed
+    if not asNumpy:
+        from PIL import Image
+        images = [Image.fromarray(im) for im in images]
     
     # Done
     return images
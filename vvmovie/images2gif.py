@@ -68,6 +68,10 @@ Useful links
 
 import os
 import time
+import warnings
+import hashlib
+import collections
+import multiprocessing
 
 try:
     import PIL
@@ -82,14 +86,6 @@ except ImportError:
     np = None
 
 
-def get_cKDTree():
-    try:
-        from scipy.spatial import cKDTree
-    except ImportError:
-        cKDTree = None
-    return cKDTree
-
-
 # getheader gives a 87a header and a color palette (two elements in a list).
 # getdata()[0] gives the Image Descriptor up to (including) "LZW min code size".
 # getdatas()[1:] is the image data itself in chuncks of 256 bytes (well
@@ -331,8 +327,8 @@ class GifWriter:
             if diff.ndim == 3:
                 diff = diff.sum(2)
             # Get begin and end for both dimensions
-            X = np.argwhere(diff.sum(0))
-            Y = np.argwhere(diff.sum(1))
+            X = np.flatnonzero(diff.sum(0))
+            Y = np.flatnonzero(diff.sum(1))
             # Get rect coordinates
             if X.size and Y.size:
                 x0, x1 = int(X[0]), int(X[-1] + 1)
@@ -352,12 +348,20 @@ class GifWriter:
         #    (time.time()-t0, len(ims2)))
         return ims2, xy
 
-    def convertImagesToPIL(self, images, dither, nq=0):
-        """ convertImagesToPIL(images, nq=0)
+    def convertImagesToPIL(self, images, dither, nq=0, sharePalette=False,
+                            paletteCache=None):
+        """ convertImagesToPIL(images, dither, nq=0, sharePalette=False,
+                                paletteCache=None)
 
         Convert images to Paletted PIL images, which can then be
         written to a single animaged GIF.
 
+        When using NeuQuant (nq >= 1), a palette is learned for each
+        image, or, if sharePalette is True, one palette is learned from
+        all images. Images with the same content share their palette.
+        The learned palettes are stored in paletteCache (a dict), which
+        can be given to reuse them in later calls.
+
         """
 
         # Convert to PIL images
@@ -378,14 +382,27 @@ class GifWriter:
         images, images2 = images2, []
         if nq >= 1:
             # NeuQuant algorithm
-            for im in images:
-                im = im.convert("RGBA")  # NQ assumes RGBA
-                nqInstance = NeuQuant(im, int(nq))  # Learn colors from image
+            if paletteCache is None:
+                paletteCache = {}
+            arrays = [np.asarray(im.convert("RGB")) for im in images]
+            if sharePalette:
+                # Learn from all images, at most a few million pixels
+                stride = max(1, sum([a.size for a in arrays]) // 2**23)
+                pixels = np.concatenate([NeuQuant.getPixels(a)[::stride]
+                                            for a in arrays])
+                sharedInstance = self.getNeuQuant(pixels.reshape(-1, 1, 3),
+                                                    nq, paletteCache)
+            for a in arrays:
+                if sharePalette:
+                    nqInstance = sharedInstance
+                else:
+                    nqInstance = self.getNeuQuant(a, nq, paletteCache)
                 if dither:
-                    im = im.convert("RGB").quantize(palette=nqInstance.paletteImage())
+                    im = Image.fromarray(a, "RGB")
+                    im = im.quantize(palette=nqInstance.paletteImage())
                 else:
                     # Use to quantize the image itself
-                    im = nqInstance.quantize(im)
+                    im = nqInstance.quantize(a)
                 images2.append(im)
         else:
             # Adaptive PIL algorithm
@@ -397,6 +414,19 @@ class GifWriter:
         # Done
         return images2
 
+    def getNeuQuant(self, im, nq, paletteCache):
+        """ getNeuQuant(im, nq, paletteCache)
+
+        Get a NeuQuant instance with a palette for the given numpy
+        image. If a palette was learned for an image with the same
+        content before, it is obtained from paletteCache.
+
+        """
+        key = nq, im.shape, hashlib.md5(np.ascontiguousarray(im)).hexdigest()
+        if key not in paletteCache:
+            paletteCache[key] = NeuQuant(im, int(nq)) # Learn colors from image
+        return paletteCache[key]
+
     def writeGifToFile(self, fp, images, durations, loops, xys, disposes):
         """ writeGifToFile(fp, images, durations, loops, xys, disposes)
 
@@ -479,12 +509,231 @@ class GifWriter:
         return frames
 
 
+def toBytes(s):
+    """ Get the bytes of a string that was made with chr() (as the
+    methods of the GifWriter do).
+    """
+    if isinstance(s, bytes):
+        return s
+    return s.encode('latin-1')
+
+
+def convertFrame(args):
+    """ convertFrame(args)
+
+    Convert one frame for the GifStreamWriter; this is done in a worker
+    process. The args are (im, prev, dither, nq, nqInstance): the frame
+    (numpy array), the previous frame if sub-rectangles are used, and the
+    quantization parameters. Returns (palette, xy, size, data), with data
+    the LZW compressed image data.
+
+    """
+    im, prev, dither, nq, nqInstance = args
+    gifWriter = GifWriter()
+
+    # Crop to the region that changed
+    xy = (0, 0)
+    if prev is not None:
+        ims, xys = gifWriter.getSubRectangles([prev, im])
+        im, xy = ims[1], xys[1]
+
+    # Quantize
+    if nqInstance is None:
+        im = gifWriter.convertImagesToPIL([im], dither, nq)[0]
+    elif dither:
+        im = Image.fromarray(im).convert("RGB")
+        im = im.quantize(palette=nqInstance.paletteImage())
+    else:
+        im = nqInstance.quantize(im)
+
+    # Get palette (with 256 colors) and compressed data, without
+    # the image descriptor
+    palette = bytes(bytearray(im.getpalette()[:768]))
+    palette += b'\x00' * (768 - len(palette))
+    data = b''.join(getdata(im)[1:])
+    return palette, xy, im.size, data
+
+
+class GifStreamWriter:
+    """ GifStreamWriter(filename, duration=0.1, repeat=True, dither=False,
+                        nq=0, subRectangles=True, dispose=None,
+                        sharePalette=False, processes=0, lookAhead=None)
+
+    Write an animated GIF one frame at a time. The frames are converted
+    (cropped to the region that changed, and quantized) in a pool of
+    processes, and written to the file in order as soon as they are
+    ready. At most lookAhead frames are being converted at the same
+    time (by default twice the amount of processes), so the memory usage
+    does not depend on the length of the movie.
+
+    Use Write() to add a frame and Close() to finish the file. See
+    writeGif for the meaning of the arguments. If sharePalette is True,
+    the palette is learned from the first frame. If processes is 0, a
+    process is used for each CPU core. If it is 1, the frames are
+    converted in this process.
+
+    """
+
+    def __init__(self, filename, duration=0.1, repeat=True, dither=False,
+                 nq=0, subRectangles=True, dispose=None, sharePalette=False,
+                 processes=0, lookAhead=None):
+
+        # Check PIL and numpy
+        if PIL is None:
+            raise RuntimeError("Need PIL to write animated gif files.")
+        if np is None:
+            raise RuntimeError("Need Numpy to stream animated gif files.")
+
+        # Check loops
+        if repeat is False:
+            self._loops = 1
+        elif repeat is True:
+            self._loops = 0  # zero means infinite
+        else:
+            self._loops = int(repeat)
+
+        # Check dispose
+        if dispose is None:
+            dispose = 1 if subRectangles else 2
+
+        # Store parameters
+        self._duration = duration
+        self._dither = dither
+        self._nq = nq
+        self._subRectangles = bool(subRectangles)
+        self._dispose = dispose
+        self._sharePalette = sharePalette and nq >= 1
+        self._nqInstance = None
+
+        # Create pool
+        self._pool = None
+        if not processes:
+            processes = multiprocessing.cpu_count()
+        if processes > 1:
+            self._pool = multiprocessing.Pool(processes)
+        self._lookAhead = lookAhead or 2 * processes
+
+        # State
+        self._gifWriter = GifWriter()
+        self._fp = open(filename, 'wb')
+        self._pending = collections.deque()
+        self._prev = None
+        self._size = None
+        self._globalPalette = None
+        self._count = 0
+
+    @property
+    def count(self):
+        """ The number of frames that is written to the file.
+        """
+        return self._count
+
+    def Write(self, im, duration=None):
+        """ Write(im, duration=None)
+
+        Add a frame (a numpy array or PIL image). The duration defaults
+        to the duration given at initialization. Blocks while lookAhead
+        frames are being converted.
+
+        """
+        if self._fp is None:
+            raise RuntimeError('Cannot write to a closed GifStreamWriter.')
+
+        # Get as numpy array
+        im = checkImages([im])[0]
+        if isinstance(im, Image.Image):
+            im = np.asarray(im.convert('RGB'))
+        if im.ndim == 3 and im.shape[2] == 4:
+            im = im[:, :, :3]
+        if self._size is None:
+            self._size = im.shape[1], im.shape[0]
+        if self._sharePalette and self._nqInstance is None:
+            self._nqInstance = NeuQuant(im, int(self._nq))
+
+        # Start converting
+        prev = None
+        if self._subRectangles:
+            prev, self._prev = self._prev, im
+        args = im, prev, self._dither, self._nq, self._nqInstance
+        if self._pool is not None:
+            result = self._pool.apply_async(convertFrame, (args,))
+        else:
+            result = convertFrame(args)
+        if duration is None:
+            duration = self._duration
+        self._pending.append((result, duration))
+
+        # Write the frames that are done, and wait if we are too far ahead
+        while self._pending and (len(self._pending) > self._lookAhead or
+                                 self._isReady(self._pending[0][0])):
+            self._WriteNext()
+
+    def _isReady(self, result):
+        return not hasattr(result, 'ready') or result.ready()
+
+    def _WriteNext(self):
+        """ Write the oldest pending frame to the file.
+        """
+        result, duration = self._pending.popleft()
+        if hasattr(result, 'get'):
+            result = result.get()
+        palette, xy, size, data = result
+        fp, gifWriter = self._fp, self._gifWriter
+
+        if self._globalPalette is None:
+            # Write header, use the palette of the first frame as the
+            # global palette
+            self._globalPalette = palette
+            header = "GIF89a"
+            header += intToBin(self._size[0])
+            header += intToBin(self._size[1])
+            header += "\x87\x00\x00"
+            fp.write(toBytes(header))
+            fp.write(palette)
+            fp.write(toBytes(gifWriter.getAppExt(self._loops)))
+
+        # Write graphics control extension and image descriptor
+        fp.write(toBytes(gifWriter.getGraphicsControlExt(duration,
+                                                         self._dispose)))
+        lid = '\x2C' + intToBin(xy[0]) + intToBin(xy[1])
+        lid += intToBin(size[0]) + intToBin(size[1])
+        if palette == self._globalPalette:
+            fp.write(toBytes(lid + '\x00')) # no local color table
+        else:
+            fp.write(toBytes(lid + '\x87')) # local color table of 256
+            fp.write(palette)
+
+        # Write image data
+        fp.write(data)
+        self._count += 1
+
+    def Close(self):
+        """ Close()
+
+        Write the remaining frames and finish the file.
+
+        """
+        if self._fp is None:
+            return
+        try:
+            while self._pending:
+                self._WriteNext()
+            if self._count:
+                self._fp.write(toBytes(";")) # end gif
+        finally:
+            self._fp.close()
+            self._fp = None
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
+
+
 ## Exposed functions
 
 def writeGif(filename, images, duration=0.1, repeat=True, dither=False,
-                nq=0, subRectangles=True, dispose=None):
+                nq=0, subRectangles=True, dispose=None, sharePalette=False):
     """ writeGif(filename, images, duration=0.1, repeat=True, dither=False,
-                    nq=0, subRectangles=True, dispose=None)
+                    nq=0, subRectangles=True, dispose=None, sharePalette=False)
 
     Write an animated gif from the specified images.
 
@@ -521,6 +770,10 @@ def writeGif(filename, images, duration=0.1, repeat=True, dither=False,
         in place. 2 means the background color should be restored after
         each frame. 3 means the decoder should restore the previous frame.
         If subRectangles==False, the default is 2, otherwise it is 1.
+    sharePalette : bool
+        If True and nq is nonzero, one palette is learned from all images,
+        instead of one for each image. This is faster, and gives smaller
+        files if the images have similar colors.
 
     """
 
@@ -570,7 +823,7 @@ def writeGif(filename, images, duration=0.1, repeat=True, dither=False,
         dispose = [dispose for im in images]
 
     # Make images in a format that we can write easy
-    images = gifWriter.convertImagesToPIL(images, dither, nq)
+    images = gifWriter.convertImagesToPIL(images, dither, nq, sharePalette)
 
     # Write
     fp = open(filename, 'wb')
@@ -580,6 +833,46 @@ def writeGif(filename, images, duration=0.1, repeat=True, dither=False,
         fp.close()
 
 
+def writeGifStream(filename, images, duration=0.1, repeat=True, dither=False,
+                   nq=0, subRectangles=True, dispose=None, sharePalette=False,
+                   processes=0, lookAhead=None):
+    """ writeGifStream(filename, images, duration=0.1, repeat=True,
+                    dither=False, nq=0, subRectangles=True, dispose=None,
+                    sharePalette=False, processes=0, lookAhead=None)
+
+    Write an animated gif from the images produced by an iterable (e.g.
+    a generator), using a GifStreamWriter. The images are converted in
+    parallel, and only a few are kept in memory at any time.
+
+    See writeGif for the parameters, in which subRectangles should be a
+    bool and duration can also be an iterable. If sharePalette is True,
+    the palette is learned from the first image. processes is the amount
+    of processes to convert the images with (all CPU cores by default),
+    and lookAhead the maximum amount of images that is being converted.
+
+    Returns the amount of images that was written.
+
+    """
+
+    if hasattr(duration, '__iter__'):
+        durations = iter(duration)
+    else:
+        durations = None
+
+    writer = GifStreamWriter(filename, duration, repeat, dither, nq,
+                             subRectangles, dispose, sharePalette,
+                             processes, lookAhead)
+    try:
+        for im in images:
+            if durations is None:
+                writer.Write(im)
+            else:
+                writer.Write(im, next(durations))
+    finally:
+        writer.Close()
+    return writer.count
+
+
 def readGif(filename, asNumpy=True):
     """ readGif(filename, asNumpy=True)
 
@@ -630,9 +923,33 @@ def readGif(filename, asNumpy=True):
     return images
 
 
+def nearestColors(pixels, palette, chunkSize=4096):
+    """ nearestColors(pixels, palette, chunkSize=4096)
+
+    Get for each color in pixels (an Nx3 array) the index of the nearest
+    color in palette (an Mx3 array). The squared distances are calculated
+    with a matrix product, in chunks of pixels to limit memory usage. For
+    8 bit colors this is exact, and it does not need scipy.
+
+    """
+    pixels = np.asarray(pixels, np.float32).reshape(-1, 3)
+    palette = np.asarray(palette, np.float32).reshape(-1, 3)
+    # |p-c|^2 = |p|^2 - 2 p.c + |c|^2, in which |p|^2 does not matter
+    paletteNorm = (palette * palette).sum(1)
+    result = np.empty(len(pixels), np.int32)
+    for i in range(0, len(pixels), chunkSize):
+        dists = paletteNorm - 2.0 * np.dot(pixels[i:i + chunkSize], palette.T)
+        result[i:i + chunkSize] = dists.argmin(1)
+    return result
+
+
 class NeuQuant:
     """ NeuQuant(image, samplefac=10, colors=256)
 
+    Learn a palette for the given image (a PIL image or a numpy array)
+    with the NeuQuant algorithm. The instance can then be used to
+    quantize this image, or other images that should share the palette.
+
     samplefac should be an integer number of 1 or higher, 1
     being the highest quality, but the slowest performance.
     With avalue of 10, one tenth of all pixels are used during
@@ -642,6 +959,11 @@ class NeuQuant:
     colors is the amount of colors to reduce the image to. This
     should best be a power of two.
 
+    The network is trained on batches of pixels: all pixels in a batch
+    compete for the neurons at once, after which each neuron moves
+    towards the pixels it won (and those of its neighbours), as much as
+    it would have moved when training on the pixels one at a time.
+
     See also:
     http://members.ozemail.com.au/~dekker/NEUQUANT.HTML
 
@@ -706,9 +1028,14 @@ class NeuQuant:
     PRIME4 = 503
     MAXPRIME = PRIME4
 
+    # The maximum number of pixels that are trained on at once
+    BATCHSIZE = 1024
+
+    # The maximum number of colors to remember the palette index of
+    MAXCACHESIZE = 2**20
+
     pixels = None
     samplefac = None
-
     a_s = None
 
     def setconstants(self, samplefac, colors):
@@ -719,7 +1046,7 @@ class NeuQuant:
         self.CUTNETSIZE = self.NETSIZE - self.SPECIALS
         self.MAXNETPOS = self.NETSIZE - 1
 
-        self.INITRAD = self.NETSIZE/8 # For 256 colours, radius starts at 32
+        self.INITRAD = self.NETSIZE//8 # For 256 colours, radius starts at 32
         self.RADIUSBIASSHIFT = 6
         self.RADIUSBIAS = 1 << self.RADIUSBIASSHIFT
         self.INITBIASRADIUS = self.INITRAD * self.RADIUSBIAS
@@ -742,9 +1069,12 @@ class NeuQuant:
 
         self.pixels = None
         self.samplefac = samplefac
-
         self.a_s = {}
 
+        # Palette indices of colors that were quantized before (sorted)
+        self._cacheKeys = np.zeros(0, np.uint32)
+        self._cacheIndices = np.zeros(0, np.uint8)
+
     def __init__(self, image, samplefac=10, colors=256):
 
         # Check Numpy
@@ -752,19 +1082,36 @@ class NeuQuant:
             raise RuntimeError("Need Numpy for the NeuQuant algorithm.")
 
         # Check image
-        if image.size[0] * image.size[1] < NeuQuant.MAXPRIME:
-            raise IOError("Image is too small")
-        if image.mode != "RGBA":
-            raise IOError("Image mode should be RGBA.")
+        pixels = self.getPixels(image)
+        if not pixels.size:
+            raise IOError("Image is empty")
 
         # Initialize
         self.setconstants(samplefac, colors)
-        self.pixels = np.fromstring(image.tostring(), np.uint32)
+        self.pixels = pixels.astype(np.float64)
         self.setUpArrays()
 
         self.learn()
         self.fix()
         self.inxbuild()
+        self.pixels = None # Free memory
+
+    @staticmethod
+    def getPixels(image):
+        """ getPixels(image)
+
+        Get the RGB colors of a PIL image or a numpy array (of uint8,
+        gray or color) as an Nx3 array. The array is not copied if it need not be.
+
+        """
+        if PIL and isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+        image = np.asarray(image)
+        if image.ndim == 3:
+            image = image[:, :, :3]
+        elif image.ndim == 2:
+            image = np.repeat(image[:, :, None], 3, 2) # Gray
+        return image.reshape(-1, 3)
 
     def writeColourMap(self, rgb, outstream):
         for i in range(self.NETSIZE):
@@ -777,28 +1124,22 @@ class NeuQuant:
         return self.NETSIZE
 
     def setUpArrays(self):
-        self.network[0, 0] = 0.0    # Black
-        self.network[0, 1] = 0.0
-        self.network[0, 2] = 0.0
-
-        self.network[1, 0] = 255.0    # White
-        self.network[1, 1] = 255.0
-        self.network[1, 2] = 255.0
-
+        self.network[0] = 0.0 # Black
+        self.network[1] = 255.0 # White
         # RESERVED self.BGCOLOR # Background
+        self.network[self.BGCOLOR] = 0.0
 
-        for i in range(self.SPECIALS):
-            self.freq[i] = 1.0 / self.NETSIZE
-            self.bias[i] = 0.0
-
-        for i in range(self.SPECIALS, self.NETSIZE):
-            p = self.network[i]
-            p[:] = (255.0 * (i-self.SPECIALS)) / self.CUTNETSIZE
+        # Start with a gray ramp
+        i = np.arange(self.SPECIALS, self.NETSIZE)
+        self.network[self.SPECIALS:] = (255.0 * (i-self.SPECIALS) /
+                                        self.CUTNETSIZE)[:, None]
 
-            self.freq[i] = 1.0 / self.NETSIZE
-            self.bias[i] = 0.0
+        self.freq[:] = 1.0 / self.NETSIZE
+        self.bias[:] = 0.0
 
-    # Omitted: setPixels
+    # The per-pixel training steps below are no longer used by learn(),
+    # which trains on batches of pixels (see learnBatch()). They are kept
+    # for code that uses them directly.
 
     def altersingle(self, alpha, i, b, g, r):
         """Move neuron i towards biased (b, g, r) by factor alpha"""
@@ -839,23 +1180,6 @@ class NeuQuant:
         p = self.network[lo + 1:hi]
         p -= np.transpose(np.transpose(p - np.array([b, g, r])) * a)
 
-    #def contest(self, b, g, r):
-    #    """ Search for biased BGR values
-    #            Finds closest neuron (min dist) and updates self.freq
-    #            finds best neuron (min dist-self.bias) and returns position
-    #            for frequently chosen neurons, self.freq[i] is high and self.bias[i] is negative
-    #            self.bias[i] = self.GAMMA * ((1/self.NETSIZE)-self.freq[i])"""
-    #
-    #    i, j = self.SPECIALS, self.NETSIZE
-    #    dists = abs(self.network[i:j] - np.array([b, g, r])).sum(1)
-    #    bestpos = i + np.argmin(dists)
-    #    biasdists = dists - self.bias[i:j]
-    #    bestbiaspos = i + np.argmin(biasdists)
-    #    self.freq[i:j] -= self.BETA * self.freq[i:j]
-    #    self.bias[i:j] += self.BETAGAMMA * self.freq[i:j]
-    #    self.freq[bestpos] += self.BETA
-    #    self.bias[bestpos] -= self.BETAGAMMA
-    #    return bestbiaspos
     def contest(self, b, g, r):
         """Search for biased BGR values
         Finds closest neuron (min dist) and updates self.freq
@@ -882,22 +1206,18 @@ class NeuQuant:
         return -1
 
     def learn(self):
-        biasRadius = self.INITBIASRADIUS
-        alphadec = 30 + ((self.samplefac-1)/3)
-        lengthcount = self.pixels.size
-        samplepixels = lengthcount / self.samplefac
-        delta = samplepixels / self.NCYCLES
+        """ Train the network on a sample of the pixels. In each of the
+        NCYCLES learning cycles, alpha and the radius are constant, so the
+        pixels of a cycle can be trained on in batches.
+        """
+        alphadec = 30 + ((self.samplefac-1)//3)
+        lengthcount = len(self.pixels)
+        samplepixels = max(1, lengthcount // self.samplefac)
+        delta = max(1, samplepixels // self.NCYCLES)
         alpha = self.INITALPHA
+        biasRadius = self.INITBIASRADIUS
 
-        i = 0
-        rad = biasRadius * 2**self.RADIUSBIASSHIFT
-        if rad <= 1:
-            rad = 0
-
-        print("Beginning 1D learning: samplepixels = %1.2f  rad = %i" %
-             (samplepixels, rad))
-        step = 0
-        pos = 0
+        # Get the sampled pixels, stepping through the image with a prime
         if lengthcount % NeuQuant.PRIME1 != 0:
             step = NeuQuant.PRIME1
         elif lengthcount % NeuQuant.PRIME2 != 0:
@@ -906,140 +1226,176 @@ class NeuQuant:
             step = NeuQuant.PRIME3
         else:
             step = NeuQuant.PRIME4
+        positions = (np.arange(samplepixels, dtype=np.int64) * step) % lengthcount
+        samples = self.pixels[positions]
+
+        # Remember background colour
+        self.network[self.BGCOLOR] = samples[0]
+
+        # Don't learn for specials
+        specials = self.network[:self.SPECIALS]
+        isSpecial = (samples[:, None, :] == specials[None, :, :]).all(2).any(1)
 
-        i = 0
-        printed_string = ''
-        while i < samplepixels:
-            if i % 100 == 99:
-                tmp = '\b' * len(printed_string)
-                printed_string = str((i + 1) * 100/samplepixels) + "%\n"
-                print(tmp + printed_string)
-            p = self.pixels[pos]
-            r = (p >> 16) & 0xff
-            g = (p >> 8) & 0xff
-            b = (p) & 0xff
-
-            if i == 0: # Remember background colour
-                self.network[self.BGCOLOR] = [b, g, r]
-
-            j = self.specialFind(b, g, r)
-            if j < 0:
-                j = self.contest(b, g, r)
-
-            if j >= self.SPECIALS: # Don't learn for specials
-                a = (1.0 * alpha) / self.INITALPHA
-                self.altersingle(a, j, b, g, r)
-                if rad > 0:
-                    self.alterneigh(a, rad, j, b, g, r)
-
-            pos = (pos + step) % lengthcount
-
-            i += 1
-            if i % delta == 0:
-                alpha -= alpha / alphadec
-                biasRadius -= biasRadius / self.RADIUSDEC
-                rad = biasRadius * 2**self.RADIUSBIASSHIFT
-                if rad <= 1:
-                    rad = 0
-
-        finalAlpha = (1.0 * alpha)/self.INITALPHA
-        print("Finished 1D learning: final alpha = %1.2f!" % finalAlpha)
+        for i in range(0, samplepixels, delta):
+            rad = biasRadius >> self.RADIUSBIASSHIFT
+            if rad <= 1:
+                rad = 0
+            a = (1.0 * alpha) / self.INITALPHA
+            batch = samples[i:i + delta][~isSpecial[i:i + delta]]
+            for j in range(0, len(batch), self.BATCHSIZE):
+                self.learnBatch(batch[j:j + self.BATCHSIZE], a, rad)
+
+            alpha -= alpha // alphadec
+            biasRadius -= biasRadius // self.RADIUSDEC
+
+    def learnBatch(self, batch, alpha, rad):
+        """ learnBatch(batch, alpha, rad)
+
+        Train the (non-special) neurons on a batch of pixels (an Nx3
+        array). Each pixel selects a neuron (contest), which is moved
+        towards the pixel by factor alpha. Its neighbours within rad are
+        moved by a factor that decreases with the distance.
+
+        """
+        S = self.SPECIALS
+        network = self.network[S:]
+        freq, bias = self.freq[S:], self.bias[S:]
+        count = len(network)
+
+        # Contest: find the closest neuron, and the best neuron (the
+        # closest, taking into account the bias against neurons that
+        # are chosen often)
+        dists = np.abs(batch[:, None, :] - network[None, :, :]).sum(2)
+        bestpos = dists.argmin(1)
+        bestbiaspos = (dists - bias).argmin(1)
+
+        # Update frequencies. Per pixel, freq decays by BETA and the freq
+        # of the closest neuron increases by BETA. The bias then follows:
+        # bias = GAMMA * (1/NETSIZE - freq).
+        freq *= (1 - self.BETA) ** len(batch)
+        freq += self.BETA * np.bincount(bestpos, minlength=count)
+        bias[:] = self.GAMMA * (1.0 / self.NETSIZE - freq)
+
+        # Get the weights of each pixel for the selected neuron and its
+        # neighbours: (rad^2 - d^2) / rad^2 at distance d < rad
+        if rad > 0:
+            d = np.arange(-rad + 1, rad)
+            weights = (rad * rad - d * d) / float(rad * rad)
+        else:
+            d = np.zeros(1, np.int64)
+            weights = np.ones(1)
+        neurons = bestbiaspos[:, None] + d[None, :]
+        valid = (neurons >= 0) & (neurons < count)
+        pixelIndices = np.nonzero(valid)[0]
+        neurons = neurons[valid]
+        weights = np.broadcast_to(weights * alpha, valid.shape)[valid]
+
+        # Moving a neuron n towards pixels p_i one at a time (by factor
+        # a_i) gives n' = m + prod(1-a_i) * (n-m), with m the weighted mean
+        weightSum = np.bincount(neurons, weights, count)
+        remain = np.exp(np.bincount(neurons,
+                        np.log(np.maximum(1.0 - weights, 1e-12)), count))
+        hit = weightSum > 0
+        for c in range(3):
+            sums = np.bincount(neurons, weights * batch[pixelIndices, c], count)
+            mean = sums[hit] / weightSum[hit]
+            network[hit, c] = mean + remain[hit] * (network[hit, c] - mean)
 
     def fix(self):
-        for i in range(self.NETSIZE):
-            for j in range(3):
-                x = int(0.5 + self.network[i, j])
-                x = max(0, x)
-                x = min(255, x)
-                self.colormap[i, j] = x
-            self.colormap[i, 3] = i
+        self.colormap[:, :3] = np.clip(np.round(self.network), 0, 255)
+        self.colormap[:, 3] = np.arange(self.NETSIZE)
 
     def inxbuild(self):
-        previouscol = 0
-        startpos = 0
-        for i in range(self.NETSIZE):
-            p = self.colormap[i]
-            q = None
-            smallpos = i
-            smallval = p[1] # Index on g
-            # Find smallest in i..self.NETSIZE-1
-            for j in range(i + 1, self.NETSIZE):
-                q = self.colormap[j]
-                if q[1] < smallval: # Index on g
-                    smallpos = j
-                    smallval = q[1] # Index on g
-
-            q = self.colormap[smallpos]
-            # Swap p (i) and q (smallpos) entries
-            if i != smallpos:
-                p[:], q[:] = q, p.copy()
-
-            # smallval entry is now in position i
-            if smallval != previouscol:
-                self.netindex[previouscol] = (startpos + i) >> 1
-                for j in range(previouscol + 1, smallval):
-                    self.netindex[j] = i
-                previouscol = smallval
-                startpos = i
-        self.netindex[previouscol] = (startpos + self.MAXNETPOS) >> 1
-        for j in range(previouscol + 1, 256):  # Really 256
-            self.netindex[j] = self.MAXNETPOS
+        """ Sort the colormap on green, and build the index in it.
+        """
+        order = np.argsort(self.colormap[:, 1], kind='mergesort') # Index on g
+        self.colormap[:] = self.colormap[order]
+        green = self.colormap[:, 1]
+        self.netindex[:] = np.minimum(np.searchsorted(green, np.arange(256)),
+                                      self.MAXNETPOS)
+
+    def palette(self):
+        """ Get the palette as a list of 256*3 RGB values.
+        """
+        palette = self.colormap[:, :3].ravel().tolist()
+        palette.extend([0] * (256-self.NETSIZE) * 3)
+        return palette
 
     def paletteImage(self):
         """PIL weird interface for making a paletted image: create an image
         which already has the palette, and use that in Image.quantize. This
         function returns this palette image."""
         if self.pimage is None:
-            palette = []
-            for i in range(self.NETSIZE):
-                palette.extend(self.colormap[i][:3])
-
-            palette.extend([0] * (256-self.NETSIZE) * 3)
-
             # a palette image to use for quant
             self.pimage = Image.new("P", (1, 1), 0)
-            self.pimage.putpalette(palette)
+            self.pimage.putpalette(self.palette())
         return self.pimage
 
     def quantize(self, image):
-        """ Use a kdtree to quickly find the closest palette colors for the pixels """
-        if get_cKDTree():
-            return self.quantize_with_scipy(image)
-        else:
-            print('Scipy not available, falling back to slower version.')
-            return self.quantize_without_scipy(image)
+        """ quantize(image)
 
-    def quantize_with_scipy(self, image):
-        w, h = image.size
-        px = np.asarray(image).copy()
-        px2 = px[:, :, :3].reshape((w * h, 3))
+        Get a paletted PIL image, with for each pixel the closest color
+        of the palette.
 
-        cKDTree = get_cKDTree()
-        kdtree = cKDTree(self.colormap[:, :3], leafsize=10)
-        result = kdtree.query(px2)
-        colorindex = result[1]
-        print("Distance: %1.2f" % (result[0].sum()/(w * h)))
-        px2[:] = self.colormap[colorindex, :3]
+        """
+        if PIL and isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+        im = Image.fromarray(self.quantizeArray(image), "P")
+        im.putpalette(self.palette())
+        return im
 
-        return Image.fromarray(px).convert("RGB").quantize(palette=self.paletteImage())
+    def quantize_with_scipy(self, image):
+        """ Deprecated: use quantize(), which no longer needs scipy. """
+        warnings.warn('NeuQuant.quantize_with_scipy() is deprecated, '
+                      'use NeuQuant.quantize() instead.', DeprecationWarning)
+        return self.quantize(image)
 
     def quantize_without_scipy(self, image):
-        """" This function can be used if no scipy is availabe.
-        It's 7 times slower though.
+        """ Deprecated: use quantize(), which no longer needs scipy. """
+        warnings.warn('NeuQuant.quantize_without_scipy() is deprecated, '
+                      'use NeuQuant.quantize() instead.', DeprecationWarning)
+        return self.quantize(image)
+
+    def quantizeArray(self, image):
+        """ quantizeArray(image)
+
+        Get the palette indices (as uint8) for the given numpy image.
+        Each distinct color is looked up only once; the result is kept,
+        so that quantizing more images with this palette goes faster.
+
         """
-        w, h = image.size
-        px = np.asarray(image).copy()
-        memo = {}
-        for j in range(w):
-            for i in range(h):
-                key = (px[i, j, 0], px[i, j, 1], px[i, j, 2])
-                try:
-                    val = memo[key]
-                except KeyError:
-                    val = self.convert(*key)
-                    memo[key] = val
-                px[i, j, 0], px[i, j, 1], px[i, j, 2] = val
-        return Image.fromarray(px).convert("RGB").quantize(palette=self.paletteImage())
+        image = np.asarray(image)
+        px = self.getPixels(image).astype(np.uint32)
+        keys = (px[:, 0] << 16) | (px[:, 1] << 8) | px[:, 2]
+        keys, inverse = np.unique(keys, return_inverse=True)
+
+        # Look up the colors that are already known
+        cacheKeys, cacheIndices = self._cacheKeys, self._cacheIndices
+        pos = np.minimum(np.searchsorted(cacheKeys, keys), len(cacheKeys)-1)
+        known = np.zeros(len(keys), bool)
+        if len(cacheKeys):
+            known = cacheKeys[pos] == keys
+        indices = np.empty(len(keys), np.uint8)
+        indices[known] = cacheIndices[pos[known]]
+
+        # Find the nearest palette color for the others
+        newKeys = keys[~known]
+        if len(newKeys):
+            colors = np.column_stack([newKeys >> 16, (newKeys >> 8) & 0xff,
+                                      newKeys & 0xff])
+            newIndices = nearestColors(colors, self.colormap[:, :3])
+            indices[~known] = newIndices
+            # Remember
+            if len(cacheKeys) + len(newKeys) > self.MAXCACHESIZE:
+                cacheKeys, cacheIndices = cacheKeys[:0], cacheIndices[:0]
+            cacheKeys = np.concatenate([cacheKeys, newKeys])
+            cacheIndices = np.concatenate([cacheIndices,
+                                           newIndices.astype(np.uint8)])
+            order = np.argsort(cacheKeys, kind='mergesort')
+            self._cacheKeys = cacheKeys[order]
+            self._cacheIndices = cacheIndices[order]
+
+        return indices[inverse.ravel()].reshape(image.shape[:2])
 
     def convert(self, *color):
         i = self.inxsearch(*color)
@@ -1047,9 +1403,7 @@ class NeuQuant:
 
     def inxsearch(self, r, g, b):
         """Search for BGR values 0..255 and return colour index"""
-        dists = (self.colormap[:, :3] - np.array([r, g, b]))
-        a = np.argmin((dists * dists).sum(1))
-        return a
+        return nearestColors([(r, g, b)], self.colormap[:, :3])[0]
 
 if __name__ == '__main__':
     im = np.zeros((200, 200), dtype=np.uint8)
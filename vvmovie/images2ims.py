@@ -29,9 +29,18 @@
 
 Use PIL to create a series of images.
 
+The images are encoded and decoded in a pool of threads (PIL releases
+the GIL while doing so), with a bounded amount of images in flight, and
+in the order of the sequence. A series of images can also be read
+lazily, using an ImageSequence object.
+
 """
 
 import os
+import threading
+import collections
+import multiprocessing
+import multiprocessing.pool
 
 try:
     import numpy as np
@@ -111,7 +120,7 @@ def _getFilenameWithFormatter(filename, N):
     # Insert sequence number formatter
     part1, part2 = _getFilenameParts(filename)
     return part1 + formatter + part2
-    
+
 
 def _getSequenceNumber(filename, part1, part2):
     # Get string bit
@@ -127,8 +136,68 @@ def _getSequenceNumber(filename, part1, part2):
     return int(seq2)
 
 
-def writeIms(filename, images):
-    """ writeIms(filename, images)
+def imap(func, items, threads=0, maxInFlight=None, progress=None):
+    """ imap(func, items, threads=0, maxInFlight=None, progress=None)
+    
+    Generate func(item) for the given items (an iterable), in order.
+    The function is applied in a pool of threads (as many as there
+    are CPU cores if threads is 0). At most maxInFlight items (by default
+    four times the amount of threads) are processed or wait to be
+    consumed, so that items are only taken from the iterable as needed.
+    If given, progress(count, total) is called after each item is done,
+    with total None if the items have no length.
+    
+    """
+    total = len(items) if hasattr(items, '__len__') else None
+    threads = threads or multiprocessing.cpu_count()
+    maxInFlight = max(1, maxInFlight or 4 * threads)
+    
+    # Process in this thread if there is no use for a pool
+    if threads == 1:
+        count = 0
+        for item in items:
+            result = func(item)
+            count += 1
+            if progress is not None:
+                progress(count, total)
+            yield result
+        return
+    
+    pool = multiprocessing.pool.ThreadPool(threads)
+    pending = collections.deque()
+    count = 0
+    try:
+        items = iter(items)
+        while True:
+            # Fill up
+            for item in items:
+                pending.append(pool.apply_async(func, (item,)))
+                if len(pending) >= maxInFlight:
+                    break
+            if not pending:
+                break
+            # Get the oldest
+            result = pending.popleft().get()
+            count += 1
+            if progress is not None:
+                progress(count, total)
+            yield result
+    finally:
+        pool.terminate()
+
+
+def _writeIm(args):
+    """ Write one image (runs in a thread of the pool). """
+    fname, frame = args
+    frame = checkImages([frame])[0]
+    if np and isinstance(frame, np.ndarray):
+        frame = PIL.Image.fromarray(frame)
+    frame.save(fname)
+    return fname
+
+
+def writeIms(filename, images, threads=0, maxInFlight=None, progress=None):
+    """ writeIms(filename, images, threads=0, maxInFlight=None, progress=None)
     
     Export movie to a series of image files. If the filenenumber
     contains an asterix, a sequence number is introduced at its
@@ -140,7 +209,12 @@ def writeIms(filename, images):
     
     Images should be a list consisting of PIL images or numpy arrays.
     The latter should be between 0 and 255 for integer types, and
-    between 0 and 1 for float types.
+    between 0 and 1 for float types. It can also be another iterable
+    (e.g. a generator), in which case the sequence numbers have at
+    least four digits.
+    
+    The images are encoded in threads, see imap() for the meaning of
+    threads, maxInFlight and progress. Returns the number of images.
     
     """
     
@@ -148,9 +222,6 @@ def writeIms(filename, images):
     if PIL is None:
         raise RuntimeError("Need PIL to write series of image files.")
     
-    # Check images
-    images = checkImages(images)
-    
     # Get dirname and filename
     filename = os.path.abspath(filename)
     dirname, filename = os.path.split(filename)
@@ -160,37 +231,59 @@ def writeIms(filename, images):
         os.makedirs(dirname)
     
     # Insert formatter
-    filename = _getFilenameWithFormatter(filename, len(images))
+    N = len(images) if hasattr(images, '__len__') else 10000
+    filename = _getFilenameWithFormatter(filename, N)
     
     # Write
-    seq = 0
-    for frame in images:
-        seq += 1
-        # Get filename
-        fname = os.path.join(dirname, filename%seq)
-        # Write image
-        if np and isinstance(frame, np.ndarray):
-            frame =  PIL.Image.fromarray(frame)
-        frame.save(fname)
+    def generateArgs():
+        seq = 0
+        for frame in images:
+            seq += 1
+            yield os.path.join(dirname, filename%seq), frame
+    
+    count = 0
+    for fname in imap(_writeIm, generateArgs(), threads, maxInFlight,
+                                                                progress):
+        count += 1
+    return count
+
+
+def _readIm(fname, asNumpy=True):
+    """ Read one image (runs in a thread of the pool). """
+    # Get Pil image and store copy (to prevent keeping the file)
+    im = PIL.Image.open(fname)
+    try:
+        im.load()
+        if not asNumpy:
+            return im.copy()
+        # Make without palette
+        if im.mode == 'P':
+            im = im.convert()
+        # Make numpy array
+        a = np.asarray(im)
+        if len(a.shape)==0:
+            raise MemoryError("Too little memory to convert PIL image to array")
+        return a
+    finally:
+        im.close()
+
+
+def _readNumpy(fname):
+    return _readIm(fname, True)
+
 
+def _readPil(fname):
+    return _readIm(fname, False)
 
 
-def readIms(filename, asNumpy=True):
-    """ readIms(filename, asNumpy=True)
+def getImageFilenames(filename):
+    """ getImageFilenames(filename)
     
-    Read images from a series of images in a single directory. Returns a
-    list of numpy arrays, or, if asNumpy is false, a list if PIL images.
+    Get the (full) filenames of a series of images, sorted by sequence
+    number. See readIms() for the format of filename.
     
     """
     
-    # Check PIL
-    if PIL is None:
-        raise RuntimeError("Need PIL to read a series of image files.")
-    
-    # Check Numpy
-    if asNumpy and np is None:
-        raise RuntimeError("Need Numpy to return numpy arrays.")
-    
     # Get dirname and filename
     filename = os.path.abspath(filename)
     dirname, filename = os.path.split(filename)
@@ -202,36 +295,140 @@ def readIms(filename, asNumpy=True):
     # Get two parts of the filename
     part1, part2 = _getFilenameParts(filename)
     
-    # Init images
-    images = []
-    
     # Get all files in directory
+    fnames = []
     for fname in os.listdir(dirname):
         if fname.startswith(part1) and fname.endswith(part2):
             # Get sequence number
             nr = _getSequenceNumber(fname, part1, part2)
-            # Get Pil image and store copy (to prevent keeping the file)
-            im = PIL.Image.open(os.path.join(dirname, fname))
-            images.append((im.copy(), nr))
-    
-    # Sort images
-    images.sort(key=lambda x:x[1])
-    images = [im[0] for im in images]
-    
-    # Convert to numpy if needed
-    if asNumpy:
-        images2 = images
-        images = []
-        for im in images2:
-            # Make without palette
-            if im.mode == 'P':
-                im = im.convert()
-            # Make numpy array
-            a = np.asarray(im)
-            if len(a.shape)==0:
-                raise MemoryError("Too little memory to convert PIL image to array")
-            # Add
-            images.append(a)
+            fnames.append((nr, os.path.join(dirname, fname)))
     
-    # Done
-    return images
+    # Sort
+    fnames.sort()
+    return [fname for nr, fname in fnames]
+
+
+class ImageSequence(object):
+    """ ImageSequence(filenames, asNumpy=True, cacheSize=64, threads=0)
+    
+    A sequence of images that are read from the given files (a list of
+    filenames) when they are requested. Index it to get an image (a
+    numpy array, or a PIL image if asNumpy is False). The cacheSize
+    most recently used images are kept in memory.
+    
+    Iterating over the sequence reads the images in a pool of threads
+    (see imap()), without storing them in the cache.
+    
+    """
+    
+    def __init__(self, filenames, asNumpy=True, cacheSize=64, threads=0):
+        self._filenames = list(filenames)
+        self._read = _readNumpy if asNumpy else _readPil
+        self._cacheSize = cacheSize
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = threads
+    
+    
+    @property
+    def filenames(self):
+        """ The list of filenames of the images.
+        """
+        return self._filenames
+    
+    
+    def __len__(self):
+        return len(self._filenames)
+    
+    
+    def __getitem__(self, index):
+        
+        # Slice gives a list
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        # Check index
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ImageSequence index out of range.')
+        
+        # Get from cache, make it the most recently used
+        self._lock.acquire()
+        try:
+            im = self._cache.pop(index, None)
+            if im is not None:
+                self._cache[index] = im
+                return im
+        finally:
+            self._lock.release()
+        
+        # Read and store
+        im = self._read(self._filenames[index])
+        self._lock.acquire()
+        try:
+            self._cache[index] = im
+            while len(self._cache) > self._cacheSize:
+                self._cache.popitem(False)
+        finally:
+            self._lock.release()
+        return im
+    
+    
+    def __iter__(self):
+        return self.Iterate()
+    
+    
+    def Iterate(self, progress=None, maxInFlight=None):
+        """ Iterate(progress=None, maxInFlight=None)
+        
+        Generate the images in order, reading them in a pool of threads.
+        See imap() for the arguments.
+        
+        """
+        return imap(self._read, self._filenames, self._threads,
+                                                    maxInFlight, progress)
+    
+    
+    def ClearCache(self):
+        """ ClearCache()
+        
+        Remove all images from the cache.
+        
+        """
+        self._lock.acquire()
+        try:
+            self._cache.clear()
+        finally:
+            self._lock.release()
+
+
+def readIms(filename, asNumpy=True, lazy=False, threads=0, progress=None):
+    """ readIms(filename, asNumpy=True, lazy=False, threads=0, progress=None)
+    
+    Read images from a series of images in a single directory. Returns a
+    list of numpy arrays, or, if asNumpy is false, a list if PIL images.
+    
+    The images are decoded in threads, see imap() for the meaning of
+    threads and progress. If lazy is True, an ImageSequence is returned
+    instead, which reads the images when they are requested.
+    
+    """
+    
+    # Check PIL
+    if PIL is None:
+        raise RuntimeError("Need PIL to read a series of image files.")
+    
+    # Check Numpy
+    if asNumpy and np is None:
+        raise RuntimeError("Need Numpy to return numpy arrays.")
+    
+    # Get files
+    sequence = ImageSequence(getImageFilenames(filename), asNumpy,
+                                threads=threads)
+    if lazy:
+        return sequence
+    
+    # Read all
+    return list(sequence.Iterate(progress))
@@ -151,78 +151,108 @@ def checkImages(images):
 
 
 class BitArray:
-    """ Dynamic array of bits that automatically resizes
-    with factors of two.
-    Append bits using .Append() or +=
-    You can reverse bits using .Reverse()
+    """ BitArray(initvalue=None)
+
+    Array of bits, packed in a (Python) integer. Fields of a fixed
+    amount of bits are appended with AppendInt() or, for many values at
+    once, AppendInts(). Bits can also be appended as a string of 0's and
+    1's using .Append() or +=. You can reverse bits using .Reverse().
+    Use ToBytes() to get the bits as bytes (most significant bit first).
     """
 
     def __init__(self, initvalue=None):
-        self.data = np.zeros((16,), dtype=np.uint8)
+        self._value = 0
         self._len = 0
         if initvalue is not None:
             self.Append(initvalue)
 
     def __len__(self):
-        return self._len  # self.data.shape[0]
+        return self._len
 
     def __repr__(self):
-        return self.data[:self._len].tostring().decode('ascii')
-
-    def _checkSize(self):
-        # check length... grow if necessary
-        arraylen = self.data.shape[0]
-        if self._len >= arraylen:
-            tmp = np.zeros((arraylen*2,), dtype=np.uint8)
-            tmp[:self._len] = self.data[:self._len]
-            self.data = tmp
+        if not self._len:
+            return ''
+        return bin(self._value)[2:].rjust(self._len, '0')
 
     def __add__(self, value):
         self.Append(value)
         return self
 
     def Append(self, bits):
+        """ Append(bits)
+
+        Append a string of bits (e.g. '0110'), or a BitArray.
 
-        # check input
+        """
         if isinstance(bits, BitArray):
-            bits = str(bits)
-        if isinstance(bits, int):
-            bits = str(bits)
-        if not isinstance(bits, string_types):
+            self._value = (self._value << bits._len) | bits._value
+            self._len += bits._len
+        elif isinstance(bits, integer_types) and bits in (0, 1):
+            self.AppendInt(bits, 1)
+        elif isinstance(bits, string_types):
+            if bits:
+                self.AppendInt(int(bits, 2), len(bits))
+        else:
             raise ValueError("Append bits as strings or integers!")
 
-        # add bits
-        for bit in bits:
-            self.data[self._len] = ord(bit)
-            self._len += 1
-            self._checkSize()
+    def AppendInt(self, value, n, signed=False):
+        """ AppendInt(value, n, signed=False)
+
+        Append an integer as a field of n bits. If signed, negative
+        values are stored as their two's complement.
+
+        """
+        value = int(value)
+        if signed:
+            if not -(1 << (n - 1)) <= value < (1 << (n - 1)):
+                raise ValueError("Signed value does not fit in %i bits." % n)
+            value &= (1 << n) - 1
+        elif not 0 <= value < (1 << n):
+            raise ValueError("Value does not fit in %i bits." % n)
+        self._value = (self._value << n) | value
+        self._len += n
+
+    def AppendInts(self, values, n, signed=False):
+        """ AppendInts(values, n, signed=False)
+
+        Append a sequence of integers, each as a field of n bits.
+        For large amounts of values, the bits are packed using numpy.
+
+        """
+        if np is None or len(values) < 64:
+            for value in values:
+                self.AppendInt(value, n, signed)
+            return
+
+        # Check
+        values = np.asarray(values, np.int64).ravel()
+        if signed:
+            lo, hi = -(1 << (n - 1)), (1 << (n - 1))
+        else:
+            lo, hi = 0, (1 << n)
+        if values.min() < lo or values.max() >= hi:
+            raise ValueError("Values do not fit in %i bits." % n)
+
+        # Get bits (MSB first), pack them and turn into an integer
+        shifts = np.arange(n - 1, -1, -1, dtype=np.int64)
+        bits = ((values[:, None] >> shifts) & 1).astype(np.uint8).ravel()
+        nbits = bits.size
+        value = bytesToInt(np.packbits(bits).tobytes())
+        value >>= (-nbits) % 8 # remove padding of packbits
+        self._value = (self._value << nbits) | value
+        self._len += nbits
 
     def Reverse(self):
         """ In-place reverse. """
-        tmp = self.data[:self._len].copy()
-        self.data[:self._len] = np.flipud(tmp)
+        bits = str(self)[::-1]
+        self._value = int(bits, 2) if bits else 0
 
     def ToBytes(self):
         """ Convert to bytes. If necessary,
         zeros are padded to the end (right side).
         """
-        bits = str(self)
-
-        # determine number of bytes
-        nbytes = 0
-        while nbytes * 8 < len(bits):
-            nbytes += 1
-        # pad
-        bits = bits.ljust(nbytes * 8, '0')
-
-        # go from bits to bytes
-        bb = binary_type()
-        for i in range(nbytes):
-            tmp = int(bits[i * 8: (i + 1) * 8], 2)
-            bb += intToUint8(tmp)
-
-        # done
-        return bb
+        nbytes = (self._len + 7) // 8
+        return intToBytes(self._value << (nbytes * 8 - self._len), nbytes)
 
 
 if PY3:
@@ -234,6 +264,14 @@ if PY3:
 
     def intToUint8(i):
         return int(i).to_bytes(1, 'little')
+
+    def intToBytes(i, n):
+        """ Get an integer as n bytes (big endian). """
+        return int(i).to_bytes(n, 'big')
+
+    def bytesToInt(bb):
+        """ Get the integer of bytes (big endian). """
+        return int.from_bytes(bb, 'big')
 else:
     def intToUint32(i):
         number = int(i)
@@ -255,72 +293,65 @@ else:
     def intToUint8(i):
         return chr(int(i))
 
+    def intToBytes(i, n):
+        """ Get an integer as n bytes (big endian). """
+        if not n:
+            return ''
+        return ('%x' % i).rjust(n * 2, '0').decode('hex')
 
-def intToBits(i, n=None):
-    """ convert int to a string of bits (0's and 1's in a string),
-    pad to n elements. Convert back using int(ss,2). """
-    ii = i
+    def bytesToInt(bb):
+        """ Get the integer of bytes (big endian). """
+        if not bb:
+            return 0
+        return int(bb.encode('hex'), 16)
 
-    # make bits
-    bb = BitArray()
-    while ii > 0:
-        bb += str(ii % 2)
-        ii = ii >> 1
-    bb.Reverse()
 
-    # justify
-    if n is not None:
-        if len(bb) > n:
-            raise ValueError("intToBits fail: len larger than padlength.")
-        bb = str(bb).rjust(n, '0')
+def bitLength(i):
+    """ Get the number of bits needed to store the non-negative int i. """
+    return len(bin(i)) - 2 if i > 0 else 0
 
-    # done
-    return BitArray(bb)
 
+def signedBitLength(i):
+    """ Get the number of bits needed to store the int i as a signed
+    value (including the sign bit). """
+    if i < 0:
+        i = -i - 1 # -n is the bitwise opposite of n-1
+    return bitLength(i) + 1
 
-def bitsToInt(bb, n=8):
-    # Init
-    value = ''
 
-    # Get value in bits
-    for i in range(len(bb)):
-        b = bb[i:i+1]
-        tmp = bin(ord(b))[2:]
-        #value += tmp.rjust(8,'0')
-        value = tmp.rjust(8, '0') + value
+def intToBits(i, n=None):
+    """ convert int to a string of bits (0's and 1's in a string),
+    pad to n elements. Convert back using int(ss,2). """
+    i = int(i)
+    if n is None:
+        n = bitLength(i)
+    elif bitLength(i) > n:
+        raise ValueError("intToBits fail: len larger than padlength.")
+    bb = BitArray()
+    bb.AppendInt(i, n)
+    return bb
+
 
-    # Make decimal
-    return(int(value[:n], 2))
+def bitsToInt(bb, n=8):
+    """ Get the value of the first n bits of the given bytes, which are
+    read as a little endian number. """
+    value = bytesToInt(bb[::-1])
+    return value >> (8 * len(bb) - n)
 
 
 def getTypeAndLen(bb):
     """ bb should be 6 bytes at least
     Return (type, length, length_of_full_tag)
     """
-    # Init
-    value = ''
-
-    # Get first 16 bits
-    for i in range(2):
-        b = bb[i:i + 1]
-        tmp = bin(ord(b))[2:]
-        #value += tmp.rjust(8,'0')
-        value = tmp.rjust(8, '0') + value
-
-    # Get type and length
-    type = int(value[:10], 2)
-    L = int(value[10:], 2)
+    # Get type and length from the first 16 bits
+    value = bitsToInt(bb[:2], 16)
+    type = value >> 6
+    L = value & 63
     L2 = L + 2
 
     # Long tag header?
     if L == 63: # '111111'
-        value = ''
-        for i in range(2, 6):
-            b = bb[i:i + 1]  # becomes a single-byte bytes() on both PY3 and PY2
-            tmp = bin(ord(b))[2:]
-            #value += tmp.rjust(8,'0')
-            value = tmp.rjust(8, '0') + value
-        L = int(value, 2)
+        L = bitsToInt(bb[2:6], 32)
         L2 = L + 6
 
     # Done
@@ -332,33 +363,14 @@ def signedIntToBits(i, n=None):
     pad to n elements. Negative numbers are stored in 2's complement bit
     patterns, thus positive numbers always start with a 0.
     """
-
-    # negative number?
-    ii = i
-    if i < 0:
-        # A negative number, -n, is represented as the bitwise opposite of
-        ii = abs(ii) - 1  # the positive-zero number n-1.
-
-    # make bits
+    i = int(i)
+    if n is None:
+        n = signedBitLength(i)
+    elif signedBitLength(i) > n:
+        raise ValueError("signedIntToBits fail: len larger than padlength.")
     bb = BitArray()
-    while ii > 0:
-        bb += str(ii % 2)
-        ii = ii >> 1
-    bb.Reverse()
-
-    # justify
-    bb = '0' + str(bb) # always need the sign bit in front
-    if n is not None:
-        if len(bb) > n:
-            raise ValueError("signedIntToBits fail: len larger than padlength.")
-        bb = bb.rjust(n, '0')
-
-    # was it negative? (then opposite bits)
-    if i < 0:
-        bb = bb.replace('0', 'x').replace('1', '0').replace('x', '1')
-
-    # done
-    return BitArray(bb)
+    bb.AppendInt(i, n, True)
+    return bb
 
 
 def twitsToBits(arr):
@@ -368,19 +380,14 @@ def twitsToBits(arr):
     are twits.
     Can be used to make the RECT record.
     """
+    values = [int(i * 20) for i in arr]
 
-    # first determine length using non justified bit strings
-    maxlen = 1
-    for i in arr:
-        tmp = len(signedIntToBits(i*20))
-        if tmp > maxlen:
-            maxlen = tmp
+    # first determine length
+    maxlen = max([1] + [signedBitLength(i) for i in values])
 
     # build array
     bits = intToBits(maxlen, 5)
-    for i in arr:
-        bits += signedIntToBits(i * 20, maxlen)
-
+    bits.AppendInts(values, maxlen, True)
     return bits
 
 
@@ -396,8 +403,8 @@ def floatsToBits(arr):
             raise ValueError("Dit not implement negative floats!")
         i1 = int(i)
         i2 = i - i1
-        bits += intToBits(i1, 15)
-        bits += intToBits(i2 * 2 ** 16, 16)
+        bits.AppendInt(i1, 15)
+        bits.AppendInt(i2 * 2 ** 16, 16)
     return bits
 
 
@@ -430,13 +437,8 @@ class Tag:
         """ Calls processTag and attaches the header. """
         self.ProcessTag()
 
-        # tag to binary
-        bits = intToBits(self.tagtype, 10)
-
-        # complete header uint16 thing
-        bits += '1' * 6  # = 63 = 0x3f
-        # make uint16
-        bb = intToUint16(int(str(bits), 2))
+        # tag type (10 bits) and 63 (6 bits) to indicate a long header
+        bb = intToUint16((self.tagtype << 6) | 0x3f)
 
         # now add 32bit length descriptor
         bb += intToUint32(len(self.bytes))
@@ -452,26 +454,23 @@ class Tag:
 
     def MakeMatrixRecord(self, scale_xy=None, rot_xy=None, trans_xy=None):
 
-        # empty matrix?
-        if scale_xy is None and rot_xy is None and trans_xy is None:
-            return "0"*8
-
         # init
         bits = BitArray()
 
+        # empty matrix?
+        if scale_xy is None and rot_xy is None and trans_xy is None:
+            bits.AppendInt(0, 8)
+            return bits
+
         # scale
+        bits.AppendInt(bool(scale_xy), 1)
         if scale_xy:
-            bits += '1'
             bits += floatsToBits([scale_xy[0], scale_xy[1]])
-        else:
-            bits += '0'
 
         # rotation
+        bits.AppendInt(bool(rot_xy), 1)
         if rot_xy:
-            bits += '1'
             bits += floatsToBits([rot_xy[0], rot_xy[1]])
-        else:
-            bits += '0'
 
         # translation (no flag here)
         if trans_xy:
@@ -573,27 +572,23 @@ class BitmapTag(DefinitionTag):
         # more data is required for storing (25% or so, and less than 10%
         # when storing RGB as ARGB).
 
-        if len(im.shape) == 3:
-            if im.shape[2] in [3, 4]:
-                tmp = np.ones((im.shape[0], im.shape[1], 4),
-                              dtype=np.uint8) * 255
-                for i in range(3):
-                    tmp[:, :, i + 1] = im[:, :, i]
-                if im.shape[2] == 4:
-                    tmp[:, :, 0] = im[:, :, 3]  # swap channel where alpha is in
+        if len(im.shape) == 3 and im.shape[2] in [3, 4]:
+            tmp = np.empty((im.shape[0], im.shape[1], 4), dtype=np.uint8)
+            tmp[:, :, 1:] = im[:, :, :3]
+            if im.shape[2] == 4:
+                tmp[:, :, 0] = im[:, :, 3]  # swap channel where alpha is in
             else:
-                raise ValueError("Invalid shape to be an image.")
-
+                tmp[:, :, 0] = 255
         elif len(im.shape) == 2:
-            tmp = np.ones((im.shape[0], im.shape[1], 4), dtype=np.uint8)*255
-            for i in range(3):
-                tmp[:, :, i + 1] = im[:, :]
+            tmp = np.empty((im.shape[0], im.shape[1], 4), dtype=np.uint8)
+            tmp[:, :, 1:] = im[:, :, None]
+            tmp[:, :, 0] = 255
         else:
             raise ValueError("Invalid shape to be an image.")
 
         # we changed the image to uint8 4 channels.
         # now compress!
-        self._data = zlib.compress(tmp.tostring(), zlib.DEFLATED)
+        self._data = zlib.compress(tmp.tobytes(), zlib.DEFLATED)
         self.imshape = im.shape
 
     def ProcessTag(self):
@@ -705,21 +700,12 @@ class ShapeTag(DefinitionTag):
         # recognize the frames properly when importing to library.
 
         bits = BitArray()
-        bits += '0'  # TypeFlag (not an edge record)
-        bits += '0'  # StateNewStyles (only for DefineShape2 and Defineshape3)
-        if lineStyle:
-            bits += '1'  # StateLineStyle
-        else:
-            bits += '0'
-        if fillStyle:
-            bits += '1'  # StateFillStyle1
-        else:
-            bits += '0'
-        bits += '0'  # StateFillStyle0
-        if moveTo:
-            bits += '1'  # StateMoveTo
-        else:
-            bits += '0'
+        bits.AppendInt(0, 1)  # TypeFlag (not an edge record)
+        bits.AppendInt(0, 1)  # StateNewStyles (only for DefineShape2 and Defineshape3)
+        bits.AppendInt(bool(lineStyle), 1)  # StateLineStyle
+        bits.AppendInt(bool(fillStyle), 1)  # StateFillStyle1
+        bits.AppendInt(0, 1)  # StateFillStyle0
+        bits.AppendInt(bool(moveTo), 1)  # StateMoveTo
 
         # give information
         # todo: nbits for fillStyle and lineStyle is hard coded.
@@ -727,9 +713,9 @@ class ShapeTag(DefinitionTag):
         if moveTo:
             bits += twitsToBits([moveTo[0], moveTo[1]])
         if fillStyle:
-            bits += intToBits(fillStyle, 4)
+            bits.AppendInt(fillStyle, 4)
         if lineStyle:
-            bits += intToBits(lineStyle, 4)
+            bits.AppendInt(lineStyle, 4)
 
         return bits
         #return bitsToBytes(bits)
@@ -739,16 +725,14 @@ class ShapeTag(DefinitionTag):
             dxdy = dxdy[0]
 
         # determine required number of bits
-        xbits = signedIntToBits(dxdy[0] * 20)
-        ybits = signedIntToBits(dxdy[1] * 20)
-        nbits = max([len(xbits), len(ybits)])
+        dx, dy = int(dxdy[0] * 20), int(dxdy[1] * 20)
+        nbits = max(signedBitLength(dx), signedBitLength(dy), 2)
 
         bits = BitArray()
-        bits += '11'  # TypeFlag and StraightFlag
-        bits += intToBits(nbits-2, 4)
-        bits += '1'  # GeneralLineFlag
-        bits += signedIntToBits(dxdy[0] * 20, nbits)
-        bits += signedIntToBits(dxdy[1] * 20, nbits)
+        bits.AppendInt(3, 2)  # TypeFlag and StraightFlag
+        bits.AppendInt(nbits-2, 4)
+        bits.AppendInt(1, 1)  # GeneralLineFlag
+        bits.AppendInts([dx, dy], nbits, True)
 
         # note: I do not make use of vertical/horizontal only lines...
 
@@ -757,8 +741,8 @@ class ShapeTag(DefinitionTag):
 
     def MakeEndShapeRecord(self):
         bits = BitArray()
-        bits += "0"     # TypeFlag: no edge
-        bits += "0"*5   # EndOfShape
+        bits.AppendInt(0, 1)  # TypeFlag: no edge
+        bits.AppendInt(0, 5)  # EndOfShape
         return bits
         #return bitsToBytes(bits)
 
@@ -1013,3 +997,24 @@ def readSwf(filename, asNumpy=True):
 
     # Done
     return images
+
+
+if __name__ == '__main__':
+    # Benchmark exporting a 1000-frame movie
+    import tempfile
+    ims = [(np.random.rand(48, 64, 3) * 255).astype(np.uint8)
+           for i in range(10)] * 100
+    filename = os.path.join(tempfile.gettempdir(), 'benchmark.swf')
+
+    # The bit records of all frames (shape and place object tags)
+    t0 = time.time()
+    for i in range(len(ims)):
+        ShapeTag(1, (0, 0), (64, 48)).GetTag()
+        PlaceObjectTag(1, 2, move=i > 0).GetTag()
+    print('Bit records of 1000 frames: %1.3f s' % (time.time()-t0))
+
+    # Full export
+    t0 = time.time()
+    writeSwf(filename, ims, 0.1)
+    print('Writing 1000 frames to SWF: %1.3f s' % (time.time()-t0))
+    os.remove(filename)
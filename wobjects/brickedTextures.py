@@ -0,0 +1,627 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012, Almar Klein
+#
+# Visvis is distributed under the terms of the (new) BSD License.
+# The full license can be found in 'license.txt'.
+
+""" Module brickedTextures
+
+Defines the BrickedTexture3D wobject, which renders volumes that are too
+large to fit in OpenGl memory as a whole.
+
+The volume is divided in bricks of a fixed size. For each brick the
+minimum and maximum value is stored, so that bricks that would not be
+visible with the current clim or isoThreshold can be skipped. The
+remaining bricks are uploaded to OpenGl at full resolution when they
+are needed, and kept in a cache from which the least recently used
+bricks are removed when it is full. Because the bricks are read from
+the data only when they are needed, the volume can be a numpy memmap.
+
+"""
+
+import OpenGL.GL as gl
+
+import numpy as np
+
+from visvis.core import shaders
+from visvis.core.pyramid import Pyramid
+from visvis.wobjects.textures import Texture3D, TextureObjectToVisualize
+from visvis.wobjects.textures import createCubeQuads
+
+
+class BrickedVolume(object):
+    """ BrickedVolume(data, brickSize=128, border=1)
+    
+    Divides a 3D array in bricks of brickSize voxels in each dimension
+    and keeps an index with the minimum and maximum (finite) value of
+    each brick. Bricks are identified by their index (z,y,x) in the grid
+    of bricks.
+    
+    Each brick is extended with a border of voxels from its neighbours,
+    so that the bricks can be interpolated seamlessly. The min and max of
+    a brick include its border.
+    
+    The index is calculated one brick at a time, so that the full volume
+    is never loaded in memory at once.
+    
+    """
+    
+    def __init__(self, data, brickSize=128, border=1):
+        
+        # Check
+        if not isinstance(data, np.ndarray) or data.ndim not in (3, 4):
+            raise ValueError('BrickedVolume needs a 3D numpy array.')
+        
+        # Store
+        self._data = data
+        self._brickSize = max(1, int(brickSize))
+        self._border = max(0, int(border))
+        
+        # Calculate the number of bricks in each dimension
+        self._grid = tuple([ int(np.ceil(float(n) / self._brickSize))
+                                for n in data.shape[:3] ])
+        
+        # Calculate index
+        self._mins = np.zeros(self._grid, np.float64)
+        self._maxs = np.zeros(self._grid, np.float64)
+        for index in np.ndindex(*self._grid):
+            self._mins[index], self._maxs[index] = self._MinMax(index)
+    
+    
+    @property
+    def data(self):
+        """ Get the data that is divided in bricks.
+        """
+        return self._data
+    
+    @property
+    def grid(self):
+        """ Get the number of bricks in each dimension (z, y, x).
+        """
+        return self._grid
+    
+    @property
+    def mins(self):
+        """ Get an array with the minimum value for each brick.
+        Bricks without finite values have nan.
+        """
+        return self._mins
+    
+    @property
+    def maxs(self):
+        """ Get an array with the maximum value for each brick.
+        Bricks without finite values have nan.
+        """
+        return self._maxs
+    
+    
+    def _MinMax(self, index):
+        """ Get the min and max of the finite values in a brick.
+        """
+        lower, upper = self.GetPaddedRegion(index)
+        block = self._data[tuple([slice(i1,i2) for i1,i2 in zip(lower,upper)])]
+        block = np.asarray(block)
+        if block.dtype.kind == 'f':
+            block = block[np.isfinite(block)]
+        if not block.size:
+            return np.nan, np.nan
+        return float(block.min()), float(block.max())
+    
+    
+    def GetRegion(self, index):
+        """ GetRegion(index)
+        
+        Get the lower and upper voxel indices (z,y,x) of the given brick,
+        not including the border.
+        
+        """
+        lower = [i*self._brickSize for i in index]
+        upper = [min(i+self._brickSize, n)
+                    for i, n in zip(lower, self._data.shape)]
+        return tuple(lower), tuple(upper)
+    
+    
+    def GetPaddedRegion(self, index):
+        """ GetPaddedRegion(index)
+        
+        Get the lower and upper voxel indices (z,y,x) of the given brick,
+        including the border.
+        
+        """
+        lower, upper = self.GetRegion(index)
+        lower = [max(0, i-self._border) for i in lower]
+        upper = [min(i+self._border, n) for i, n in zip(upper, self._data.shape)]
+        return tuple(lower), tuple(upper)
+    
+    
+    def GetBrickData(self, index, level=0):
+        """ GetBrickData(index, level=0)
+        
+        Get the data of the given brick (including the border) as a
+        contiguous array. If the volume is a memmap, this reads the
+        brick from disk. If level is given, the brick is downsampled
+        level times by a factor of two.
+        
+        """
+        lower, upper = self.GetPaddedRegion(index)
+        slices = tuple([slice(i1,i2) for i1,i2 in zip(lower,upper)])
+        data = np.ascontiguousarray(self._data[slices])
+        if level:
+            data = Pyramid(data, 3).GetLevel(level)
+        return data
+    
+    
+    def GetNonEmptyBricks(self, threshold=None):
+        """ GetNonEmptyBricks(threshold=None)
+        
+        Get a list of the indices of the bricks that contain at least
+        one value larger than threshold. If threshold is None, returns all
+        bricks that have finite values.
+        
+        """
+        if threshold is None:
+            mask = np.isfinite(self._maxs)
+        else:
+            mask = self._maxs > threshold # nan gives False
+        return [tuple(int(i) for i in index) for index in np.argwhere(mask)]
+    
+    
+    def SortBricks(self, indices, modelView):
+        """ SortBricks(indices, modelView)
+        
+        Sort the given bricks from back to front, using the given 4x4
+        OpenGl modelview matrix (as obtained with glGetDoublev), which
+        maps voxel coordinates (x,y,z) to eye coordinates.
+        
+        """
+        if not indices:
+            return []
+        
+        # Get centers of the bricks in voxel coordinates (x,y,z,1)
+        centers = np.ones((len(indices), 4), np.float64)
+        for i, index in enumerate(indices):
+            lower, upper = self.GetRegion(index)
+            for j in range(3):
+                centers[i, 2-j] = 0.5 * (lower[j] + upper[j]) - 0.5
+        
+        # Calculate depth in eye coordinates. The camera looks in the
+        # negative z direction, so the most negative z is furthest away.
+        depth = np.dot(centers, np.asarray(modelView, np.float64))[:, 2]
+        return [indices[i] for i in np.argsort(depth, kind='mergesort')]
+
+
+class BrickCache(object):
+    """ BrickCache(maxBytes)
+    
+    A cache for the textures of bricks. If the total number of bytes of
+    the cached textures exceeds maxBytes, the least recently used
+    textures are removed from the cache, and from OpenGl memory.
+    
+    """
+    
+    def __init__(self, maxBytes):
+        self._maxBytes = int(maxBytes)
+        self._textures = {} # key -> (texture, nbytes)
+        self._lastUsed = {} # key -> counter value when last used
+        self._counter = 0
+        self._nbytes = 0
+    
+    
+    def __len__(self):
+        return len(self._textures)
+    
+    def __contains__(self, key):
+        return key in self._textures
+    
+    @property
+    def nbytes(self):
+        """ Get the number of bytes of the textures in the cache.
+        """
+        return self._nbytes
+    
+    @property
+    def textures(self):
+        """ Get a list of the textures in the cache.
+        """
+        return [texture for texture, nbytes in self._textures.values()]
+    
+    
+    def _Touch(self, key):
+        self._counter += 1
+        self._lastUsed[key] = self._counter
+    
+    
+    def Get(self, key):
+        """ Get(key)
+        
+        Get the texture for the given key and mark it as most recently
+        used. Returns None if the key is not in the cache.
+        
+        """
+        item = self._textures.get(key, None)
+        if item is None:
+            return None
+        self._Touch(key)
+        return item[0]
+    
+    
+    def Add(self, key, texture, nbytes):
+        """ Add(key, texture, nbytes)
+        
+        Add a texture to the cache. Least recently used textures are
+        removed to make room for it. The new texture itself is never
+        removed, even if it is larger than the cache.
+        
+        """
+        self.Remove(key)
+        self._textures[key] = texture, nbytes
+        self._nbytes += nbytes
+        self._Touch(key)
+        while self._nbytes > self._maxBytes and len(self._textures) > 1:
+            lastUsed = self._lastUsed
+            self.Remove(min(lastUsed, key=lambda k: lastUsed[k]))
+    
+    
+    def Remove(self, key):
+        """ Remove(key)
+        
+        Remove the texture for the given key from the cache and destroy it.
+        
+        """
+        item = self._textures.pop(key, None)
+        if item is not None:
+            texture, nbytes = item
+            self._lastUsed.pop(key)
+            self._nbytes -= nbytes
+            texture.Destroy()
+    
+    
+    def Clear(self):
+        """ Clear()
+        
+        Remove all textures from the cache.
+        
+        """
+        for key in list(self._textures.keys()):
+            self.Remove(key)
+
+
+class BrickTextureObject(TextureObjectToVisualize):
+    """ BrickTextureObject(climRef=None)
+    
+    A texture object for the bricks of a BrickedTexture3D. All bricks
+    share the climRef of the volume, so that they are scaled the same
+    way when uploaded. The min and max are not calculated from the data.
+    
+    """
+    
+    def __init__(self, climRef=None):
+        TextureObjectToVisualize.__init__(self, 3, np.zeros((1,1,1), np.uint8))
+        if climRef is not None:
+            self._climRef = climRef
+            self._clim = climRef.Copy()
+
+
+class BrickedTexture3D(Texture3D):
+    """ BrickedTexture3D(parent, data, renderStyle='mip', brickSize=128,
+                                                        cacheSize=512)
+    
+    A Texture3D for volumes that are too large to be uploaded to OpenGl
+    as a whole (in which case Texture3D would downsample the data). The
+    data is divided in bricks of brickSize voxels in each dimension, which
+    are rendered at full resolution.
+    
+    Bricks that are empty for the current clim (or isoThreshold for the
+    iso render style) are not drawn. The other bricks are uploaded when
+    they are needed, and kept in OpenGl memory until the cache (of
+    cacheSize MiB) is full, at which point the least recently used bricks
+    are removed. The data can be a numpy memmap, since bricks are read
+    from it when they are uploaded. During interaction, bricks that are
+    not in the cache are uploaded at half the resolution.
+    
+    Notes
+    =====
+    With the MIP render style, the bricks are combined by taking the
+    maximum color, which gives the same result as Texture3D for colormaps
+    in which the colors increase with the value (such as the default
+    grayscale colormap). For the ray render styles, bricks are only
+    skipped if the lowest color in the colormap is fully transparent.
+    Volumes with RGB(A) data are never skipped.
+    
+    """
+    
+    def __init__(self, parent, data, renderStyle='mip', brickSize=128,
+                                                        cacheSize=512):
+        
+        # Init bricks (the index is calculated in _SetData)
+        self._bricks = None
+        self._brickSize = int(brickSize)
+        self._brickCache = BrickCache(cacheSize * 2**20)
+        self._brickQuads = {}
+        self._currentBrick = None
+        self._currentIndex = None
+        
+        # Init as Texture3D
+        Texture3D.__init__(self, parent, data, renderStyle)
+    
+    
+    def _CreateTexture(self, data):
+        """ The volume texture is never uploaded; it only holds a
+        reference to the data and the clim, which are shared by the bricks.
+        """
+        return BrickTextureObject()
+    
+    
+    def _InitShader(self):
+        Texture3D._InitShader(self)
+        
+        # The shape and extent are those of the brick being drawn
+        def uniform_shape():
+            shape = self._currentBrick._shape[:3] # as in opengl
+            return [float(s) for s in reversed(list(shape))]
+        def uniform_extent():
+            data = self._texture1._dataRef
+            lower, upper = self._bricks.GetPaddedRegion(self._currentIndex)
+            shape = [i2-i1 for i1, i2 in reversed(list(zip(lower, upper)))]
+            if hasattr(data, 'sampling'):
+                sampling = reversed(data.sampling[:3])
+            else:
+                sampling = [1.0 for s in range(3)]
+            del data
+            return [s1*s2 for s1, s2 in zip(shape, sampling)]
+        
+        self.shader.SetStaticUniform('shape', uniform_shape)
+        self.shader.SetStaticUniform('extent', uniform_extent)
+        
+        # Empty bricks are skipped, but not the empty space within bricks.
+        # The sampler must still refer to a 3D texture.
+        self.shader.SetStaticUniform('occupancy', lambda: self._currentBrick)
+        self.shader.SetStaticUniform('occupancyShape', [1.0, 1.0, 1.0])
+        self.shader.SetStaticUniform('cellScale', [1.0, 1.0, 1.0])
+        self.shader.SetStaticUniform('emptyThreshold', -1.0)
+    
+    
+    def _SetData(self, data):
+        """ Calculate the index of the bricks, and remove all bricks
+        from the cache, so they are uploaded again when needed.
+        """
+        
+        # Calculate index
+        first = self._bricks is None
+        self._bricks = BrickedVolume(data, self._brickSize)
+        
+        # Set the clim to the range of the data the first time
+        if first:
+            mins, maxs = self._bricks.mins, self._bricks.maxs
+            if np.isfinite(mins).any():
+                mima = np.nanmin(mins), np.nanmax(maxs)
+            else:
+                mima = 0, 1
+            self._texture1._climRef.Set(*mima)
+            self._texture1._clim.Set(*mima)
+        
+        # Store data reference and clear bricks
+        self._texture1.SetData(data)
+        self._brickCache.Clear()
+        self._brickQuads = {}
+    
+    
+    def SetClim(self, *mima):
+        """ SetClim(min, max)
+        
+        Set the contrast limits. Different than the property clim, this
+        re-uploads the bricks using different transfer functions. If no
+        limits are given, the range of the data is used (obtained from
+        the index of the bricks).
+        
+        """
+        if len(mima)==0:
+            mins, maxs = self._bricks.mins, self._bricks.maxs
+            if not np.isfinite(mins).any():
+                return
+            mima = np.nanmin(mins), np.nanmax(maxs)
+        Texture3D.SetClim(self, *mima)
+    
+    
+    @property
+    def bricks(self):
+        """ Get the BrickedVolume object that holds the bricks and
+        their index.
+        """
+        return self._bricks
+    
+    
+    def _GetBrickTexture(self, index, fast=False):
+        """ Get the texture for the given brick, creating it if needed.
+        In fast mode, a brick at half the resolution is used if the brick
+        is not yet in the cache, which is 8 times faster to upload.
+        """
+        level = 0
+        if fast and (index, 0) not in self._brickCache:
+            level = 1
+        texture = self._brickCache.Get((index, level))
+        if texture is None:
+            data = self._bricks.GetBrickData(index, level)
+            texture = BrickTextureObject(self._texture1._climRef)
+            texture._interpolate = self._texture1._interpolate
+            texture.SetData(data)
+            self._brickCache.Add((index, level), texture, data.nbytes)
+        return texture
+    
+    
+    def _SyncBricks(self):
+        """ If the clim or interpolation of the volume was changed, the
+        bricks in the cache should be uploaded again.
+        """
+        if self._texture1._uploadFlag > 0:
+            for texture in self._brickCache.textures:
+                texture._interpolate = self._texture1._interpolate
+                texture._uploadFlag = abs(texture._uploadFlag)
+            self._texture1._uploadFlag = -1
+    
+    
+    def OnDrawShape(self, clr):
+        # Implementation of the OnDrawShape method.
+        gl.glColor(clr[0], clr[1], clr[2], 1.0)
+        for index in self._bricks.GetNonEmptyBricks(self._GetEmptyThreshold()):
+            self._DrawBrickQuads(index)
+    
+    
+    def OnDraw(self, fast=False):
+        # Draw the bricks.
+        
+        # Get axes
+        axes = self.GetAxes()
+        if not axes:
+            return
+        
+        # Get bricks to draw, back to front
+        self._SyncBricks()
+        indices = self._bricks.GetNonEmptyBricks(self._GetEmptyThreshold())
+        modelView = gl.glGetDoublev(gl.GL_MODELVIEW_MATRIX)
+        indices = self._bricks.SortBricks(indices, modelView)
+        
+        # Prepare by setting things to their defaults. This might release some
+        # memory so result in a bigger chance that the shader is run in
+        # hardware mode. On ATI, the line and point smoothing should be off
+        # if you want to use gl_FragCoord. (Yeah, I do not see the connection
+        # either...)
+        gl.glPointSize(1)
+        gl.glLineWidth(1)
+        gl.glDisable(gl.GL_LINE_STIPPLE)
+        gl.glDisable(gl.GL_LINE_SMOOTH)
+        gl.glDisable(gl.GL_POINT_SMOOTH)
+        
+        # only draw front-facing parts
+        gl.glEnable(gl.GL_CULL_FACE)
+        gl.glCullFace(gl.GL_BACK)
+        
+        # Set step ratio
+        if fast:
+            self.shader.SetUniform('stepRatio', self._stepRatio*0.5)
+        else:
+            self.shader.SetUniform('stepRatio', float(self._stepRatio))
+        
+        # Set right number of lights, or disabled light stuff
+        if self.shader.fragment.HasPart('litvoxel'):
+            self._EnsureRightNumberOfLights(axes, self.shader)
+        else:
+            self.shader.vertex.AddOrReplace(shaders.SH_NLIGHTS_0)
+            self.shader.fragment.AddOrReplace(shaders.SH_NLIGHTS_0)
+        
+        # For MIP, the bricks are combined by taking the maximum. The
+        # footprint of the volume is first filled with the lowest color,
+        # which is what the skipped bricks would have produced.
+        isMip = self.renderStyle.replace('rgb','').replace('color','') == 'mip'
+        if isMip:
+            self._DrawFootprint()
+            gl.glBlendEquation(gl.GL_MAX)
+        
+        # Draw the bricks
+        for index in indices:
+            
+            # Enable texture, so that it has a corresponding OpenGl texture.
+            # Binding is done by the shader
+            texture = self._GetBrickTexture(index, fast)
+            texture.Enable(-1) # -1 means do not bind right now
+            if not texture._shape:
+                continue
+            self._currentBrick, self._currentIndex = texture, index
+            self.shader.SetUniform('texture', texture)
+            
+            if self.shader.isUsable and self.shader.hasCode:
+                # turn glsl shader on
+                ok = self.shader.Enable()
+                if (not ok) and (self.renderStyle != 'mip'):
+                    print('Texture3D detected shader problem; ' +
+                        'reverting render style from %s to MIP.' % self.renderStyle)
+                    self.renderStyle = 'mip'
+                    self.shader.Enable()
+            else:
+                # Fixed function pipeline, but does not make sense
+                self.shader.EnableTextureOnly('texture')
+            
+            # do the actual drawing
+            self._DrawBrickQuads(index)
+            self.shader.Disable()
+        
+        # clean up
+        self._currentBrick = None
+        if isMip:
+            gl.glBlendEquation(gl.GL_FUNC_ADD)
+        gl.glFlush()
+        #
+        gl.glDisable(gl.GL_CULL_FACE)
+        gl.glEnable(gl.GL_LINE_SMOOTH)
+        gl.glEnable(gl.GL_POINT_SMOOTH)
+    
+    
+    def _DrawFootprint(self):
+        """ Fill the area covered by the volume with the lowest color
+        of the colormap, without writing to the depth buffer.
+        """
+        colormap = self._colormap.GetData()
+        if colormap is None or colormap[0, 3] < 0.1:
+            return # The shader would discard these fragments
+        
+        # Get quads of the whole volume
+        axes = self.GetAxes()
+        if (    (not self._quads) or
+                (self._daspectStored != axes.daspect) or
+                (self._qcountStored != self._quadPartitionCount(axes.camera))
+            ):
+            self._CreateQuads()
+        
+        # Draw
+        gl.glColor(*[float(c) for c in colormap[0]])
+        gl.glDepthMask(False)
+        self._DrawQuadArrays(*self._quads)
+        gl.glDepthMask(True)
+    
+    
+    def _DrawBrickQuads(self, index):
+        """ Draw the quads of a single brick.
+        """
+        
+        # Get axes
+        axes = self.GetAxes()
+        if not axes:
+            return
+        
+        # Should we recreate the quads?
+        qcount = self._quadPartitionCount(axes.camera)
+        if (self._daspectStored != axes.daspect) or (self._qcountStored != qcount):
+            self._brickQuads = {}
+            self._quads = None
+            self._daspectStored = axes.daspect
+            self._qcountStored = qcount
+        
+        # Create quads for this brick?
+        if index not in self._brickQuads:
+            lower, upper = self._bricks.GetRegion(index)
+            plower, pupper = self._bricks.GetPaddedRegion(index)
+            # The box spans the brick without its border; the texture
+            # coordinates are such that the border is not drawn.
+            v0 = [i-0.5 for i in reversed(lower)]
+            v1 = [i-0.5 for i in reversed(upper)]
+            t0, t1 = [], []
+            for i1, i2, p1, p2 in reversed(list(zip(lower, upper, plower, pupper))):
+                t0.append( float(i1-p1) / (p2-p1) )
+                t1.append( float(i2-p1) / (p2-p1) )
+            self._brickQuads[index] = createCubeQuads(v0, v1, t0, t1, qcount)
+        
+        # Draw
+        self._DrawQuadArrays(*self._brickQuads[index])
+    
+    
+    def OnDestroyGl(self):
+        # Clean up OpenGl resources.
+        Texture3D.OnDestroyGl(self)
+        for texture in self._brickCache.textures:
+            texture.DestroyGl()
+    
+    
+    def OnDestroy(self):
+        # Clean up any resources.
+        Texture3D.OnDestroy(self)
+        self._brickCache.Clear()
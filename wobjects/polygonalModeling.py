@@ -21,6 +21,7 @@ from visvis import Wobject, Colormapable, OrientationForWobjects_mixClass
 from visvis.core.light import _testColor, _getColor
 from visvis.wobjects.textures import TextureObjectToVisualize
 from visvis.core import shaders
+from visvis.core.baseBuffer import BufferObject
 from visvis.wobjects.textures import minmax
 
 
@@ -60,6 +61,52 @@ def checkDimsOfArray(value, *ndims):
         return value.astype(np.float32)
 
 
+def getProjectedSize(bounds, modelview, projection, viewport):
+    """ getProjectedSize(bounds, modelview, projection, viewport)
+    
+    Get the size in pixels (along the largest screen dimension) of the
+    box defined by bounds (a tuple of two 3-element arrays), given the
+    OpenGL modelview and projection matrices and the viewport. Returns
+    None if the box is (partly) behind the camera.
+    
+    """
+    # Get the eight corners of the box in homogeneous coordinates
+    (x1, y1, z1), (x2, y2, z2) = bounds
+    corners = np.array([(x, y, z, 1.0) for x in (x1, x2)
+                                       for y in (y1, y2)
+                                       for z in (z1, z2)])
+    # Transform. OpenGL matrices are column-major, hence the order.
+    clip = np.dot(np.dot(corners, np.asarray(modelview).reshape(4,4)),
+                  np.asarray(projection).reshape(4,4))
+    w = clip[:,3]
+    if not (w > 0).all():
+        return None
+    ndc = clip[:,:2] / w.reshape(-1,1)
+    # Get size in pixels
+    size = (ndc.max(0) - ndc.min(0)) * 0.5 * np.asarray(viewport[2:4])
+    return float(size.max())
+
+
+def selectLevelOfDetail(levels, size, default=None, pixelsPerCell=2.0):
+    """ selectLevelOfDetail(levels, size, default=None, pixelsPerCell=2.0)
+    
+    Select from a list of (gridSize, mesh) tuples (sorted from fine to
+    coarse) the coarsest mesh for which the grid cells are at most
+    pixelsPerCell pixels wide when the mesh is size pixels large on screen.
+    Returns default if none of the levels is fine enough, or if size is None.
+    
+    """
+    selected = default
+    if size is None:
+        return selected
+    for gridSize, level in levels:
+        if gridSize * pixelsPerCell >= size:
+            selected = level
+        else:
+            break
+    return selected
+
+
 class BaseMesh(object):
     """ BaseMesh(vertices, faces=None, normals=None, values=None,
                                                             verticesPerFace=3)
@@ -458,6 +505,15 @@ class Mesh(Wobject, BaseMesh, Colormapable):
         # Init flat normals
         self._flatNormals = None
         
+        # Init levels of detail (created when needed)
+        self._lod = False
+        self._lodLevels = None
+        self._lodBounds = None
+        self._drawFast = False
+        
+        # Buffers to keep the arrays in OpenGl memory, see _GetBuffer()
+        self._buffers = {}
+        
         # Create colormap and init texture
         Colormapable.__init__(self)
         self._texture = None
@@ -780,6 +836,22 @@ class Mesh(Wobject, BaseMesh, Colormapable):
                 raise ValueError('Invalid value for cullFaces')
         return locals()
     
+    @PropWithDraw
+    def lod():
+        """ Get/Set whether to use levels of detail (default False). If True,
+        simplified versions of the mesh are created (using vertex clustering,
+        see processing.decimateMesh), and on each draw the coarsest level is
+        used that still has about one vertex per two pixels on screen.
+        While interacting (e.g. rotating the camera) the coarsest level is
+        used. The levels are recreated when the mesh data changes.
+        """
+        def fget(self):
+            return self._lod
+        def fset(self, value):
+            self._lod = bool(value)
+            self._ResetLevelsOfDetail()
+        return locals()
+    
     @property
     def faceShader(self):
         """ Get the shader object for the faces. This can
@@ -807,6 +879,28 @@ class Mesh(Wobject, BaseMesh, Colormapable):
     
     ## Setters
     
+    def SetVertices(self, vertices):
+        BaseMesh.SetVertices(self, vertices)
+        self._SetBuffersDirty('vertices')
+    SetVertices.__doc__ = BaseMesh.SetVertices.__doc__
+    
+    def SetNormals(self, normals):
+        BaseMesh.SetNormals(self, normals)
+        self._flatNormals = None # Derived from the normals
+        self._SetBuffersDirty('normals')
+        self._SetBuffersDirty('flatNormals')
+    SetNormals.__doc__ = BaseMesh.SetNormals.__doc__
+    
+    def SetFaces(self, faces):
+        BaseMesh.SetFaces(self, faces)
+        self._SetBuffersDirty('faces')
+    SetFaces.__doc__ = BaseMesh.SetFaces.__doc__
+    
+    def SetValues(self, values, setClim=False):
+        BaseMesh.SetValues(self, values, setClim)
+        self._SetBuffersDirty('values')
+    SetValues.__doc__ = BaseMesh.SetValues.__doc__
+    
     
     @DrawAfter
     def SetTexture(self, data):
@@ -836,14 +930,151 @@ class Mesh(Wobject, BaseMesh, Colormapable):
     def _SetClim(self, value):
         self._clim = value
         if self._values is not None:
-            if value.min==0 and value.max==1:
-                self._values2 = self._values
+            self._values2 = self._ApplyClim(self._values)
+        for gridSize, level in self._lodLevels or []:
+            if level._values is not None:
+                level._values2 = self._ApplyClim(level._values)
+    
+    def _ApplyClim(self, values):
+        value = self._clim
+        if value.min==0 and value.max==1:
+            return values
+        else:
+            if value.range == 0:
+                scale = 1.0
+            else:
+                scale = 1.0/(value.range)
+            return (values - value.min) * scale
+    
+    
+    ## Buffers
+    
+    def _GetBuffer(self, mesh, name, data, target=None):
+        """ _GetBuffer(mesh, name, data, target=None)
+        
+        Get the BufferObject for the given array of the given mesh (self
+        or a level of detail), and set its data. The data is only
+        uploaded if it is a different array than last time, or if it has
+        been marked dirty by one of the setters.
+        
+        """
+        key = id(mesh), name
+        buffer = self._buffers.get(key, None)
+        if buffer is None:
+            if target is None:
+                buffer = BufferObject(gl.GL_ARRAY_BUFFER, np.float32)
             else:
-                if value.range == 0:
-                    scale = 1.0
+                buffer = BufferObject(target)
+            self._buffers[key] = buffer
+        buffer.SetData(data)
+        return buffer
+    
+    
+    def _SetBuffersDirty(self, name):
+        """ _SetBuffersDirty(name)
+        
+        Mark the buffer of the given array dirty, so that changes made in
+        place are uploaded. Because the levels of detail are derived from
+        the mesh, these are reset, and their buffers are removed.
+        
+        """
+        if not hasattr(self, '_buffers'):
+            return # Called during initialization
+        for key, buffer in self._buffers.items():
+            if key[0] == id(self) and key[1] == name:
+                buffer.SetDirty()
+        self._ResetLevelsOfDetail()
+    
+    
+    def _ResetLevelsOfDetail(self):
+        """ _ResetLevelsOfDetail()
+        
+        Remove the levels of detail, and destroy their buffers. The
+        levels are created again when they are needed.
+        
+        """
+        for key in list(self._buffers.keys()):
+            if key[0] != id(self):
+                self._buffers.pop(key).Destroy()
+        self._lodLevels = None
+    
+    
+    ## Levels of detail
+    
+    def _CreateLevelsOfDetail(self, minFaces=100, maxLevels=6):
+        """ _CreateLevelsOfDetail(minFaces=100, maxLevels=6)
+        
+        Create the simplified versions of this mesh. Each level is
+        created from the previous level, using a grid that is twice as
+        coarse. Levels that do not reduce the number of faces by at
+        least a factor two are skipped.
+        
+        """
+        
+        self._lodLevels = levels = []
+        if self._vertices is None or not len(self._vertices):
+            return
+        
+        # Get bounding box (used to calculate the size on screen)
+        self._lodBounds = ( np.nanmin(self._vertices, 0),
+                            np.nanmax(self._vertices, 0) )
+        
+        # Start with a grid that has about as many cells per dimension
+        # as a surface with this amount of faces has vertices.
+        mesh = self
+        nfaces = len(self._GetFaces())
+        gridSize = 2 ** int(np.ceil(np.log2(max(nfaces, 1)**0.5)))
+        
+        while gridSize >= 2 and len(levels) < maxLevels:
+            level = processing.decimateMesh(mesh, gridSize)
+            n = len(level._GetFaces())
+            if n < minFaces:
+                break
+            elif n < 0.5 * nfaces:
+                if level._values is not None:
+                    level._values2 = self._ApplyClim(level._values)
                 else:
-                    scale = 1.0/(value.range)
-                self._values2 = (self._values - value.min) * scale
+                    level._values2 = None
+                level._flatNormals = None
+                levels.append((gridSize, level))
+                mesh, nfaces = level, n
+            gridSize //= 2
+    
+    
+    def _SelectLevelOfDetail(self):
+        """ _SelectLevelOfDetail()
+        
+        Get the mesh to draw: self, or one of the levels of detail.
+        
+        """
+        
+        if not self._lod:
+            return self
+        if self._lodLevels is None:
+            self._CreateLevelsOfDetail()
+        if not self._lodLevels:
+            return self
+        
+        # While interacting, use the coarsest level
+        if self._drawFast:
+            return self._lodLevels[-1][1]
+        
+        # Get size on screen
+        modelview = gl.glGetDoublev(gl.GL_MODELVIEW_MATRIX)
+        projection = gl.glGetDoublev(gl.GL_PROJECTION_MATRIX)
+        viewport = gl.glGetIntegerv(gl.GL_VIEWPORT)
+        size = getProjectedSize(self._lodBounds, modelview, projection, viewport)
+        
+        # Select level
+        return selectLevelOfDetail(self._lodLevels, size, self)
+    
+    
+    def OnDrawFast(self):
+        self._drawFast = True
+        try:
+            self.OnDraw()
+        finally:
+            self._drawFast = False
     
     
     ## Method implementations to function as a proper wobject
@@ -875,6 +1106,8 @@ class Mesh(Wobject, BaseMesh, Colormapable):
     
     def OnDestroyGl(self):
         # Clean up OpenGl resources.
+        for buffer in self._buffers.values():
+            buffer.DestroyGl()
         self._faceShader.DestroyGl()
         self._edgeShader.DestroyGl()
         self._shapeShader.DestroyGl()
@@ -885,6 +1118,9 @@ class Mesh(Wobject, BaseMesh, Colormapable):
     
     def OnDestroy(self):
         # Clean up any resources.
+        for buffer in self._buffers.values():
+            buffer.Destroy()
+        self._buffers = {}
         self._faceShader.Destroy()
         self._edgeShader.Destroy()
         self._shapeShader.Destroy()
@@ -895,6 +1131,9 @@ class Mesh(Wobject, BaseMesh, Colormapable):
     
     def OnDraw(self):
         
+        # Select what to draw
+        mesh = self._SelectLevelOfDetail()
+        
         # Draw faces
         if self._faceShading:
             
@@ -905,76 +1144,89 @@ class Mesh(Wobject, BaseMesh, Colormapable):
                 gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_LINE)
                 gl.glLineWidth(3.5)
                 clr = 0.0, 0.0, 0.0
-                self._Draw('plain', clr, self.shapeShader)
+                self._Draw('plain', clr, self.shapeShader, mesh)
                 gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
                 gl.glDepthMask(True)
             if True:
                 # Draw faces normally
-                self._Draw(self._faceShading, self._faceColor, self.faceShader)
+                self._Draw(self._faceShading, self._faceColor, self.faceShader, mesh)
         
         # Draw edges
         if self._edgeShading:
             gl.glDepthFunc(gl.GL_LEQUAL)
             gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_LINE)
             #
-            self._Draw(self._edgeShading, self._edgeColor, self.edgeShader)
+            self._Draw(self._edgeShading, self._edgeColor, self.edgeShader, mesh)
             #
             gl.glDepthFunc(gl.GL_LESS)
             gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
     
     
     def OnDrawShape(self, color):
-        self._Draw('plain', color, self.shapeShader)
+        self._Draw('plain', color, self.shapeShader, self._SelectLevelOfDetail())
     
     
-    def _Draw(self, shading, refColor, shader):
+    def _Draw(self, shading, refColor, shader, mesh=None):
         """ The actual drawing. Used for drawing faces, lines, and shape.
+        The mesh to draw can be self or one of the levels of detail.
         """
         
+        if mesh is None:
+            mesh = self
+        
         # Need vertices
-        if self._vertices is None:
+        if mesh._vertices is None:
             return
         
         # Prepare normals
         if shading != 'plain':
             # Need normals
-            if self._normals is None:
-                processing.calculateNormals(self)
-            # Do we need flat normals?
+            if mesh._normals is None:
+                processing.calculateNormals(mesh)
+            # Do we need flat normals? (These have their own buffer, so
+            # that faces and edges can use different shading.)
             if shading == 'flat':
-                if self._flatNormals is None:
-                    processing.calculateFlatNormals(self)
-                normals = self._flatNormals
+                if mesh._flatNormals is None:
+                    processing.calculateFlatNormals(mesh)
+                normals, name = mesh._flatNormals, 'flatNormals'
             else:
-                normals = self._normals
+                normals, name = mesh._normals, 'normals'
             #
+            buffer = self._GetBuffer(mesh, name, normals)
             gl.glEnableClientState(gl.GL_NORMAL_ARRAY)
-            gl.glNormalPointerf(normals)
+            gl.glNormalPointer(gl.GL_FLOAT, 0, buffer.Enable())
+            buffer.Disable()
         
         # Prepare vertices (in the code above the vertex array can be updated)
+        buffer = self._GetBuffer(mesh, 'vertices', mesh._vertices)
         gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glVertexPointerf(self._vertices)
+        gl.glVertexPointer(3, gl.GL_FLOAT, 0, buffer.Enable())
+        buffer.Disable()
         
         # Prepare colormap indices, texture cords or colors (if available)
         # useTexCords = False
         SH_ALBEIDO = shaders.SH_MF_ALBEIDO_UNIT
-        if self._values is not None:
-            values = values2 = self._values
-            if self._values2 is not None:
-                values2 = self._values2
+        if mesh._values is not None:
+            values = values2 = mesh._values
+            if mesh._values2 is not None:
+                values2 = mesh._values2
             if values.shape[1] == 1:
                 # Colormap: use values2
                 values = values2
                 # useTexCords = True
+                buffer = self._GetBuffer(mesh, 'values', values)
                 gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
-                gl.glTexCoordPointer(1, gl.GL_FLOAT, 0, values)
+                gl.glTexCoordPointer(1, gl.GL_FLOAT, 0, buffer.Enable())
+                buffer.Disable()
                 shader.SetUniform('colormap', self._colormap)
                 SH_ALBEIDO = shaders.SH_MF_ALBEIDO_LUT1
             elif values.shape[1] == 2 and self._texture is not None:
                 # texcords, use original values
                 # useTexCords = True
+                buffer = self._GetBuffer(mesh, 'values', values)
                 gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
-                gl.glTexCoordPointerf(values)
+                gl.glTexCoordPointer(2, gl.GL_FLOAT, 0, buffer.Enable())
+                buffer.Disable()
                 shader.SetUniform('texture', self._texture)
                 SH_ALBEIDO = shaders.SH_MF_ALBEIDO_LUT2
             elif values.shape[1] in [3,4]:
@@ -983,8 +1235,11 @@ class Mesh(Wobject, BaseMesh, Colormapable):
                 gl.glEnable(gl.GL_COLOR_MATERIAL)
                 gl.glColorMaterial(gl.GL_FRONT_AND_BACK,
                                     gl.GL_AMBIENT_AND_DIFFUSE)
+                buffer = self._GetBuffer(mesh, 'values', values)
                 gl.glEnableClientState(gl.GL_COLOR_ARRAY)
-                gl.glColorPointerf(values)
+                gl.glColorPointer(values.shape[1], gl.GL_FLOAT, 0,
+                                                        buffer.Enable())
+                buffer.Disable()
                 if values.shape[1] == 3:
                     SH_ALBEIDO = shaders.SH_MF_ALBEIDO_RGB
                 else:
@@ -1050,20 +1305,23 @@ class Mesh(Wobject, BaseMesh, Colormapable):
                 shader.EnableTextureOnly('texture')
         
         # Draw
-        type = {3:gl.GL_TRIANGLES, 4:gl.GL_QUADS}[self._verticesPerFace]
-        if self._faces is None:
-            gl.glDrawArrays(type, 0, self._vertices.shape[0])
+        type = {3:gl.GL_TRIANGLES, 4:gl.GL_QUADS}[mesh._verticesPerFace]
+        if mesh._faces is None:
+            gl.glDrawArrays(type, 0, mesh._vertices.shape[0])
         else:
             # Get data type
-            if self._faces.dtype == np.uint8:
+            if mesh._faces.dtype == np.uint8:
                 face_dtype = gl.GL_UNSIGNED_BYTE
-            elif self._faces.dtype == np.uint16:
+            elif mesh._faces.dtype == np.uint16:
                 face_dtype = gl.GL_UNSIGNED_SHORT
             else:
                 face_dtype = gl.GL_UNSIGNED_INT
             # Go
-            N = self._faces.size
-            gl.glDrawElements(type, N, face_dtype, self._faces)
+            N = mesh._faces.size
+            buffer = self._GetBuffer(mesh, 'faces', mesh._faces,
+                                        gl.GL_ELEMENT_ARRAY_BUFFER)
+            gl.glDrawElements(type, N, face_dtype, buffer.Enable())
+            buffer.Disable()
         
         # Clean up
         gl.glFlush()
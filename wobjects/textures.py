@@ -19,18 +19,20 @@ name of any of the available fragment shaders.
 
 """
 
+import multiprocessing
+import multiprocessing.pool
+
 import OpenGL.GL as gl
 
 import numpy as np
 
-from visvis.utils.pypoints import Pointset
-#
 from visvis import Range, Wobject, Colormapable
-from visvis.core.misc import PropWithDraw, DrawAfter
+from visvis.core.misc import PropWithDraw, DrawAfter, getOpenGlCapable
 from visvis.core.misc import Transform_Translate, Transform_Scale
 from visvis.core import shaders
 #
 from visvis.core import TextureObject
+from visvis.core.pyramid import Pyramid
 from visvis.wobjects.motion import MotionMixin
 
 
@@ -42,25 +44,273 @@ climCorrection = { 'uint8':2**8, 'int8':2**7, 'uint16':2**16, 'int16':2**15,
                    'bool':2**8}
 
 
-def minmax(data):
-    """ minmax(data)
+# The number of elements that minmax() processes at once, and the number
+# of elements above which it uses multiple threads
+_MINMAX_CHUNK_SIZE = 2**22
+_MINMAX_THREAD_SIZE = 2**24
+
+
+def _minmaxChunks(data):
+    """ Divide the data in chunks along the first dimension.
+    """
+    if data.ndim == 0:
+        return [data.reshape(1)]
+    rowSize = max(1, data[:1].size)
+    step = max(1, _MINMAX_CHUNK_SIZE // rowSize)
+    return [data[i:i+step] for i in range(0, data.shape[0], step)]
+
+
+def _minmaxChunk(chunk):
+    """ Get the min and max of the finite values in a chunk, or None.
+    """
+    chunk = np.asarray(chunk)
+    if not chunk.size:
+        return None
+    mi, ma = chunk.min(), chunk.max()
+    # Only if there are nans or infs, we need to select finite values
+    if chunk.dtype.kind in 'fc' and not (np.isfinite(mi) and np.isfinite(ma)):
+        chunk = chunk[np.isfinite(chunk)]
+        if not chunk.size:
+            return None
+        mi, ma = chunk.min(), chunk.max()
+    return mi, ma
+
+
+def _minmaxMap(func, chunks, size):
+    """ Apply func to each chunk, using multiple threads for large data.
+    """
+    threads = 1
+    if size > _MINMAX_THREAD_SIZE and len(chunks) > 1:
+        threads = min(multiprocessing.cpu_count(), len(chunks))
+    if threads > 1:
+        pool = multiprocessing.pool.ThreadPool(threads)
+        try:
+            return pool.map(func, chunks)
+        finally:
+            pool.close()
+    else:
+        return [func(chunk) for chunk in chunks]
+
+
+def _percentiles(data, mima, percentile):
+    """ Estimate the given percentiles (lower, upper) of the finite values
+    in the data, using a histogram. The bin that contains a percentile is
+    refined with a second histogram, so that outliers do not reduce the
+    accuracy much.
+    """
+    mi, ma = float(mima[0]), float(mima[1])
+    if mi == ma:
+        return mima
+    
+    # Use one bin per value for integer data if possible
+    nbins = 2**16
+    isInt = data.dtype.kind in 'uib'
+    if isInt:
+        nbins = int(min(nbins, ma - mi + 1))
+    
+    # Calculate histogram (nan and inf are ignored because of the range).
+    # The bins are calculated in float64, because a refined range can be
+    # too small for the resolution of float32.
+    chunks = _minmaxChunks(data)
+    def histogram(lo, hi):
+        def func(chunk):
+            chunk = np.asarray(chunk, np.float64)
+            return np.histogram(chunk, nbins, (lo, hi))[0]
+        return sum(_minmaxMap(func, chunks, data.size)).astype(np.float64)
+    hist = histogram(mi, ma)
+    total = hist.sum()
+    
+    result = []
+    for p in percentile:
+        count = total * p / 100.0
+        lo, hi, h, before = mi, ma, hist, 0.0
+        for level in range(2):
+            # Find the bin that contains the percentile
+            cumsum = before + np.cumsum(h)
+            i = min(int(np.searchsorted(cumsum, count)), nbins-1)
+            c0 = cumsum[i-1] if i else before
+            width = (hi - lo) / nbins
+            lo, hi, before = lo + i * width, lo + (i+1) * width, c0
+            # Refine, unless the bins are small enough
+            if level == 0 and not (isInt and width <= 1.0):
+                h = histogram(lo, hi)
+            else:
+                break
+        # Interpolate within the bin
+        f = (count - before) / max(1.0, cumsum[i] - c0)
+        result.append( lo + min(1.0, f) * (hi - lo) )
+    return result[0], result[1]
+
+
+def minmax(data, percentile=None):
+    """ minmax(data, percentile=None)
     
     Get the min and max of the data, ignoring inf and nan.
     
-    """
+    The data is processed in chunks (in parallel for large arrays), so
+    that no temporary arrays of the size of the data are needed.
+    
+    If percentile is given, the given percentiles of the (finite) data are
+    returned instead; this is useful to get a clim that ignores outliers.
+    It can be a 2-element tuple, or a scalar p to get the p and 100-p
+    percentiles. The percentiles are estimated using a histogram.
     
-    # Check for inf and nan
-    M1 = np.isnan(data)
-    M2 = np.isinf(data)
+    """
     
-    # Select all 'normal' elements
-    if np.any(M1) or np.any(M2):
-        data2 = data[ ~(M1|M2) ]
+    # Normalize percentile
+    if percentile is not None:
+        if isinstance(percentile, (tuple, list)):
+            percentile = float(percentile[0]), float(percentile[1])
+        else:
+            percentile = float(percentile), 100.0 - float(percentile)
+    
+    # Get min and max
+    array = np.asanyarray(data)
+    if percentile is None:
+        chunks = _minmaxChunks(array)
+        results = [r for r in _minmaxMap(_minmaxChunk, chunks, array.size)
+                        if r is not None]
+        if not results:
+            raise ValueError('Cannot get min and max of data without ' +
+                                'finite values.')
+        result = ( min([r[0] for r in results]),
+                   max([r[1] for r in results]) )
     else:
-        data2 = data
+        result = _percentiles(array, minmax(data), percentile)
+    return result
+
+
+def _cellMax(data, axis, cellSize, border):
+    """ Get the maximum along the given axis for each cell of cellSize
+    elements, including border elements of the neighbouring cells.
+    Nan is ignored.
+    """
+    n = data.shape[axis]
+    starts = np.arange(0, n, cellSize)
+    lower = np.maximum(starts - border, 0)
+    upper = np.minimum(starts + cellSize + border, n)
+    
+    # Get the max of the segments between all cell boundaries (the
+    # cells overlap, so reduceat cannot be used for the cells directly)
+    bounds = np.unique(np.concatenate([lower, upper]))[:-1]
+    segments = np.fmax.reduceat(data, bounds, axis)
+    
+    # Combine the segments of each cell
+    i1 = np.searchsorted(bounds, lower)
+    i2 = np.searchsorted(bounds, upper)
+    result = np.take(segments, i1, axis)
+    for offset in range(1, int((i2-i1).max())):
+        ii = np.minimum(i1 + offset, i2 - 1)
+        result = np.fmax(result, np.take(segments, ii, axis))
+    return result
+
+
+def calculateOccupancy(data, cellSize=8, border=2):
+    """ calculateOccupancy(data, cellSize=8, border=2)
+    
+    Calculate the maximum value of a volume in cells of cellSize voxels
+    in each dimension. The cells include border voxels of the neighbouring
+    cells, so that a cell is also occupied if interpolation or a gradient
+    in the cell uses voxels of another cell. Nan is ignored; cells without
+    finite values are nan.
+    
+    Returns a float64 array with the max of each cell. The number of
+    cells is the shape of the data divided by cellSize (rounded up).
+    
+    """
+    data = np.asanyarray(data)
+    for axis in range(data.ndim):
+        data = _cellMax(data, axis, cellSize, border)
+    return np.asarray(data, np.float64)
+
+
+# Cache for the quads of a unit cube, per partition count, and for the
+# quads created by createCubeQuads(), per box. See createCubeQuads().
+_unitCubeQuads = {}
+_cubeQuadsCache = {}
+_CUBE_QUADS_CACHE_SIZE = 256
+
+
+def _getUnitCubeQuads(partitionCount):
+    """ Get the quads of the cube from (0,0,0) to (1,1,1) as an Nx3
+    float64 array, in which each quad is partitioned partitionCount
+    times in four smaller quads.
+    """
     
-    # Return min and max
-    return data2.min(), data2.max()
+    if partitionCount in _unitCubeQuads:
+        return _unitCubeQuads[partitionCount]
+    
+    # Define the 8 corners of the cube.
+    corners = np.array([    (0,0,0), (1,0,0), (1,1,0), (0,1,0), # bottom
+                            (0,0,1), (0,1,1), (1,1,1), (1,0,1), # top
+                        ], np.float64)
+    
+    # Unwrap the vertices. 4 vertices per side = 24 vertices
+    # Warning: dont mess up the list with indices; theyre carefully
+    # chosen to be front facing.
+    quads = corners[[0,1,2,3, 4,5,6,7, 3,2,6,5, 0,4,7,1, 0,3,5,4, 1,7,6,2]]
+    
+    # Partition each quad in four smaller quads. Quad i1 of the new quads
+    # has vertices halfway vertex i1 and vertex i1+i2 of the old quad.
+    i1 = np.repeat(np.arange(4), 4)
+    i3 = (i1 + np.tile(np.arange(4), 4)) % 4
+    for iter in range(partitionCount):
+        quads = quads.reshape(-1, 4, 3)
+        quads = 0.5 * (quads[:,i1] + quads[:,i3])
+        quads = quads.reshape(-1, 3)
+    
+    quads.flags.writeable = False
+    _unitCubeQuads[partitionCount] = quads
+    return quads
+
+
+def createCubeQuads(v0, v1, t0, t1, partitionCount=0):
+    """ createCubeQuads(v0, v1, t0, t1, partitionCount=0)
+    
+    Create the quads to render a box with a 3D texture. v0 and v1 are
+    the lower and upper corner (x,y,z) of the box in vertex coordinates,
+    t0 and t1 the corresponding texture coordinates. Each quad is
+    partitioned partitionCount times in four smaller quads.
+    
+    Returns two Nx3 float32 arrays: the texture coordinates and the
+    vertex coordinates. The arrays are cached and shared by all callers
+    that ask for the same box, so they are read-only.
+    
+    """
+    
+    # I previously swapped coordinates to make sure the right faces
+    # were frontfacing. Now I apply culling to achieve the same
+    # result in a better way.
+    
+    # using glTexCoord* is the same as glMultiTexCoord*(GL_TEXTURE0)
+    # Therefore we need to bind the base texture to 0.
+    
+    # So we draw the six planes of the cube (well not a cube,
+    # a 3d rectangle thingy). The inside is only rendered if the
+    # vertex is facing front, so only 3 planes are rendered at a
+    # time...
+    
+    # Get from cache
+    key = ( tuple([float(i) for i in v0]), tuple([float(i) for i in v1]),
+            tuple([float(i) for i in t0]), tuple([float(i) for i in t1]),
+            int(partitionCount) )
+    if key in _cubeQuadsCache:
+        return _cubeQuadsCache[key]
+    
+    # Scale the unit cube to the box
+    quads = _getUnitCubeQuads(key[4])
+    result = []
+    for c0, c1 in [(key[2], key[3]), (key[0], key[1])]:
+        c0, c1 = np.array(c0), np.array(c1)
+        coords = (c0 + quads * (c1 - c0)).astype(np.float32)
+        coords.flags.writeable = False
+        result.append(coords)
+    
+    # Store in cache (the cache is simply cleared when it is full)
+    if len(_cubeQuadsCache) >= _CUBE_QUADS_CACHE_SIZE:
+        _cubeQuadsCache.clear()
+    _cubeQuadsCache[key] = tex_coord, ver_coord = tuple(result)
+    return tex_coord, ver_coord
 
 
 class TextureObjectToVisualize(TextureObject):
@@ -80,6 +330,9 @@ class TextureObjectToVisualize(TextureObject):
         # interpolate?
         self._interpolate = interpolate
         
+        # create mipmaps? (only for 2D textures, see Texture2D.mipmap)
+        self._mipmap = False
+        
         # the limits
         self._clim = Range(0,1)
         self._climCorrection = 1.0
@@ -105,9 +358,10 @@ class TextureObjectToVisualize(TextureObject):
         
         # create texture
         TextureObject._UploadTexture(self, data, *args)
+        levels = self._UploadMipmaps(data, args)
         
         # set interpolation and extrapolation parameters
-        tmp1 = gl.GL_NEAREST
+        tmp1 = self._GetMinFilter(levels)
         tmp2 = {False:gl.GL_NEAREST, True:gl.GL_LINEAR}[self._interpolate]
         gl.glTexParameteri(self._texType, gl.GL_TEXTURE_MIN_FILTER, tmp1)
         gl.glTexParameteri(self._texType, gl.GL_TEXTURE_MAG_FILTER, tmp2)
@@ -133,15 +387,67 @@ class TextureObjectToVisualize(TextureObject):
         
         # create texture
         TextureObject._UpdateTexture(self, data, *args)
+        levels = self._UploadMipmaps(data, args, True)
         
         # Update interpolation
         tmp = {False:gl.GL_NEAREST, True:gl.GL_LINEAR}[self._interpolate]
         gl.glTexParameteri(self._texType, gl.GL_TEXTURE_MAG_FILTER, tmp)
+        if levels:
+            tmp = self._GetMinFilter(levels)
+            gl.glTexParameteri(self._texType, gl.GL_TEXTURE_MIN_FILTER, tmp)
         
         # reset transfer
         self._ScaleBias_afterUpload()
     
     
+    def _UploadMipmaps(self, data, args, update=False):
+        """ Create the mipmap levels for 2D textures (if enabled), so that
+        the image does not alias when zoomed out. The levels are generated
+        by OpenGl if possible, and are otherwise calculated using the
+        pyramid module. Returns the number of levels (not counting the
+        base level).
+        """
+        
+        if not (self._mipmap and self._ndim == 2):
+            return 0
+        internalformat, format, gltype = args
+        
+        # Let OpenGl generate the levels from the uploaded base level
+        if getOpenGlCapable('3.0'):
+            gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+            return Pyramid(data, 2).levelCount - 1
+        
+        # Calculate levels
+        levels = Pyramid(data, 2, 'box').GetLevels()[1:]
+        
+        # Upload each level
+        for i in range(len(levels)):
+            level, data2 = i+1, levels[i]
+            w, h = data2.shape[1], data2.shape[0]
+            if update:
+                gl.glTexSubImage2D(gl.GL_TEXTURE_2D, level, 0, 0, w, h,
+                                    format, gltype, data2)
+            else:
+                gl.glTexImage2D(gl.GL_TEXTURE_2D, level, internalformat,
+                                    w, h, 0, format, gltype, data2)
+        
+        # Tell how many levels there are, so the texture is complete
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, len(levels))
+        return len(levels)
+    
+    
+    def _GetMinFilter(self, levels):
+        """ Get the minification filter, which uses the mipmaps if
+        there are any.
+        """
+        if not levels:
+            return gl.GL_NEAREST
+        elif self._interpolate:
+            return gl.GL_LINEAR_MIPMAP_LINEAR
+        else:
+            return gl.GL_NEAREST_MIPMAP_NEAREST
+    
+    
     def _ScaleBias_init(self, datatype):
         """ Given the climRef (which is set to data.min() and data.max())
         in constructor, set the scale
@@ -195,6 +501,44 @@ class TextureObjectToVisualize(TextureObject):
         return scale, bias
 
 
+class OccupancyTextureObject(TextureObject):
+    """ OccupancyTextureObject()
+    
+    A small 3D texture that holds for each cell of a volume whether it
+    contains values that can be visible. It is sampled without
+    interpolation, so that each cell has its exact value.
+    
+    """
+    
+    def __init__(self):
+        TextureObject.__init__(self, 3)
+    
+    
+    def _UploadTexture(self, data, *args):
+        """ "Overloaded" method to upload texture data
+        """
+        
+        # The rows of the data are not aligned
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT,1)
+        
+        # create texture
+        TextureObject._UploadTexture(self, data, *args)
+        
+        # set interpolation and extrapolation parameters
+        for param in [gl.GL_TEXTURE_MIN_FILTER, gl.GL_TEXTURE_MAG_FILTER]:
+            gl.glTexParameteri(self._texType, param, gl.GL_NEAREST)
+        for param in [  gl.GL_TEXTURE_WRAP_S, gl.GL_TEXTURE_WRAP_T,
+                        gl.GL_TEXTURE_WRAP_R]:
+            gl.glTexParameteri(self._texType, param, gl.GL_CLAMP_TO_EDGE)
+    
+    
+    def _UpdateTexture(self, data, *args):
+        """ "Overloaded" method to update texture data
+        """
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT,1)
+        TextureObject._UpdateTexture(self, data, *args)
+
+
 class BaseTexture(Wobject, Colormapable):
     """ BaseTexture(parent, data)
     
@@ -215,6 +559,9 @@ class BaseTexture(Wobject, Colormapable):
         # create texture (remember, this is an abstract class)
         self._texture1 = None
         
+        # The results of minmax() for the current data, see _GetMinmax()
+        self._minmaxCache = {}
+        
         # create glsl program for this texture...
         self._shader = shaders.Shader()
         
@@ -247,6 +594,10 @@ class BaseTexture(Wobject, Colormapable):
         
         """
         
+        # Forget the min and max of the previous data (this may also be
+        # the same array, changed in place)
+        self._minmaxCache = {}
+        
         # set data to texture
         self._SetData(data)
         
@@ -303,6 +654,19 @@ class BaseTexture(Wobject, Colormapable):
         return self._texture1._dataRef
     
     
+    def _GetMinmax(self, percentile=None):
+        """ _GetMinmax(percentile=None)
+        
+        Get minmax() of the data. The result is kept until the data is
+        set again with SetData() or Refresh().
+        
+        """
+        if percentile not in self._minmaxCache:
+            data = self._GetData()
+            self._minmaxCache[percentile] = minmax(data, percentile)
+        return self._minmaxCache[percentile]
+    
+    
     def Refresh(self):
         """ Refresh()
         
@@ -375,13 +739,24 @@ class BaseTexture(Wobject, Colormapable):
         Takes a bit more time than clim though (which basically takes no
         time at all).
         
+        If no arguments are given, the full range of the data is used. If
+        a single scalar p is given, the limits are set to the p and 100-p
+        percentiles of the data, which ignores outliers.
+        
         """
         if len(mima)==0:
             # set default values
             data = self._GetData()
             if data is None:
                 return
-            mima = minmax(data)
+            mima = self._GetMinmax()
+        
+        elif len(mima)==1 and np.isscalar(mima[0]):
+            # a percentile was given
+            data = self._GetData()
+            if data is None:
+                return
+            mima = self._GetMinmax(mima[0])
         
         elif len(mima)==1:
             # a range was given
@@ -626,6 +1001,22 @@ class Texture2D(BaseTexture):
                 # Apply
                 self.shader.fragment.AddOrReplace(aa_steps)
         return locals()
+    
+    
+    @PropWithDraw
+    def mipmap():
+        """ Get/Set whether to use mipmaps, so that the image does not
+        alias when it is zoomed out far. The mipmaps are created each
+        time the data is uploaded (by OpenGl if possible), which makes
+        updating the image slower. Default False.
+        """
+        def fget(self):
+            return self._texture1._mipmap
+        def fset(self, value):
+            self._texture1._mipmap = bool(value)
+            # Signal update
+            self._texture1._uploadFlag = abs(self._texture1._uploadFlag)
+        return locals()
 
 
 class Texture3D(BaseTexture):
@@ -640,14 +1031,25 @@ class Texture3D(BaseTexture):
     
     Texture3D objects can be created with the function vv.volshow().
     
+    To speed up rendering, rays skip the parts of the volume that are
+    empty (see the occupancyCellSize property), and the ray casting
+    render styles stop when the ray has become opaque.
+    
     """
     
     def __init__(self, parent, data, renderStyle='mip'):
         BaseTexture.__init__(self, parent, data)
         self._ndim = 3
         
+        # The maximum value per cell of the data, to skip empty space.
+        # It is calculated (and uploaded) when needed.
+        self._occupancy = OccupancyTextureObject()
+        self._occupancyMax = None
+        self._occupancyClim = None
+        self._occupancyCellSize = 8
+        
         # create texture
-        self._texture1 = TextureObjectToVisualize(3, data)
+        self._texture1 = self._CreateTexture(data)
         
         # Init vertex and fragment shader
         self._InitShader()
@@ -675,6 +1077,12 @@ class Texture3D(BaseTexture):
         self.renderStyle = renderStyle
     
     
+    def _CreateTexture(self, data):
+        """ Create the texture object that holds the volume data.
+        """
+        return TextureObjectToVisualize(3, data)
+    
+    
     def _InitShader(self):
         
         # Add components of shaders
@@ -684,6 +1092,7 @@ class Texture3D(BaseTexture):
         self.shader.fragment.Clear()
         self.shader.fragment.AddPart(shaders.SH_3F_BASE)
         self.shader.fragment.AddPart(shaders.SH_3F_CALCSTEPS)
+        self.shader.fragment.AddPart(shaders.SH_3F_EMPTYSPACE)
         self.shader.fragment.AddPart(shaders.SH_3F_STYLE_MIP)
         self.shader.fragment.AddPart(shaders.SH_COLOR_SCALAR)
         
@@ -697,6 +1106,23 @@ class Texture3D(BaseTexture):
                 ran = 1.0
             th = (self._isoThreshold - self._texture1._climRef.min ) / ran
             return th
+        def uniform_emptyThreshold():
+            th = self._GetEmptyThreshold()
+            # No skipping if the texture coordinates do not match the data
+            if th is None or 2 in (abs(self._texture1._uploadFlag),
+                                    abs(self._occupancy._uploadFlag)):
+                return -1.0
+            ran = self._texture1._climRef.range
+            if ran==0:
+                ran = 1.0
+            # Negative values disable skipping, which is what we want
+            return float(th - self._texture1._climRef.min) / ran
+        def uniform_occupancyShape():
+            shape = self._occupancy._dataRef.shape # as in opengl
+            return [float(s) for s in reversed(shape)]
+        def uniform_cellScale():
+            shape = self._texture1._dataRef.shape[:3]
+            return [float(s)/self._occupancyCellSize for s in reversed(shape)]
         def uniform_extent():
             data = self._texture1._dataRef
             shape = reversed(data.shape[:3])
@@ -714,6 +1140,12 @@ class Texture3D(BaseTexture):
         self.shader.SetStaticUniform('scaleBias', self._texture1._ScaleBias_get)
         self.shader.SetStaticUniform('extent', uniform_extent)
         
+        # Set uniforms to skip empty space
+        self.shader.SetStaticUniform('occupancy', self._occupancy)
+        self.shader.SetStaticUniform('occupancyShape', uniform_occupancyShape)
+        self.shader.SetStaticUniform('cellScale', uniform_cellScale)
+        self.shader.SetStaticUniform('emptyThreshold', uniform_emptyThreshold)
+        
         # Set lighting for iso renderer
         self.shader.SetStaticUniform('ambient', [0.7,0.7,0.7,1.0])
         self.shader.SetStaticUniform('diffuse', [0.7,0.7,0.7,1.0])
@@ -723,6 +1155,83 @@ class Texture3D(BaseTexture):
         self.shader.SetStaticUniform('maxIsoSamples', 3)
     
     
+    def _SetData(self, data):
+        BaseTexture._SetData(self, data)
+        # The occupancy is recalculated on the next draw
+        self._occupancyMax = None
+    
+    
+    def _GetEmptyThreshold(self):
+        """ Get the value for which parts of the volume with values below
+        (or equal to) it do not have to be drawn. Returns None if all
+        parts that have data should be drawn.
+        """
+        
+        # Color data
+        if len(self._texture1._dataRef.shape) > 3:
+            return None
+        
+        style = self.renderStyle.replace('rgb','').replace('color','')
+        if style == 'iso':
+            return self._isoThreshold
+        elif style == 'mip':
+            return self._texture1._clim.min
+        else:
+            # Values below clim.min get the lowest color in the colormap
+            colormap = self._colormap.GetData()
+            if colormap is not None and colormap[0, 3] == 0:
+                return self._texture1._clim.min
+            else:
+                return None
+    
+    
+    def _UpdateOccupancy(self):
+        """ Calculate the occupancy of the cells if the data has changed,
+        and set the occupancy texture, normalized in the same way as the
+        volume texture. The values are rounded up, so a cell is only
+        considered empty if all its values are below the threshold.
+        """
+        
+        data = self._texture1._dataRef
+        if data is None:
+            return
+        
+        # Calculate the maximum of each cell (not for color data)
+        if self._occupancyMax is None:
+            if len(data.shape) > 3:
+                self._occupancyMax = np.ones((1,1,1)) * np.nan
+            else:
+                cellSize = self._occupancyCellSize
+                self._occupancyMax = calculateOccupancy(data, cellSize)
+            self._occupancyClim = None
+        
+        # Normalize, if the data or climRef has changed
+        climRef = self._texture1._climRef
+        if self._occupancyClim != (climRef.min, climRef.max):
+            self._occupancyClim = climRef.min, climRef.max
+            ran = climRef.range
+            if ran==0:
+                ran = 1.0
+            occupancy = (self._occupancyMax - climRef.min) / ran
+            occupancy[np.isnan(occupancy)] = 0.0
+            occupancy = np.ceil(np.clip(occupancy, 0.0, 1.0) * 255)
+            self._occupancy.SetData(occupancy.astype(np.uint8))
+    
+    
+    @PropWithDraw
+    def occupancyCellSize():
+        """ Get/Set the size (in voxels) of the cells that are used to
+        skip empty space. Smaller cells skip more space, but each cell
+        takes one extra sample. Default 8.
+        """
+        def fget(self):
+            return self._occupancyCellSize
+        def fset(self, value):
+            self._occupancyCellSize = max(1, int(value))
+            self._occupancyMax = None
+        return locals()
+    
+    
     def OnDrawShape(self, clr):
         # Implementation of the OnDrawShape method.
         gl.glColor(clr[0], clr[1], clr[2], 1.0)
@@ -770,6 +1279,9 @@ class Texture3D(BaseTexture):
             self.shader.vertex.AddOrReplace(shaders.SH_NLIGHTS_0)
             self.shader.fragment.AddOrReplace(shaders.SH_NLIGHTS_0)
         
+        # Make sure that the occupancy is up to date
+        self._UpdateOccupancy()
+        
         
         if self.shader.isUsable and self.shader.hasCode:
             # turn glsl shader on
@@ -796,6 +1308,18 @@ class Texture3D(BaseTexture):
         gl.glEnable(gl.GL_POINT_SMOOTH)
     
     
+    def OnDestroyGl(self):
+        # Clean up OpenGl resources.
+        BaseTexture.OnDestroyGl(self)
+        self._occupancy.DestroyGl()
+    
+    
+    def OnDestroy(self):
+        # Clean up any resources.
+        BaseTexture.OnDestroy(self)
+        self._occupancy.Destroy()
+    
+    
     def _EnsureRightNumberOfLights(self, axes, shader):
         
         # Check number of lights in axes
@@ -857,63 +1381,12 @@ class Texture3D(BaseTexture):
         # for anisotropic data.
         #shape = self._texture1._shape
         shape = self._texture1._dataRef.shape
-        x0, x1 = -0.5, shape[2]-0.5
-        y0, y1 = -0.5, shape[1]-0.5
-        z0, z1 = -0.5, shape[0]-0.5
-        
-        # prepare texture coordinates
-        t0, t1 = 0, 1
-        
-        # I previously swapped coordinates to make sure the right faces
-        # were frontfacing. Now I apply culling to achieve the same
-        # result in a better way.
-        
-        # using glTexCoord* is the same as glMultiTexCoord*(GL_TEXTURE0)
-        # Therefore we need to bind the base texture to 0.
-        
-        # So we draw the six planes of the cube (well not a cube,
-        # a 3d rectangle thingy). The inside is only rendered if the
-        # vertex is facing front, so only 3 planes are rendered at a
-        # time...
-        
-        
-        # Define the 8 corners of the cube.
-        tex_coord0, ver_coord0 = Pointset(3), Pointset(3)
-        # bottom
-        tex_coord0.append((t0,t0,t0)); ver_coord0.append((x0, y0, z0)) # 0
-        tex_coord0.append((t1,t0,t0)); ver_coord0.append((x1, y0, z0)) # 1
-        tex_coord0.append((t1,t1,t0)); ver_coord0.append((x1, y1, z0)) # 2
-        tex_coord0.append((t0,t1,t0)); ver_coord0.append((x0, y1, z0)) # 3
-        # top
-        tex_coord0.append((t0,t0,t1)); ver_coord0.append((x0, y0, z1)) # 4
-        tex_coord0.append((t0,t1,t1)); ver_coord0.append((x0, y1, z1)) # 5
-        tex_coord0.append((t1,t1,t1)); ver_coord0.append((x1, y1, z1)) # 6
-        tex_coord0.append((t1,t0,t1)); ver_coord0.append((x1, y0, z1)) # 7
-        
-        # Unwrap the vertices. 4 vertices per side = 24 vertices
-        # Warning: dont mess up the list with indices; theyre carefully
-        # chosen to be front facing.
-        tex_coord, ver_coord = Pointset(3), Pointset(3)
-        for i in [0,1,2,3, 4,5,6,7, 3,2,6,5, 0,4,7,1, 0,3,5,4, 1,7,6,2]:
-            tex_coord.append(tex_coord0[i])
-            ver_coord.append(ver_coord0[i])
-        
-        # Function to partition each quad in four smaller quads
-        def partition(tex_coord1, ver_coord1):
-            tex_coord2, ver_coord2 = Pointset(3), Pointset(3)
-            for iQuad in range(int(len(tex_coord1)/4)):
-                io = iQuad * 4
-                for i1 in range(4):
-                    for i2 in range(4):
-                        i3 = (i1 + i2)%4
-                        tex_coord2.append( 0.5*(tex_coord1[io+i1] + tex_coord1[io+i3]) )
-                        ver_coord2.append( 0.5*(ver_coord1[io+i1] + ver_coord1[io+i3]) )
-            #print('partition from %i to %i vertices' % (len(tex_coord1), len(tex_coord2)))
-            return tex_coord2, ver_coord2
-        
-        # Partition quads in smaller quads?
-        for iter in range(self._qcountStored):
-            tex_coord, ver_coord = partition(tex_coord, ver_coord)
+        v0 = -0.5, -0.5, -0.5
+        v1 = shape[2]-0.5, shape[1]-0.5, shape[0]-0.5
+        
+        # Create quads
+        tex_coord, ver_coord = createCubeQuads(v0, v1, (0,0,0), (1,1,1),
+                                                self._qcountStored)
         
         # Store quads data
         self._quads = tex_coord, ver_coord
@@ -941,8 +1414,18 @@ class Texture3D(BaseTexture):
             ):
             self._CreateQuads()
         
-        # get data
-        tex_coord, ver_coord = self._quads
+        # draw
+        self._DrawQuadArrays(*self._quads)
+    
+    
+    def _DrawQuadArrays(self, tex_coord, ver_coord):
+        """ Draw the given texture and vertex coordinates as quads.
+        """
+        
+        # Get axes
+        axes = self.GetAxes()
+        if not axes:
+            return
         
         # Set culling (take data aspect into account!)
         tmp = 1
@@ -956,8 +1439,8 @@ class Texture3D(BaseTexture):
         # init vertex and texture array
         gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
         gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
-        gl.glVertexPointerf(ver_coord.data)
-        gl.glTexCoordPointerf(tex_coord.data)
+        gl.glVertexPointerf(ver_coord)
+        gl.glTexCoordPointerf(tex_coord)
         
         # draw
         gl.glDrawArrays(gl.GL_QUADS, 0, len(tex_coord))
@@ -1200,6 +1683,9 @@ class MultiTexture3D(Texture3D):
         else:
             self.shader.SetUniform('stepRatio', float(self._stepRatio))
         
+        # Make sure that the occupancy is up to date
+        self._UpdateOccupancy()
+        
         
         # fragment shader on
         if self.shader.isUsable and self.shader.hasCode:
@@ -1226,6 +1712,7 @@ class MultiTexture3D(Texture3D):
         # remove texture from opengl memory
         self._texture1.DestroyGl()
         self._texture2.DestroyGl()
+        self._occupancy.DestroyGl()
         
         # clear shaders
         self._shader.DestroyGl()
@@ -1239,5 +1726,6 @@ class MultiTexture3D(Texture3D):
         # Clean up any resources.
         self._texture1.Destroy()
         self._texture2.Destroy()
+        self._occupancy.Destroy()
         if hasattr(self, '_colormap'):
             self._colormap.Destroy()